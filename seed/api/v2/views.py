@@ -18,14 +18,17 @@ class ProgressViewSetV2(viewsets.ViewSet):
         Returns::
             {
                 'progress_key': The same progress key,
-                'progress': Percent completion
+                'progress': Percent completion,
+                'rows_per_second': Throughput of the task, while it runs (only for some tasks),
+                'eta_seconds': Estimated number of seconds until completion, while it runs
             }
         """
         # progress_key = request.data.get('progress_key')
 
         progress_key = pk
-        if get_cache(progress_key):
-            return JsonResponse(get_cache(progress_key))
+        progress = get_cache(progress_key)
+        if progress:
+            return JsonResponse(progress)
         else:
             return JsonResponse({
                 'progress_key': progress_key,
@@ -9,7 +9,6 @@ import hashlib
 import json
 import logging
 import math
-import tempfile
 from urllib import unquote
 
 from django.contrib.auth.models import User
@@ -30,6 +29,7 @@ from seed.utils.cache import (
     set_cache_raw, set_cache_state, get_cache, get_cache_raw,
     get_cache_state, delete_cache
 )
+from seed.utils.staged_files import open_staged_file
 
 _log = logging.getLogger(__name__)
 
@@ -714,13 +714,10 @@ class ImportFile(NotDeletableModel, TimeStampedModel):
     @property
     def local_file(self):
         if not hasattr(self, "_local_file"):
-            temp_file = tempfile.NamedTemporaryFile(mode='w+b', bufsize=1024, delete=False)
-            for chunk in self.file.chunks(1024):
-                temp_file.write(chunk)
-            temp_file.flush()
-            temp_file.close()
-            self.file.close()
-            self._local_file = open(temp_file.name, 'rU')
+            # the creation time tells apart the files of databases that reuse the ids (e.g. tests)
+            created = self.created.strftime('%Y%m%d%H%M%S%f') if self.created else ''
+            key = 'import_file_{}_{}'.format(self.pk, created)
+            self._local_file = open_staged_file(key, self.file, 'rU')
 
         self._local_file.seek(0)
         return self._local_file
@@ -8,10 +8,9 @@
 from __future__ import absolute_import
 
 import collections
-import copy
 import datetime
-import hashlib
 import operator
+import time
 import traceback
 from _csv import Error
 from collections import namedtuple
@@ -22,8 +21,8 @@ from celery import chord
 from celery import shared_task
 from celery.utils.log import get_task_logger
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
 from django.utils import timezone
 from unidecode import unidecode
 
@@ -36,10 +35,8 @@ from seed.decorators import get_prog_key
 from seed.decorators import lock_and_track
 from seed.green_button import xml_importer
 from seed.lib.mcm import cleaners, mapper, reader
-from seed.lib.mcm.mapper import expand_rows
 from seed.lib.mcm.utils import batch
 from seed.lib.merging import merging
-from seed.lib.superperms.orgs.models import Organization
 from seed.models import (
     ASSESSED_BS,
     ASSESSED_RAW,
@@ -66,7 +63,10 @@ from seed.models import TaxLotProperty
 from seed.models.auditlog import AUDIT_IMPORT
 from seed.models.data_quality import DataQualityCheck
 from seed.utils.buildings import get_source_type
-from seed.utils.cache import set_cache, increment_cache, get_cache, delete_cache, get_cache_raw
+from seed.utils.cache import (
+    set_cache, increment_cache, get_cache, delete_cache, get_cache_raw, set_cache_raw
+)
+from seed.utils.hashing import hash_state_object
 
 _log = get_task_logger(__name__)
 
@@ -79,7 +79,7 @@ def get_cache_increment_value(chunk):
 
 
 @shared_task
-def check_data_chunk(model, ids, identifier, increment):
+def check_data_chunk(model, ids, identifier, increment, chunk=0):
     if model == 'PropertyState':
         qs = PropertyState.objects.filter(id__in=ids)
     elif model == 'TaxLotState':
@@ -90,7 +90,7 @@ def check_data_chunk(model, ids, identifier, increment):
 
     d = DataQualityCheck.retrieve(super_org.get_parent())
     d.check_data(model, qs.iterator())
-    d.save_to_cache(identifier)
+    d.save_to_cache(identifier, chunk)
 
 
 @shared_task
@@ -102,7 +102,7 @@ def finish_checking(identifier):
     :return:
     """
     prog_key = get_prog_key('check_data', identifier)
-    data_quality_results = get_cache_raw(DataQualityCheck.cache_key(identifier))
+    data_quality_results = DataQualityCheck.merge_chunks(identifier)
     result = {
         'status': 'success',
         'progress': 100,
@@ -262,22 +262,19 @@ def _build_cleaner_2(org):
     return cleaners.Cleaner(ontology)
 
 
-@shared_task
-def map_row_chunk(ids, file_pk, source_type, prog_key, increment, **kwargs):
-    """Does the work of matching a mapping to a source type and saving
+def _get_mapping_plan_key(import_file_id):
+    return get_prog_key('mapping_plan', import_file_id)
 
-    :param ids: list of PropertyState IDs to map.
-    :param file_pk: int, the PK for an ImportFile obj.
-    :param source_type: int, represented by either ASSESSED_RAW or PORTFOLIO_RAW.
-    :param prog_key: string, key of the progress key
-    :param increment: double, value by which to increment progress key
+
+def build_mapping_plan(import_file):
     """
-    import_file = ImportFile.objects.get(pk=file_pk)
-    save_type = PORTFOLIO_BS
-    if source_type == ASSESSED_RAW:
-        save_type = ASSESSED_BS
+    Compile the column mappings of the import file into a MappingPlan and store it in the cache,
+    so that the map_row_chunk tasks of the file do not have to rebuild it.
 
-    org = Organization.objects.get(pk=import_file.import_record.super_organization.pk)
+    :param import_file: ImportFile
+    :return: MappingPlan
+    """
+    org = import_file.import_record.super_organization
 
     # get all the table_mappings that exist for the organization
     table_mappings = ColumnMapping.get_column_mappings_by_table_name(org)
@@ -310,139 +307,128 @@ def map_row_chunk(ids, file_pk, source_type, prog_key, increment, **kwargs):
         raise Exception("This code has been deprecated, but is being called. Need to review the column cleanup")
     # TODO: *END TOTAL TERRIBLE HACK**
 
-    map_cleaner = _build_cleaner_2(org)
-
-    # *** BREAK OUT INTO SEPARATE METHOD ***
     # figure out which import field is defined as the unique field that may have a delimiter of
     # individual values (e.g. tax lot ids). The definition of the delimited field is currently
     # hard coded
-    try:
-        delimited_fields = {}
-        if 'TaxLotState' in table_mappings.keys():
-            tmp = table_mappings['TaxLotState'].keys()[table_mappings['TaxLotState'].values().index(
-                ('TaxLotState', 'jurisdiction_tax_lot_id', 'Jurisdiction Tax Lot ID', False))]
-            delimited_fields['jurisdiction_tax_lot_id'] = {
-                'from_field': tmp,
-                'to_table': 'TaxLotState',
-                'to_field_name': 'jurisdiction_tax_lot_id',
-            }
-    except ValueError:
-        delimited_fields = {}
-        # field does not exist in mapping list, so ignoring
-
-    # _log.debug("my table mappings are {}".format(table_mappings))
-    # _log.debug("delimited_field that will be expanded and normalized: {}".format(delimited_fields))
+    delimited_fields = {}
+    if 'TaxLotState' in table_mappings.keys():
+        for raw_column_name, mapping in table_mappings['TaxLotState'].items():
+            if mapping == ('TaxLotState', 'jurisdiction_tax_lot_id', 'Jurisdiction Tax Lot ID', False):
+                delimited_fields[raw_column_name] = 'TaxLotState'
+                break
 
     # If a single file is being imported into both the tax lot and property table, then add
     # an extra custom mapping for the cross-related data. If the data are not being imported into
     # the property table then make sure to skip this so that superfluous property entries are
     # not created.
     if 'PropertyState' in table_mappings.keys():
-        if delimited_fields and delimited_fields['jurisdiction_tax_lot_id']:
-            table_mappings['PropertyState'][
-                delimited_fields['jurisdiction_tax_lot_id']['from_field']] = (
+        for raw_column_name in delimited_fields:
+            table_mappings['PropertyState'][raw_column_name] = (
                 'PropertyState', 'lot_number', 'Lot Number', False)
-    # *** END BREAK OUT ***
 
-    # yes, there are three cascading for loops here. sorry :(
-    for table, mappings in table_mappings.items():
-        if not table:
-            continue
+    plan = mapper.MappingPlan(table_mappings,
+                              delimited_fields,
+                              _build_cleaner_2(org).ontology,
+                              Column.QUANTITY_UNIT_COLUMNS)
+    set_cache_raw(_get_mapping_plan_key(import_file.pk), plan)
+    return plan
+
+
+def get_mapping_plan(import_file_id):
+    """
+    Return the cached MappingPlan of the import file, building it if it is not in the cache.
+
+    :param import_file_id: int, ID of the ImportFile
+    :return: MappingPlan
+    """
+    plan = get_cache_raw(_get_mapping_plan_key(import_file_id))
+    if plan is None:
+        plan = build_mapping_plan(ImportFile.objects.get(pk=import_file_id))
+    return plan
+
+
+@shared_task
+def map_row_chunk(ids, file_pk, source_type, prog_key, increment, **kwargs):
+    """Does the work of matching a mapping to a source type and saving
 
-        # This may be historic, but we need to pull out the extra_data_fields here to pass into
-        # mapper.map_row. apply_columns are extra_data columns (the raw column names)
-        extra_data_fields = []
-        for k, v in mappings.items():
-            # the 3rd element is the is_extra_data flag. Need to convert this to a dict and not a tuple.
-            if v[3]:
-                extra_data_fields.append(k)
-        # _log.debug("extra data fields: {}".format(extra_data_fields))
+    :param ids: list of PropertyState IDs to map.
+    :param file_pk: int, the PK for an ImportFile obj.
+    :param source_type: int, represented by either ASSESSED_RAW or PORTFOLIO_RAW.
+    :param prog_key: string, key of the progress key
+    :param increment: double, value by which to increment progress key
+    """
+    save_type = PORTFOLIO_BS
+    if source_type == ASSESSED_RAW:
+        save_type = ASSESSED_BS
+
+    plan = get_mapping_plan(file_pk)
+    # the audit logs store the name of the file, same as str(import_file)
+    org_id, import_filename = ImportFile.objects.filter(pk=file_pk).values_list(
+        'import_record__super_organization_id', 'file').get()
 
-        # All the data live in the PropertyState.extra_data field when the data are imported
-        data = PropertyState.objects.filter(id__in=ids).only('extra_data').iterator()
+    # The raw data upon import is in the extra_data column
+    raw_rows = [state.extra_data for state in
+                PropertyState.objects.filter(id__in=ids).only('extra_data').iterator()]
+
+    for table in plan.tables:
+        StateClass = STR_TO_CLASS[table]
+        AuditLogClass = PropertyAuditLog if StateClass is PropertyState else TaxLotAuditLog
 
         # Since we are importing CSV, then each extra_data field will have the same fields. So
         # save the map_model_obj outside of for loop to pass into the `save_column_names` methods
         map_model_obj = None
 
-        # Loop over all the rows
-        for original_row in data:
-
-            # expand the row into multiple rows if needed with the delimited_field replaced with a
-            # single value. This minimizes the need to rewrite the downstream code.
-            expand_row = False
-            for k, d in delimited_fields.items():
-                if d['to_table'] == table:
-                    expand_row = True
-            # _log.debug("Expand row is set to {}".format(expand_row))
-
-            delimited_field_list = []
-            for _, v in delimited_fields.items():
-                delimited_field_list.append(v['from_field'])
-
-            # _log.debug("delimited_field_list is set to {}".format(delimited_field_list))
-
-            # The raw data upon import is in the extra_data column
-            for row in expand_rows(original_row.extra_data, delimited_field_list, expand_row):
-                map_model_obj = mapper.map_row(
-                    row,
-                    mappings,
-                    STR_TO_CLASS[table],
-                    extra_data_fields,
-                    cleaner=map_cleaner,
-                    **kwargs
-                )
-
-                # save cross related data, that is data that needs to go into the other model's
-                # collection as well.
-
-                # Assign some other arguments here
-                map_model_obj.import_file = import_file
-                map_model_obj.source_type = save_type
-                map_model_obj.organization = import_file.import_record.super_organization
-                if hasattr(map_model_obj, 'data_state'):
-                    map_model_obj.data_state = DATA_STATE_MAPPING
-                if hasattr(map_model_obj, 'clean'):
-                    map_model_obj.clean()
-
-                # There is a potential thread safe issue here:
-                # This method is called in parallel on production systems, so we need to make
-                # sure that the object hasn't already been created.
-                # For example, in the test data the tax lot id is the same for many rows. Make sure
-                # to only create/save the object if it hasn't been created before.
-                if hash_state_object(map_model_obj, include_extra_data=False) == \
-                    hash_state_object(STR_TO_CLASS[table](organization=map_model_obj.organization),
-                                      include_extra_data=False):
-                    # Skip this object as it has no data...
-                    _log.warn("Skipping building during mapping")
-                    continue
-
-                try:
-                    # There was an error with a field being too long [> 255 chars].
-                    map_model_obj.save()
-
-                    # Create an audit log record for the new map_model_obj that was created.
-
-                    AuditLogClass = PropertyAuditLog if isinstance(
-                        map_model_obj, PropertyState) else TaxLotAuditLog
-                    AuditLogClass.objects.create(organization=org,
-                                                 state=map_model_obj,
-                                                 name='Import Creation',
-                                                 description='Creation from Import file.',
-                                                 import_filename=import_file,
-                                                 record_type=AUDIT_IMPORT)
-
-                except ValidationError as e:
-                    # Could not save the record for some reason, raise an exception
-                    raise Exception(
-                        "Unable to save row the model with row {}:{}".format(type(e),
-                                                                             e.message))
+        # hash of an object without any data, used to skip the rows that did not map to anything
+        empty_hash = hash_state_object(StateClass(organization_id=org_id), include_extra_data=False)
+
+        # expand the row into multiple rows if needed with the delimited_field replaced with a
+        # single value. This minimizes the need to rewrite the downstream code.
+        rows = plan.expand_rows(table, raw_rows)
+
+        # Map all the rows of the chunk at once so that the values are cleaned column by column
+        for map_model_obj in plan.map_rows(table, StateClass, rows):
+            # Assign some other arguments here
+            map_model_obj.import_file_id = file_pk
+            map_model_obj.source_type = save_type
+            map_model_obj.organization_id = org_id
+            if hasattr(map_model_obj, 'data_state'):
+                map_model_obj.data_state = DATA_STATE_MAPPING
+            if hasattr(map_model_obj, 'clean'):
+                map_model_obj.clean()
+
+            # There is a potential thread safe issue here:
+            # This method is called in parallel on production systems, so we need to make
+            # sure that the object hasn't already been created.
+            # For example, in the test data the tax lot id is the same for many rows. Make sure
+            # to only create/save the object if it hasn't been created before.
+            if hash_state_object(map_model_obj, include_extra_data=False) == empty_hash:
+                # Skip this object as it has no data...
+                _log.warn("Skipping building during mapping")
+                continue
+
+            try:
+                # There was an error with a field being too long [> 255 chars].
+                map_model_obj.save()
+
+                # Create an audit log record for the new map_model_obj that was created.
+                AuditLogClass.objects.create(organization_id=org_id,
+                                             state=map_model_obj,
+                                             name='Import Creation',
+                                             description='Creation from Import file.',
+                                             import_filename=import_filename,
+                                             record_type=AUDIT_IMPORT)
+
+            except ValidationError as e:
+                # Could not save the record for some reason, raise an exception
+                raise Exception(
+                    "Unable to save row the model with row {}:{}".format(type(e),
+                                                                         e.message))
 
         # Make sure that we've saved all of the extra_data column names from the first item in list
         if map_model_obj:
             Column.save_column_names(map_model_obj)
 
-    increment_cache(prog_key, increment)
+    increment_cache(prog_key, increment, len(ids))
 
 
 @shared_task
@@ -486,6 +472,10 @@ def _map_data(import_file_id, mark_as_done):
 
     id_chunks = [[obj.id for obj in chunk] for chunk in batch(qs, 100)]
     increment = get_cache_increment_value(id_chunks)
+
+    # compile the mappings once for all of the chunks
+    build_mapping_plan(import_file)
+
     tasks = [map_row_chunk.s(ids, import_file_id, source_type, prog_key, increment)
              for ids in id_chunks]
 
@@ -523,13 +513,16 @@ def _data_quality_check(organization, property_state_ids, taxlot_state_ids, iden
         id_chunks = [[obj for obj in chunk] for chunk in batch(property_state_ids, 100)]
         increment = get_cache_increment_value(id_chunks)
         for ids in id_chunks:
-            tasks.append(check_data_chunk.s("PropertyState", ids, identifier, increment))
+            tasks.append(check_data_chunk.s("PropertyState", ids, identifier, increment, len(tasks)))
 
     if taxlot_state_ids:
         id_chunks_tl = [[obj for obj in chunk] for chunk in batch(taxlot_state_ids, 100)]
         increment_tl = get_cache_increment_value(id_chunks_tl)
         for ids in id_chunks_tl:
-            tasks.append(check_data_chunk.s("TaxLotState", ids, identifier, increment_tl))
+            tasks.append(check_data_chunk.s("TaxLotState", ids, identifier, increment_tl, len(tasks)))
+
+    # each chunk saves its results in its own key, finish_checking merges them
+    DataQualityCheck.initialize_chunks(identifier, len(tasks))
 
     if tasks:
         # specify the chord as an immutable with .si
@@ -594,53 +587,105 @@ def map_data(import_file_id, remap=False, mark_as_done=True):
     return {'status': 'success', 'progress': 100, 'progress_key': prog_key}
 
 
+def _save_raw_rows(import_file, rows, headers=None):
+    """
+    Save the raw rows to the database. All the rows are written to the PropertyState table with a
+    single multi-row insert (bulk_create) instead of saving each row individually.
+
+    :param import_file: ImportFile, file that the rows were read from
+    :param rows: iterable, dicts of the raw data for each row, or tuples if headers are passed
+    :param headers: list, (optional) the clean headers of the values of the tuple rows as returned
+        by ``MCMParser.read_chunk_rows`` or ``MCMParser.read_rows``. The values of those rows are
+        not sanitized again.
+    :return: int, number of rows saved
+    """
+    super_org = import_file.import_record.super_organization
+
+    # Save our "column headers" and sample rows for F/E.
+    source_type = get_source_type(import_file)
+    raw_properties = []
+    for c in rows:
+        if headers is not None:
+            new_chunk = dict(zip(headers, c))
+        else:
+            # sanitize c and remove any diacritics
+            new_chunk = {}
+            for k, v in c.iteritems():
+                # remove extra spaces surrounding keys.
+                key = k.strip()
+                if isinstance(v, unicode):
+                    new_chunk[key] = unidecode(v)
+                elif isinstance(v, (datetime.datetime, datetime.date)):
+                    raise TypeError("Datetime class not supported in Extra Data. Needs to be a string.")
+                else:
+                    new_chunk[key] = v
+
+        raw_properties.append(
+            PropertyState(
+                organization=super_org,
+                import_file=import_file,
+                source_type=source_type,
+                data_state=DATA_STATE_IMPORT,
+                extra_data=new_chunk,
+            )
+        )
+
+    # The raw records do not have any mapped fields yet (e.g. address_line_1), so there is
+    # nothing for PropertyState.save() to calculate and the rows can be inserted in one statement.
+    PropertyState.objects.bulk_create(raw_properties)
+
+    return len(raw_properties)
+
+
 @shared_task
-def _save_raw_data_chunk(chunk, file_pk, prog_key, increment):
+def _save_raw_data_chunk(file_pk, start, end, prog_key, increment, sheet_size=None):
     """
-    Save the raw data to the database
+    Save the raw data to the database. Only the location of the chunk in the file is passed to
+    the task; the worker reopens the file and parses its own slice of the rows.
 
-    :param chunk: list, ids to process
     :param file_pk: ImportFile Primary Key
+    :param start: int, start of the chunk (byte offset for CSV, row index for XLSX)
+    :param end: int, end of the chunk (byte offset for CSV, row index for XLSX)
     :param prog_key: string, Progress Key to append progress
     :param increment: Float, Value by which to increment the progress
+    :param sheet_size: list, (optional) ``MCMParser.sheet_size`` of an XLSX file
     :return: Bool, Always true
     """
+    start_time = time.time()
 
     import_file = ImportFile.objects.get(pk=file_pk)
+    parser = reader.MCMParser(import_file.local_file, sheet_size=sheet_size)
+    num_rows = _save_raw_rows(import_file, parser.read_chunk_rows(start, end), parser.headers)
 
-    # Save our "column headers" and sample rows for F/E.
-    source_type = get_source_type(import_file)
-    for c in chunk:
-        raw_property = PropertyState(organization=import_file.import_record.super_organization)
-        raw_property.import_file = import_file
-
-        # sanitize c and remove any diacritics
-        new_chunk = {}
-        for k, v in c.iteritems():
-            # remove extra spaces surrounding keys.
-            key = k.strip()
-            if isinstance(v, unicode):
-                new_chunk[key] = unidecode(v)
-            elif isinstance(v, (datetime.datetime, datetime.date)):
-                raise TypeError("Datetime class not supported in Extra Data. Needs to be a string.")
-            else:
-                new_chunk[key] = v
-        raw_property.extra_data = new_chunk
-        raw_property.source_type = source_type
-        raw_property.data_state = DATA_STATE_IMPORT
+    elapsed = time.time() - start_time
+    _log.info("Saved {} raw rows for import file {} in {:.3f} seconds ({:.1f} rows/sec)".format(
+        num_rows, file_pk, elapsed, num_rows / elapsed if elapsed else 0.0))
 
-        # We require a save to get our PK
-        # We save here to set our initial source PKs.
-        raw_property.save()
+    # Indicate progress
+    increment_cache(prog_key, increment, num_rows)
 
-        super_org = import_file.import_record.super_organization
-        raw_property.organization = super_org
+    return True
 
-        raw_property.save()
+
+@shared_task
+def _save_raw_data_rows(rows, headers, file_pk, prog_key, increment):
+    """
+    Save the raw rows of an XLS file to the database. The rows are read once by
+    ``_save_raw_data`` and passed to the task, as an XLS workbook is loaded at once and can not be
+    read from a row.
+
+    :param rows: list, the values of each row in the order of the headers
+    :param headers: list, the clean headers of the file
+    :param file_pk: ImportFile Primary Key
+    :param prog_key: string, Progress Key to append progress
+    :param increment: Float, Value by which to increment the progress
+    :return: Bool, Always true
+    """
+    import_file = ImportFile.objects.get(pk=file_pk)
+    num_rows = _save_raw_rows(import_file, rows, headers)
 
     # Indicate progress
-    increment_cache(prog_key, increment)
-    # _log.debug('Returning from _save_raw_data_chunk')
+    increment_cache(prog_key, increment, num_rows)
 
     return True
 
@@ -699,9 +744,10 @@ def _save_raw_green_button_data(file_pk):
     import_file.raw_save_done = True
     import_file.save()
 
-    res = xml_importer.import_xml(import_file)
-
+    # the readings are streamed from the file, the progress is the share of the file that was read
     prog_key = get_prog_key('save_raw_data', file_pk)
+    res = xml_importer.import_xml(import_file, import_file.cycle, prog_key)
+
     result = {
         'status': 'success',
         'progress': 100,
@@ -755,17 +801,24 @@ def _save_raw_data(file_pk, *args, **kwargs):
 
         parser = reader.MCMParser(import_file.local_file)
         cache_first_rows(import_file, parser)
-        rows = parser.next()
-        import_file.num_rows = 0
         import_file.num_columns = parser.num_columns()
 
-        chunks = []
-        for batch_chunk in batch(rows, 100):
-            import_file.num_rows += len(batch_chunk)
-            chunks.append(batch_chunk)
-        increment = get_cache_increment_value(chunks)
-        tasks = [_save_raw_data_chunk.s(chunk, file_pk, prog_key, increment)
-                 for chunk in chunks]
+        if type(parser.reader) is not reader.ExcelParser:
+            # Only pass the location of each chunk to the workers (byte ranges for CSV, row
+            # ranges for XLSX) so that the size of the messages does not grow with the file.
+            chunks = parser.plan_chunks(100)
+            import_file.num_rows = sum(num_rows for _, _, num_rows in chunks)
+            increment = get_cache_increment_value(chunks)
+            tasks = [_save_raw_data_chunk.s(file_pk, start, end, prog_key, increment,
+                                            parser.sheet_size)
+                     for start, end, _ in chunks]
+        else:
+            # An XLS workbook can not be read from a row, so its rows are read once here
+            chunks = list(batch(parser.read_rows(), 100))
+            import_file.num_rows = sum(len(chunk) for chunk in chunks)
+            increment = get_cache_increment_value(chunks)
+            tasks = [_save_raw_data_rows.s(chunk, parser.headers, file_pk, prog_key, increment)
+                     for chunk in chunks]
 
         # _log.debug('Appended all tasks')
         import_file.save()
@@ -779,7 +832,8 @@ def _save_raw_data(file_pk, *args, **kwargs):
             finish_raw_save.s(file_pk)
 
         # _log.debug('Finished raw save tasks')
-        result = get_cache(prog_key)
+        # the chunks report their progress, which must not be overwritten while they run
+        return get_cache(prog_key)
     except StopIteration:
         result['status'] = 'error'
         result['message'] = 'StopIteration Exception'
@@ -910,38 +964,6 @@ def _find_matches(un_m_address, canonical_buildings_addresses):
     return match_list
 
 
-def hash_state_object(obj, include_extra_data=True):
-    def _get_field_from_obj(field_obj, field):
-        if not hasattr(field_obj, field):
-            return "FOO"  # Return a random value so we can distinguish between this and None.
-        else:
-            return getattr(field_obj, field)
-
-    m = hashlib.md5()
-    for f in Column.retrieve_db_field_name_for_hash_comparison():
-        obj_val = _get_field_from_obj(obj, f)
-        m.update(str(f))
-        m.update(str(obj_val))
-        # print "{}: {} -> {}".format(field, obj_val, m.hexdigest())
-
-    if include_extra_data:
-        add_dictionary_repr_to_hash(m, obj.extra_data)
-
-    return m.hexdigest()
-
-
-def add_dictionary_repr_to_hash(hash_obj, dict_obj):
-    assert isinstance(dict_obj, dict)
-
-    for (key, value) in sorted(dict_obj.items(), key=lambda x_y: x_y[0]):
-        if isinstance(value, dict):
-            add_dictionary_repr_to_hash(hash_obj, value)
-        else:
-            hash_obj.update(str(key))
-            hash_obj.update(str(value))
-    return hash_obj
-
-
 def filter_duplicated_states(unmatched_states):
     """
     Takes a list of states, where some values may contain the same data
@@ -954,7 +976,7 @@ def filter_duplicated_states(unmatched_states):
     :return:
     """
 
-    hash_values = map(hash_state_object, unmatched_states)
+    hash_values = [s.hash_object or hash_state_object(s) for s in unmatched_states]
     equality_classes = collections.defaultdict(list)
 
     for (ndx, hashval) in enumerate(hash_values):
@@ -1010,6 +1032,8 @@ class EquivalencePartitioner(object):
         the two objects are definitely different object)
         """
 
+        # the fields that the canonical key values come from, used to look up matching states in the database
+        self.canonical_key_fields = [fieldlist[0] for fieldlist in equivalence_class_description]
         self.equiv_comparison_key_func = self.make_resolved_key_calculation_function(equivalence_class_description)
         self.equiv_canonical_key_func = self.make_canonical_key_calculation_function(equivalence_class_description)
         self.identity_key_func = self.make_canonical_key_calculation_function([(x,) for x in identity_fields])
@@ -1119,7 +1143,8 @@ class EquivalencePartitioner(object):
 
     @staticmethod
     def merge_keys(key1, key2):
-        return [a if a else b for (a, b) in zip(key1, key2)]
+        # return a tuple so the merged key can be used as the key of the equivalence class
+        return tuple([a if a else b for (a, b) in zip(key1, key2)])
 
     @staticmethod
     def identities_are_different(key1, key2):
@@ -1143,6 +1168,71 @@ class EquivalencePartitioner(object):
         that has a blank pm_property, we would not want to say the
         value in the custom_id must be the pm_property_id.
 
+        Instead of comparing each object against every equivalence
+        class, the classes are indexed by each of the values in their
+        keys, so only the classes that share at least one value with
+        the comparison key of the object (i.e. the classes for which
+        calculate_key_equivalence is True) are checked. If more than
+        one class matches, the oldest class is used.
+
+        :param list_of_obj:
+        :return:
+        """
+        equivalence_classes = collections.defaultdict(list)
+        identities_for_equivalence = {}
+
+        # creation order of each class, used to pick between multiple matching classes
+        class_order = {}
+        # one index per key position of {value: set(class keys)}
+        key_index = collections.defaultdict(lambda: collections.defaultdict(set))
+
+        def _index(class_key):
+            for (position, value) in enumerate(class_key):
+                if value is not None:
+                    key_index[position][value].add(class_key)
+
+        def _unindex(class_key):
+            for (position, value) in enumerate(class_key):
+                if value is not None:
+                    key_index[position][value].discard(class_key)
+
+        for (ndx, obj) in enumerate(list_of_obj):
+            cmp_key = self.calculate_comparison_key(obj)
+            identity_key = self.calculate_identity_key(obj)
+
+            candidate_keys = set()
+            for (position, value) in enumerate(cmp_key):
+                if value is not None and value in key_index[position]:
+                    candidate_keys.update(key_index[position][value])
+
+            for class_key in sorted(candidate_keys, key=class_order.get):
+                if not self.identities_are_different(identities_for_equivalence[class_key], identity_key):
+
+                    equivalence_classes[class_key].append(ndx)
+
+                    if self.key_needs_merging(class_key, cmp_key):
+                        merged_key = self.merge_keys(class_key, cmp_key)
+                        _unindex(class_key)
+                        class_order[merged_key] = class_order.pop(class_key)
+                        equivalence_classes[merged_key] = equivalence_classes.pop(class_key)
+                        identities_for_equivalence[merged_key] = identity_key
+                        _index(merged_key)
+                    break
+            else:
+                can_key = self.calculate_canonical_key(obj)
+                if can_key not in class_order:
+                    class_order[can_key] = ndx
+                    _index(can_key)
+                equivalence_classes[can_key].append(ndx)
+                identities_for_equivalence[can_key] = identity_key
+        return equivalence_classes
+
+    def _calculate_equivalence_classes_linear(self, list_of_obj):
+        """
+        Reference implementation of calculate_equivalence_classes that
+        compares each object against every existing equivalence class.
+        This is O(n^2) and is only kept for testing and benchmarking.
+
         :param list_of_obj:
         :return:
         """
@@ -1202,34 +1292,61 @@ def match_and_merge_unmatched_objects(unmatched_states, partitioner):
 
     # For each of the equivalence classes, merge them down to a single
     # object of that type.
-    merged_objects = []
-
+    unmatched_state_classes = []
     for (class_key, class_ndxs) in equivalence_classes.items():
         class_ndxs.sort(key=keyfunction)
+        unmatched_state_classes.append([unmatched_states[ndx] for ndx in class_ndxs])
 
-        if len(class_ndxs) == 1:
-            merged_objects.append(unmatched_states[class_ndxs[0]])
-            continue
-
-        unmatched_state_class = [unmatched_states[ndx] for ndx in class_ndxs]
-        merged_result = unmatched_state_class[0]
-        for unmatched in unmatched_state_class[1:]:
-            merged_result = save_state_match(merged_result, unmatched)
-
-        # 5/22/18 - I think this needs to be always run, not only if there wasn't more than one unmatched.
-        # else:
-        merged_objects.append(merged_result)
+    # 5/22/18 - I think this needs to be always run, not only if there wasn't more than one unmatched.
+    # else:
+    merged_objects = save_state_matches(unmatched_state_classes)
 
     # _log.debug("DONE with map_and_merge_unmatched_objects")
     return merged_objects, equivalence_classes.keys()
 
 
+def _find_candidate_views(ObjectViewClass, unmatched_states, partitioner, org, cycle):
+    """
+    Return the views in the cycle whose state shares at least one canonical key value with the
+    comparison key of one of the unmatched states. Only these views can be matched, so the rest of
+    the organization's views are never loaded.
+
+    :param ObjectViewClass: PropertyView or TaxLotView
+    :param unmatched_states: list, PropertyStates or TaxLotStates
+    :param partitioner: instance of EquivalencePartitioner
+    :param org: Organization
+    :param cycle: Cycle
+    :return: QuerySet of views with the state selected
+    """
+    values_by_field = collections.defaultdict(set)
+    for unmatched in unmatched_states:
+        cmp_key = partitioner.calculate_comparison_key(unmatched)
+        for (field, value) in zip(partitioner.canonical_key_fields, cmp_key):
+            if value is not None:
+                values_by_field[field].add(value)
+
+    if not values_by_field:
+        return ObjectViewClass.objects.none()
+
+    query = Q()
+    for (field, values) in values_by_field.items():
+        query |= Q(**{'state__{}__in'.format(field): list(values)})
+
+    return ObjectViewClass.objects.filter(
+        query,
+        state__organization=org,
+        cycle_id=cycle).select_related('state')
+
+
 def merge_unmatched_into_views(unmatched_states, partitioner, org, import_file):
     """
-    This is fairly inefficient, because we grab all the organization's entire PropertyViews at once.  Surely this can
-    be improved, but the logic is unusual/particularly dynamic here, so hopefully this can be refactored into a better,
-    purely database approach... Perhaps existing_view_states can wrap database calls. Still the abstractions are
-    subtly different (can I refactor the partitioner to use Query objects); it may require a bit of thinking.
+    Merge the unmatched states into the existing views of the import file's cycle, or promote them
+    to new views if nothing matches.
+
+    Only the views whose state shares an identifying value (e.g. pm_property_id or
+    normalized_address) with the unmatched states are fetched from the database, and those views
+    are indexed by each of the values in their canonical key, so the time and memory used scale
+    with the size of the import rather than the size of the organization's inventory.
 
     :param unmatched_states:
     :param partitioner:
@@ -1251,20 +1368,35 @@ def merge_unmatched_into_views(unmatched_states, partitioner, org, import_file):
         raise ValueError("Unknown class '{}' passed to merge_unmatched_into_views".format(
             type(unmatched_states[0])))
 
-    class_views = ObjectViewClass.objects.filter(
+    # exact duplicates of the states of the cycle's views are found with a single indexed query
+    unmatched_state_hashes = [s.hash_object or hash_state_object(s) for s in unmatched_states]
+    existing_view_state_hashes = set(ObjectViewClass.objects.filter(
         state__organization=org,
-        cycle_id=current_match_cycle).select_related('state')
+        state__hash_object__in=set(unmatched_state_hashes),
+        cycle_id=current_match_cycle).values_list('state__hash_object', flat=True))
+
+    class_views = _find_candidate_views(
+        ObjectViewClass, unmatched_states, partitioner, org, current_match_cycle
+    )
     existing_view_states = collections.defaultdict(dict)
-    existing_view_state_hashes = set()
+    # one index per key position of {value: [canonical keys]}
+    existing_key_index = collections.defaultdict(lambda: collections.defaultdict(list))
     for view in class_views:
+        if view.state.hash_object is None:
+            # the exact duplicates of a state that was never hashed are only found among the
+            # candidate views, as an exact duplicate has the same canonical key values
+            existing_view_state_hashes.add(hash_state_object(view.state))
+
         equivalence_can_key = partitioner.calculate_canonical_key(view.state)
+        if equivalence_can_key not in existing_view_states:
+            for (position, value) in enumerate(equivalence_can_key):
+                if value is not None:
+                    existing_key_index[position][value].append(equivalence_can_key)
         existing_view_states[equivalence_can_key][view.cycle] = view
-        existing_view_state_hashes.add(hash_state_object(view.state))
 
     matched_views = []
 
-    for unmatched in unmatched_states:
-        unmatched_state_hash = hash_state_object(unmatched)
+    for (unmatched, unmatched_state_hash) in zip(unmatched_states, unmatched_state_hashes):
         if unmatched_state_hash in existing_view_state_hashes:
             # If an exact duplicate exists, delete the unmatched state
             unmatched.data_state = DATA_STATE_DELETE
@@ -1272,41 +1404,41 @@ def merge_unmatched_into_views(unmatched_states, partitioner, org, import_file):
 
         else:
             # Look to see if there is a match among the property states of the object.
-
-            # equiv_key = False
-            # equiv_can_key = partitioner.calculate_canonical_key(unmatched)
             equiv_cmp_key = partitioner.calculate_comparison_key(unmatched)
 
-            for key in existing_view_states:
-                if partitioner.calculate_key_equivalence(key, equiv_cmp_key):
-                    if current_match_cycle in existing_view_states[key]:
-                        # There is an existing View for the current cycle that matches us.
-                        # Merge the new state in with the existing one and update the view,
-                        # audit log.
-                        current_view = existing_view_states[key][current_match_cycle]
-                        current_state = current_view.state
-
-                        merged_state = save_state_match(current_state, unmatched)
-
-                        current_view.state = merged_state
-                        current_view.save()
-                        matched_views.append(current_view)
-                    else:
-                        # Grab another view that has the same parent as
-                        # the one we belong to.
-                        cousin_view = existing_view_states[key].values()[0]
-                        view_parent = getattr(cousin_view, ParentAttrName)
-                        new_view = type(cousin_view)()
-                        setattr(new_view, ParentAttrName, view_parent)
-                        new_view.cycle = current_match_cycle
-                        new_view.state = unmatched
-                        try:
-                            new_view.save()
-                            matched_views.append(new_view)
-                        except IntegrityError:
-                            _log.warn("Unable to save the new view as it already exists in the db")
-
+            key = None
+            for (position, value) in enumerate(equiv_cmp_key):
+                if value is not None and existing_key_index[position].get(value):
+                    key = existing_key_index[position][value][0]
                     break
+
+            if key is not None:
+                if current_match_cycle in existing_view_states[key]:
+                    # There is an existing View for the current cycle that matches us.
+                    # Merge the new state in with the existing one and update the view,
+                    # audit log.
+                    current_view = existing_view_states[key][current_match_cycle]
+                    current_state = current_view.state
+
+                    merged_state = save_state_match(current_state, unmatched)
+
+                    current_view.state = merged_state
+                    current_view.save()
+                    matched_views.append(current_view)
+                else:
+                    # Grab another view that has the same parent as
+                    # the one we belong to.
+                    cousin_view = existing_view_states[key].values()[0]
+                    view_parent = getattr(cousin_view, ParentAttrName)
+                    new_view = type(cousin_view)()
+                    setattr(new_view, ParentAttrName, view_parent)
+                    new_view.cycle = current_match_cycle
+                    new_view.state = unmatched
+                    try:
+                        new_view.save()
+                        matched_views.append(new_view)
+                    except IntegrityError:
+                        _log.warn("Unable to save the new view as it already exists in the db")
             else:
                 # Create a new object/view for the current object.
                 created_view = unmatched.promote(current_match_cycle)
@@ -1315,6 +1447,23 @@ def merge_unmatched_into_views(unmatched_states, partitioner, org, import_file):
     return list(set(matched_views))
 
 
+def _bulk_update_states(final_states):
+    """
+    Set the data_state and merge_state of the states with one UPDATE per state class and pair of
+    values, in a single transaction. Neither field is used to calculate the normalized_address or
+    the hash_object, so these stay correct without calling save().
+
+    :param final_states: dict, {(state class, state id): (data_state, merge_state)}
+    """
+    ids_by_values = collections.defaultdict(list)
+    for ((state_class, state_id), (data_state, merge_state)) in final_states.items():
+        ids_by_values[(state_class, data_state, merge_state)].append(state_id)
+
+    with transaction.atomic():
+        for ((state_class, data_state, merge_state), ids) in ids_by_values.items():
+            state_class.objects.filter(pk__in=ids).update(data_state=data_state, merge_state=merge_state)
+
+
 @shared_task
 @lock_and_track
 def _match_properties_and_taxlots(file_pk):
@@ -1404,25 +1553,24 @@ def _match_properties_and_taxlots(file_pk):
 
     pair_new_states(merged_property_views, merged_taxlot_views)
 
-    # Mark all the unmatched objects as done with matching and mapping
-    # There should be some kind of bulk-update/save thing we can do to
-    # improve upon this.
+    # Mark all the unmatched objects as done with matching and mapping. Only the data_state and
+    # merge_state change here, so the states are updated in bulk instead of being saved one by one.
+    # If a state is in more than one of the lists, the last assignment wins.
+    final_states = collections.OrderedDict()
     for state in chain(unmatched_properties, unmatched_tax_lots):
-        state.data_state = DATA_STATE_MATCHING
-        state.save()
+        final_states[(type(state), state.pk)] = (DATA_STATE_MATCHING, state.merge_state)
 
     for state in map(lambda x: x.state, chain(merged_property_views, merged_taxlot_views)):
-        state.data_state = DATA_STATE_MATCHING
         # The merge state seems backwards, but it isn't for some reason, if they are not marked as
         # MERGE_STATE_MERGED when called in the merge_unmatched_into_views, then they are new.
-        if state.merge_state != MERGE_STATE_MERGED:
-            state.merge_state = MERGE_STATE_NEW
-        state.save()
+        merge_state = state.merge_state if state.merge_state == MERGE_STATE_MERGED else MERGE_STATE_NEW
+        final_states[(type(state), state.pk)] = (DATA_STATE_MATCHING, merge_state)
 
     for state in chain(duplicate_property_states, duplicate_tax_lot_states):
-        state.data_state = DATA_STATE_DELETE
         # state.merge_state = MERGE_STATE_DUPLICATE
-        state.save()
+        final_states[(type(state), state.pk)] = (DATA_STATE_DELETE, state.merge_state)
+
+    _bulk_update_states(final_states)
 
     data = {
         'all_unmatched_properties': len(all_unmatched_properties),
@@ -1494,6 +1642,114 @@ def query_property_matches(properties, pm_id, custom_id, ubid):
     return properties.filter(reduce(operator.or_, params)).order_by('id')
 
 
+def _merge_import_file_and_lot_numbers(merged_state, state1, state2):
+    # If the two states being merged were just imported from the same import file, carry the import_file_id into the new
+    # state. Also merge the lot_number fields so that pairing can work correctly on the resulting merged record
+    # Possible conditions:
+    # state1.data_state = 2, state1.merge_state = 0 and state2.data_state = 2, state2.merge_state = 0
+    # state1.data_state = 0, state1.merge_state = 2 and state2.data_state = 2, state2.merge_state = 0
+    if state1.import_file_id == state2.import_file_id:
+        if ((state1.data_state == DATA_STATE_MAPPING and state1.merge_state == MERGE_STATE_UNKNOWN and
+            state2.data_state == DATA_STATE_MAPPING and state2.merge_state == MERGE_STATE_UNKNOWN) or
+            (state1.data_state == DATA_STATE_UNKNOWN and state1.merge_state == MERGE_STATE_MERGED and
+             state2.data_state == DATA_STATE_MAPPING and state2.merge_state == MERGE_STATE_UNKNOWN)):
+            merged_state.import_file_id = state1.import_file_id
+
+            if isinstance(merged_state, PropertyState):
+                joined_lots = set()
+                if state1.lot_number:
+                    joined_lots = joined_lots.union(state1.lot_number.split(';'))
+                if state2.lot_number:
+                    joined_lots = joined_lots.union(state2.lot_number.split(';'))
+                if joined_lots:
+                    merged_state.lot_number = ';'.join(joined_lots)
+
+
+def save_state_matches(state_classes):
+    """
+    Merge each list of states down to a single state. The result is the same as folding each list
+    with save_state_match, but the intermediate merged states are calculated in memory and saved,
+    along with their audit logs, with a constant number of queries instead of several queries per
+    merge.
+
+    :param state_classes: list of lists, PropertyStates or TaxLotStates (all of the same type) to
+        merge, in merge order
+    :return: list, the merged state of each list (or the state itself if the list has one state)
+    """
+    to_merge = [states for states in state_classes if len(states) > 1]
+    if not to_merge:
+        return [states[0] for states in state_classes]
+
+    StateClass = type(to_merge[0][0])
+    AuditLogClass = PropertyAuditLog if StateClass is PropertyState else TaxLotAuditLog
+    state_to_state = merging.get_state_to_state_tuple(StateClass.__name__)
+
+    # Same as AuditLogClass.objects.filter(state=state).first() for each of the states
+    state_ids = set(state.pk for states in to_merge for state in states)
+    first_audit_logs = {}
+    for audit_log in AuditLogClass.objects.filter(state_id__in=state_ids).order_by('pk'):
+        first_audit_logs.setdefault(audit_log.state_id, audit_log)
+    assert len(first_audit_logs) == len(state_ids)
+
+    # Fold each list in memory, keeping the (merged_state, state1, state2) of each merge in order
+    merges = []
+    merged_results = []
+    for states in state_classes:
+        merged_result = states[0]
+        for state in states[1:]:
+            merged_state = StateClass(organization_id=merged_result.organization_id)
+            merging.merge_unsaved_state(merged_state, merged_result, state, state_to_state)
+            _merge_import_file_and_lot_numbers(merged_state, merged_result, state)
+            merged_state.merge_state = MERGE_STATE_MERGED
+            merges.append((merged_state, merged_result, state))
+            merged_result = merged_state
+        merged_results.append(merged_result)
+
+    with transaction.atomic():
+        # returns the ids on postgres
+        StateClass.objects.bulk_create([merge[0] for merge in merges])
+
+        # The parent1 of a merge of an intermediate state is the audit log of that merge, which
+        # does not have an id yet, so it is set with a single update afterwards
+        audit_logs = [
+            AuditLogClass(organization_id=state1.organization_id,
+                          parent1=first_audit_logs.get(state1.pk),
+                          parent2=first_audit_logs[state2.pk],
+                          parent_state1=state1,
+                          parent_state2=state2,
+                          state=new_state,
+                          name='System Match',
+                          description='Automatic Merge',
+                          import_filename=None,
+                          record_type=AUDIT_IMPORT)
+            for new_state, state1, state2 in merges
+        ]
+        AuditLogClass.objects.bulk_create(audit_logs)
+
+        merge_audit_logs = {audit_log.state_id: audit_log for audit_log in audit_logs}
+        parent1_whens = {}
+        for audit_log in audit_logs:
+            if audit_log.parent1 is None:
+                audit_log.parent1 = merge_audit_logs[audit_log.parent_state1_id]
+                parent1_whens[audit_log.pk] = When(pk=audit_log.pk, then=Value(audit_log.parent1_id))
+        if parent1_whens:
+            AuditLogClass.objects.filter(pk__in=parent1_whens.keys()).update(
+                parent1=Case(*parent1_whens.values(), output_field=IntegerField())
+            )
+
+        # The relationships (scenarios, measures, etc.) are copied into each of the merged states,
+        # which needs saved states. Most states do not have any, so only those merges are done
+        # one at a time.
+        if StateClass is PropertyState:
+            related_ids = PropertyState.ids_with_relationships(state_ids)
+            for merged_state, state1, state2 in merges:
+                if state1.pk in related_ids or state2.pk in related_ids:
+                    PropertyState.merge_relationships(merged_state, state1, state2)
+                    related_ids.add(merged_state.pk)
+
+    return merged_results
+
+
 def save_state_match(state1, state2):
     """
     Merge the contents of state2 into state1
@@ -1530,26 +1786,7 @@ def save_state_match(state1, state2):
                                  import_filename=None,
                                  record_type=AUDIT_IMPORT)
 
-    # If the two states being merged were just imported from the same import file, carry the import_file_id into the new
-    # state. Also merge the lot_number fields so that pairing can work correctly on the resulting merged record
-    # Possible conditions:
-    # state1.data_state = 2, state1.merge_state = 0 and state2.data_state = 2, state2.merge_state = 0
-    # state1.data_state = 0, state1.merge_state = 2 and state2.data_state = 2, state2.merge_state = 0
-    if state1.import_file_id == state2.import_file_id:
-        if ((state1.data_state == DATA_STATE_MAPPING and state1.merge_state == MERGE_STATE_UNKNOWN and
-            state2.data_state == DATA_STATE_MAPPING and state2.merge_state == MERGE_STATE_UNKNOWN) or
-            (state1.data_state == DATA_STATE_UNKNOWN and state1.merge_state == MERGE_STATE_MERGED and
-             state2.data_state == DATA_STATE_MAPPING and state2.merge_state == MERGE_STATE_UNKNOWN)):
-            merged_state.import_file_id = state1.import_file_id
-
-            if isinstance(merged_state, PropertyState):
-                joined_lots = set()
-                if state1.lot_number:
-                    joined_lots = joined_lots.union(state1.lot_number.split(';'))
-                if state2.lot_number:
-                    joined_lots = joined_lots.union(state2.lot_number.split(';'))
-                if joined_lots:
-                    merged_state.lot_number = ';'.join(joined_lots)
+    _merge_import_file_and_lot_numbers(merged_state, state1, state2)
 
     # Set the merged_state to merged
     merged_state.merge_state = MERGE_STATE_MERGED
@@ -1637,71 +1874,103 @@ def pair_new_states(merged_property_views, merged_taxlot_views):
     property_keys_orig = dict(
         [(property_m2m_keygen.calculate_comparison_key(p), p.pk) for p in property_objects])
 
-    # property_keys = copy.deepcopy(property_keys_orig)
-
-    # Do this inelegant step to make sure we are correctly splitting.
-    property_keys = collections.defaultdict(list)
+    # Make sure we are correctly splitting.
+    property_keys = {}
     for k in property_keys_orig:
-        if k[0] and ";" in k[0]:
-            for lotnum in map(lambda x: x.strip(), k[0].split(";")):
-                k_copy = list(copy.deepcopy(k))
-                k_copy[0] = lotnum
-                property_keys[tuple(k_copy)] = property_keys_orig[k]
-        else:
-            property_keys[k] = property_keys_orig[k]
+        for split_key in _split_lot_number_key(k):
+            property_keys[split_key] = property_keys_orig[k]
 
     taxlot_keys = dict([(taxlot_m2m_keygen.calculate_comparison_key(p), p.pk) for p in taxlot_objects])
 
-    # property_comparison_keys = {property_m2m_keygen.calculate_comparison_key_key(p): p.pk for p in property_objects}
-    # property_canonical_keys = {property_m2m_keygen.calculate_canonical_key(p): p.pk for p in property_objects}
+    # Index the keys of each side by the value at each key position, so that the keys that are
+    # equivalent (see EquivalencePartitioner.calculate_key_equivalence) are looked up instead of
+    # comparing every property against every tax lot.
+    num_positions = min(len(prop_cmp_fmt), len(tax_cmp_fmt))
+    taxlot_key_index = _index_keys_by_value(taxlot_keys, num_positions)
+    property_key_index = _index_keys_by_value(property_keys, num_positions)
 
-    possible_merges = []  # List of prop.id, tl.id merges.
+    possible_merges = set()  # Set of prop.id, tl.id merges.
 
     for pv in merged_property_views:
-        # if pv.state.lot_number and ";" in pv.state.lot_number:
-        #     pdb.set_trace()
-
         pv_key = property_m2m_keygen.calculate_comparison_key(pv.state)
-        # TODO: Refactor pronto.  Iterating over the tax lot is bad implementation.
-        for tlk in taxlot_keys:
-            if pv_key[0] and ";" in pv_key[0]:
-                for lotnum in map(lambda x: x.strip(), pv_key[0].split(";")):
-                    pv_key_copy = list(copy.deepcopy(pv_key))
-                    pv_key_copy[0] = lotnum
-                    pv_key_copy = tuple(pv_key_copy)
-                    if property_m2m_keygen.calculate_key_equivalence(pv_key_copy, tlk):
-                        possible_merges.append((property_keys[pv_key_copy], taxlot_keys[tlk]))
-            else:
-                if property_m2m_keygen.calculate_key_equivalence(pv_key, tlk):
-                    possible_merges.append((property_keys[pv_key], taxlot_keys[tlk]))
+        for split_key in _split_lot_number_key(pv_key):
+            if split_key not in property_keys:
+                continue
+            for tlk in _find_equivalent_keys(taxlot_key_index, split_key):
+                possible_merges.add((property_keys[split_key], taxlot_keys[tlk]))
 
     for tlv in merged_taxlot_views:
         tlv_key = taxlot_m2m_keygen.calculate_comparison_key(tlv.state)
-        for pv_key in property_keys:
-            if property_m2m_keygen.calculate_key_equivalence(tlv_key, pv_key):
-                possible_merges.append((property_keys[pv_key], taxlot_keys[tlv_key]))
-
-    for m2m in set(possible_merges):
-        pv_pk, tlv_pk = m2m
-
-        # PropertyView.objects.get(pk=pv_pk)
-        # TaxLotView.objects.get(pk=tlv_pk)
-
-        connection = TaxLotProperty.objects.filter(
-            property_view_id=pv_pk,
-            taxlot_view_id=tlv_pk
-        ).count()
-
-        if connection:
+        if tlv_key not in taxlot_keys:
+            continue
+        for pv_key in _find_equivalent_keys(property_key_index, tlv_key):
+            possible_merges.add((property_keys[pv_key], taxlot_keys[tlv_key]))
+
+    # Fetch all the existing links of the property views at once
+    existing_links = set(TaxLotProperty.objects.filter(
+        property_view_id__in=set(pv_pk for (pv_pk, _) in possible_merges)
+    ).values_list('property_view_id', 'taxlot_view_id'))
+    linked_property_views = set(pv_pk for (pv_pk, _) in existing_links)
+
+    new_links = []
+    for (pv_pk, tlv_pk) in sorted(possible_merges):
+        if (pv_pk, tlv_pk) in existing_links:
             continue
 
-        is_primary = TaxLotProperty.objects.filter(property_view_id=pv_pk).count() == 0
-        m2m_join = TaxLotProperty(
+        # the first link of a property view is the primary one
+        is_primary = pv_pk not in linked_property_views
+        linked_property_views.add(pv_pk)
+        new_links.append(TaxLotProperty(
             property_view_id=pv_pk,
             taxlot_view_id=tlv_pk,
             cycle=cycle,
             primary=is_primary
-        )
-        m2m_join.save()
+        ))
+
+    TaxLotProperty.objects.bulk_create(new_links)
 
     return
+
+
+def _split_lot_number_key(key):
+    """
+    Return one key per lot number when the first value of the key is a ';' separated list of lot
+    numbers, otherwise the key itself.
+
+    :param key: tuple, comparison key
+    :return: list of tuples
+    """
+    if key[0] and ";" in key[0]:
+        return [(lotnum,) + tuple(key[1:]) for lotnum in map(lambda x: x.strip(), key[0].split(";"))]
+    return [key]
+
+
+def _index_keys_by_value(keys, num_positions):
+    """
+    Index the keys by each of their values for the first num_positions positions.
+
+    :param keys: iterable of tuples
+    :param num_positions: int, number of key positions that are compared
+    :return: list of dicts, one per position, of {value: [keys]}
+    """
+    index = [collections.defaultdict(list) for _ in range(num_positions)]
+    for key in keys:
+        for (position, value) in enumerate(key[:num_positions]):
+            if value is not None:
+                index[position][value].append(key)
+    return index
+
+
+def _find_equivalent_keys(index, key):
+    """
+    Return the indexed keys that share a value at the same position with the key.
+
+    :param index: list of dicts, as returned by _index_keys_by_value
+    :param key: tuple
+    :return: set of keys
+    """
+    result = set()
+    for (position, value) in enumerate(key[:len(index)]):
+        if value is not None:
+            result.update(index[position].get(value, []))
+    return result
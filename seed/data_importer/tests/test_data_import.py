@@ -16,6 +16,7 @@ from django.core.files import File
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
 from mock import patch
+from xlrd import open_workbook
 
 from seed.data_importer import tasks
 from seed.data_importer.models import ImportFile, ImportRecord
@@ -26,6 +27,7 @@ from seed.data_importer.tests.util import (
     FAKE_MAPPINGS,
     FAKE_ROW,
 )
+from seed.lib.mcm.reader import XLSXParser
 from seed.models import (
     ASSESSED_RAW,
     ASSESSED_BS,
@@ -87,6 +89,91 @@ class TestMappingPortfolioData(DataMappingBaseTestCase):
         self.assertDictEqual(raw_saved.extra_data, self.fake_extra_data)
         self.assertEqual(raw_saved.organization, self.org)
 
+    def test_save_raw_rows(self):
+        """Bulk insert of a chunk sets all the import attributes on each row."""
+        chunk = [
+            {u' Property Id ': u'1001', u'Address 1': u'123 Main St'},
+            {u'Property Id': u'1002', u'Address 1': u'Caf\xe9 Street'},
+        ]
+        import_file = ImportFile.objects.get(pk=self.import_file.pk)
+        import_file.source_type = 'Portfolio Raw'
+        self.assertEqual(tasks._save_raw_rows(import_file, chunk), 2)
+
+        raw_saved = PropertyState.objects.filter(import_file=self.import_file).order_by('id')
+        self.assertEqual(raw_saved.count(), 2)
+        for ps in raw_saved:
+            self.assertEqual(ps.organization, self.org)
+            self.assertEqual(ps.source_type, PORTFOLIO_RAW)
+            self.assertEqual(ps.data_state, DATA_STATE_IMPORT)
+
+        self.assertDictEqual(raw_saved[0].extra_data, {u'Property Id': u'1001', u'Address 1': u'123 Main St'})
+        self.assertEqual(raw_saved[1].extra_data[u'Address 1'], u'Cafe Street')
+
+    def test_save_raw_data_chunks(self):
+        """Each chunk task reads its own slice of the CSV file."""
+        with patch.object(ImportFile, 'cache_first_rows', return_value=None):
+            tasks._save_raw_data(self.import_file.pk, 'fake_cache_key', 1)
+
+        import_file = ImportFile.objects.get(pk=self.import_file.pk)
+        raw_saved = PropertyState.objects.filter(import_file=import_file)
+        self.assertEqual(raw_saved.count(), import_file.num_rows)
+        property_ids = set(ps.extra_data['Property Id'] for ps in raw_saved)
+        self.assertEqual(len(property_ids), import_file.num_rows)
+
+    def test_save_raw_data_xls_chunks(self):
+        """The workbook of an XLS file is opened once and not by every chunk task."""
+        filepath = osp.join(osp.dirname(__file__), '..', '..', 'tests', 'data',
+                            'portfolio-manager-sample.xls')
+        self.import_file.file = SimpleUploadedFile(
+            name='portfolio-manager-sample.xls',
+            content=open(filepath, 'rb').read()
+        )
+        self.import_file.save()
+
+        with patch.object(ImportFile, 'cache_first_rows', return_value=None):
+            with patch('seed.lib.mcm.reader.open_workbook', wraps=open_workbook) as mock_open:
+                tasks._save_raw_data(self.import_file.pk, 'fake_cache_key', 1)
+        self.assertEqual(mock_open.call_count, 1)
+
+        import_file = ImportFile.objects.get(pk=self.import_file.pk)
+        self.assertEqual(import_file.num_rows, 512)
+        raw_saved = PropertyState.objects.filter(import_file=import_file)
+        self.assertEqual(raw_saved.count(), 512)
+        property_ids = set(ps.extra_data['Property Id'] for ps in raw_saved)
+        self.assertEqual(len(property_ids), 512)
+
+    def test_save_raw_data_xlsx_chunks(self):
+        """The chunks of an XLSX file are row ranges that are read without reading the sheet again."""
+        filepath = osp.join(osp.dirname(__file__), '..', '..', 'tests', 'data',
+                            'portfolio-manager-sample.xlsx')
+        self.import_file.file = SimpleUploadedFile(
+            name='portfolio-manager-sample.xlsx',
+            content=open(filepath, 'rb').read()
+        )
+        self.import_file.save()
+
+        with patch.object(ImportFile, 'cache_first_rows', return_value=None):
+            with patch.object(XLSXParser, '_scan_sheet', autospec=True,
+                              side_effect=XLSXParser._scan_sheet) as mock_scan_sheet:
+                with patch.object(XLSXParser, '_get_cells', autospec=True,
+                                  side_effect=XLSXParser._get_cells) as mock_get_cells:
+                    with patch.object(tasks._save_raw_data_chunk, 's',
+                                      wraps=tasks._save_raw_data_chunk.s) as mock_signature:
+                        tasks._save_raw_data(self.import_file.pk, 'fake_cache_key', 1)
+        self.assertEqual(mock_scan_sheet.call_count, 1)
+        # the 513 rows are parsed once to find the size of the sheet, the header row and the five
+        # rows of the preview when the file is opened, then each of the 6 tasks parses the header
+        # row and the rows of its chunk
+        self.assertEqual(mock_get_cells.call_count, 513 + 1 + 5 + 6 + 512)
+        # the messages only have the row ranges and the size of the sheet
+        self.assertEqual([call[0][1:3] for call in mock_signature.call_args_list],
+                         [(1, 101), (101, 201), (201, 301), (301, 401), (401, 501), (501, 513)])
+
+        import_file = ImportFile.objects.get(pk=self.import_file.pk)
+        self.assertEqual(import_file.num_rows, 512)
+        raw_saved = PropertyState.objects.filter(import_file=import_file)
+        self.assertEqual(raw_saved.count(), 512)
+
     def test_map_data(self):
         """Save mappings based on user specifications."""
         # Create new import file to test
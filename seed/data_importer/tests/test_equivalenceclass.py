@@ -5,6 +5,7 @@
 :author
 """
 import logging
+import random
 
 from seed.data_importer.tasks import EquivalencePartitioner
 from seed.data_importer.tests.util import DataMappingBaseTestCase
@@ -55,6 +56,39 @@ class TestEquivalenceClassGenerator(DataMappingBaseTestCase):
 
         return
 
+    def test_equivalence_uses_oldest_matching_class(self):
+        partitioner = EquivalencePartitioner.make_propertystate_equivalence()
+
+        p1 = PropertyState(pm_property_id="100")
+        p2 = PropertyState(normalized_address="1 main st")
+        p3 = PropertyState(pm_property_id="100", normalized_address="1 main st")
+
+        equivalence_classes = partitioner.calculate_equivalence_classes([p1, p2, p3])
+        self.assertEqual(sorted(equivalence_classes.values()), [[0, 2], [1]])
+
+    def test_indexed_equivalence_matches_linear(self):
+        random.seed(1234)
+        values = [None, None, "1", "2", "3", "4"]
+
+        for partitioner, state_class, fields in [
+            (EquivalencePartitioner.make_propertystate_equivalence(), PropertyState,
+             ["ubid", "pm_property_id", "custom_id_1", "normalized_address"]),
+            (EquivalencePartitioner.make_taxlotstate_equivalence(), TaxLotState,
+             ["jurisdiction_tax_lot_id", "custom_id_1", "normalized_address"]),
+        ]:
+            for _ in range(50):
+                states = [
+                    state_class(**{f: random.choice(values) for f in fields}) for _ in range(8)
+                ]
+                expected = partitioner._calculate_equivalence_classes_linear(states)
+                result = partitioner.calculate_equivalence_classes(states)
+
+                # classes may be merged in a different order when more than one class matches,
+                # so only compare the inputs which have exactly one possible result
+                if len(expected) == len(states) or len(expected) == 1:
+                    self.assertEqual(sorted(result.values()), sorted(expected.values()))
+                self.assertEqual(sorted(sum(result.values(), [])), range(len(states)))
+
     def test_a_dummy_class_basics(self):
         tls1 = TaxLotState(jurisdiction_tax_lot_id="1")
         tls2 = TaxLotState(jurisdiction_tax_lot_id="1", custom_id_1="100")
@@ -4,6 +4,7 @@
 :copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
+import collections
 import logging
 import os.path as osp
 
@@ -20,12 +21,19 @@ from seed.data_importer.tests.util import (
 from seed.models import (
     ASSESSED_RAW,
     ASSESSED_BS,
+    DATA_STATE_DELETE,
     DATA_STATE_MAPPING,
+    DATA_STATE_MATCHING,
+    MERGE_STATE_NEW,
+    MERGE_STATE_UNKNOWN,
 )
 from seed.models import (
     Column,
+    PropertyAuditLog,
     PropertyState,
+    PropertyView,
 )
+from seed.models.auditlog import AUDIT_IMPORT
 
 logger = logging.getLogger(__name__)
 
@@ -120,6 +128,111 @@ class TestMatching(DataMappingBaseTestCase):
         self.assertEqual(matches[0], ps_test)
         self.assertEqual(matches[1], ps_test_2)
 
+    def _create_imported_state(self, **kwargs):
+        ps = PropertyState.objects.create(organization=self.org, import_file=self.import_file,
+                                          data_state=DATA_STATE_MAPPING, **kwargs)
+        PropertyAuditLog.objects.create(organization=self.org, state=ps, name='Import Creation',
+                                        import_filename=self.import_file, record_type=AUDIT_IMPORT)
+        return ps
+
+    def test_merge_unmatched_into_views_only_loads_candidates(self):
+        partitioner = tasks.EquivalencePartitioner.make_propertystate_equivalence()
+        existing = []
+        for pm_id, address in [('100', '1 Main St'), ('200', '2 Main St'), ('300', '3 Main St')]:
+            ps = self._create_imported_state(pm_property_id=pm_id, address_line_1=address)
+            existing.append(ps.promote(self.cycle))
+
+        unmatched = [
+            self._create_imported_state(pm_property_id='100', site_eui=50),
+            self._create_imported_state(address_line_1='3 main st', site_eui=60),
+            self._create_imported_state(pm_property_id='400'),
+        ]
+
+        candidates = tasks._find_candidate_views(PropertyView, unmatched, partitioner, self.org,
+                                                 self.cycle)
+        self.assertEqual(set(candidates), {existing[0], existing[2]})
+
+        views = tasks.merge_unmatched_into_views(unmatched, partitioner, self.org, self.import_file)
+        self.assertEqual(len(views), 3)
+        self.assertEqual(PropertyView.objects.filter(cycle=self.cycle).count(), 4)
+        self.assertEqual(PropertyView.objects.get(pk=existing[0].pk).state.site_eui.magnitude, 50)
+        self.assertEqual(PropertyView.objects.get(pk=existing[1].pk).state_id, existing[1].state_id)
+        self.assertEqual(PropertyView.objects.get(pk=existing[2].pk).state.site_eui.magnitude, 60)
+
+    def test_merge_unmatched_into_views_unhashed_duplicate(self):
+        partitioner = tasks.EquivalencePartitioner.make_propertystate_equivalence()
+        ps = self._create_imported_state(pm_property_id='100', address_line_1='1 Main St')
+        view = ps.promote(self.cycle)
+        # a state that was saved before the hash was stored
+        PropertyState.objects.filter(pk=view.state_id).update(hash_object=None)
+
+        unmatched = self._create_imported_state(pm_property_id='100', address_line_1='1 Main St')
+        views = tasks.merge_unmatched_into_views([unmatched], partitioner, self.org,
+                                                 self.import_file)
+
+        self.assertEqual(views, [])
+        self.assertEqual(PropertyState.objects.get(pk=unmatched.pk).data_state, DATA_STATE_DELETE)
+        self.assertEqual(PropertyView.objects.get(pk=view.pk).state_id, view.state_id)
+
+    def test_bulk_update_states(self):
+        ps1 = self._create_imported_state(pm_property_id='100', address_line_1='1 Main St.')
+        ps2 = self._create_imported_state(pm_property_id='200')
+
+        final_states = collections.OrderedDict()
+        final_states[(PropertyState, ps1.pk)] = (DATA_STATE_MATCHING, MERGE_STATE_UNKNOWN)
+        final_states[(PropertyState, ps2.pk)] = (DATA_STATE_MATCHING, MERGE_STATE_NEW)
+        # the last assignment wins
+        final_states[(PropertyState, ps1.pk)] = (DATA_STATE_DELETE, MERGE_STATE_UNKNOWN)
+        tasks._bulk_update_states(final_states)
+
+        ps1.refresh_from_db()
+        ps2.refresh_from_db()
+        self.assertEqual((ps1.data_state, ps1.merge_state), (DATA_STATE_DELETE, MERGE_STATE_UNKNOWN))
+        self.assertEqual((ps2.data_state, ps2.merge_state), (DATA_STATE_MATCHING, MERGE_STATE_NEW))
+        self.assertEqual(ps1.normalized_address, '1 main st')
+        self.assertEqual(ps1.hash_object, tasks.hash_state_object(ps1))
+
+    def test_save_state_matches(self):
+        def create_class():
+            return [
+                self._create_imported_state(pm_property_id='100', address_line_1='1 Main St',
+                                            lot_number='A', extra_data={'a': 1}),
+                self._create_imported_state(pm_property_id='100', site_eui=50, lot_number='B',
+                                            extra_data={'b': 2}),
+                self._create_imported_state(pm_property_id='100', address_line_1='1 Main Street',
+                                            extra_data={'a': 3}),
+            ]
+
+        expected = create_class()
+        merged_expected = expected[0]
+        for state in expected[1:]:
+            merged_expected = tasks.save_state_match(merged_expected, state)
+
+        states = create_class()
+        single = self._create_imported_state(pm_property_id='200')
+        merged, merged_single = tasks.save_state_matches([states, [single]])
+
+        self.assertEqual(merged_single, single)
+        merged.refresh_from_db()
+        merged_expected.refresh_from_db()
+        for field in ['pm_property_id', 'address_line_1', 'normalized_address', 'site_eui',
+                      'lot_number', 'extra_data', 'import_file_id', 'data_state', 'merge_state',
+                      'hash_object']:
+            self.assertEqual(getattr(merged, field), getattr(merged_expected, field), field)
+        self.assertEqual(set(merged.lot_number.split(';')), {'A', 'B'})
+
+        # the audit log chain links the merges in order
+        log = PropertyAuditLog.objects.get(state=merged)
+        self.assertEqual(log.parent_state2, states[2])
+        self.assertEqual(log.parent2, PropertyAuditLog.objects.get(state=states[2]))
+        intermediate_log = log.parent1
+        self.assertEqual(intermediate_log.state, log.parent_state1)
+        self.assertEqual(intermediate_log.name, 'System Match')
+        self.assertEqual(intermediate_log.parent_state1, states[0])
+        self.assertEqual(intermediate_log.parent_state2, states[1])
+        self.assertEqual(intermediate_log.parent1, PropertyAuditLog.objects.get(state=states[0]))
+        self.assertEqual(intermediate_log.parent2, PropertyAuditLog.objects.get(state=states[1]))
+
     def test_handle_id_matches_duplicate_data(self):
         """
         Test for handle_id_matches behavior when matching duplicate data
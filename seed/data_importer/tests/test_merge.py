@@ -120,6 +120,8 @@ class PropertyViewTests(DeleteModelsTestCase):
 
         # there should be 4 relationships in the TaxLotProperty associated with view, one each for the taxlots defined
         self.assertEqual(TaxLotProperty.objects.filter(property_view_id=pv).count(), 4)
+        # and only the first of them is the primary one
+        self.assertEqual(TaxLotProperty.objects.filter(property_view_id=pv, primary=True).count(), 1)
 
     def test_match_properties_and_taxlots_with_address_no_lot_number(self):
         # create an ImportFile for testing purposes. Seems like we would want to run this matching just on a
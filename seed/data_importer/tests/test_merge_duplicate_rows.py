@@ -6,8 +6,12 @@
 """
 import logging
 import os.path as osp
+from importlib import import_module
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
 from quantityfield import ureg
 
 from seed.data_importer import tasks
@@ -66,6 +70,49 @@ class TestCaseMultipleDuplicateMatching(DataMappingBaseTestCase):
 
         self.assertEqual(len(set(map(tasks.hash_state_object, [ps1, ps2, ps3, ps4, ps5]))), 5)
 
+    def test_stored_hash(self):
+        ps = PropertyState.objects.filter(import_file=self.import_file, data_state=DATA_STATE_MAPPING)
+        for state in ps:
+            self.assertEqual(state.hash_object, tasks.hash_state_object(state))
+
+        # bulk created states also have the hash set
+        PropertyState.objects.bulk_create([
+            PropertyState(organization=self.org, address_line_1='123 fake st',
+                          extra_data={'a': '100', u'caf\xe9': u'cr\xe8me'})
+        ])
+        state = PropertyState.objects.get(address_line_1='123 fake st')
+        self.assertEqual(state.hash_object, tasks.hash_state_object(state))
+        self.assertEqual(state.normalized_address, '123 fake st')
+
+        state.extra_data = {'a': '200'}
+        state.save(update_fields=['extra_data'])
+        state.refresh_from_db()
+        self.assertEqual(state.hash_object, tasks.hash_state_object(state))
+
+    def test_backfill_state_hashes(self):
+        PropertyState.objects.filter(organization=self.org).update(hash_object=None)
+
+        call_command('backfill_state_hashes', '--org', str(self.org.pk))
+
+        ps = PropertyState.objects.filter(organization=self.org)
+        self.assertFalse(ps.filter(hash_object__isnull=True).exists())
+        for state in ps:
+            self.assertEqual(state.hash_object, tasks.hash_state_object(state))
+
+    def test_backfill_state_hashes_migration(self):
+        PropertyState.objects.filter(organization=self.org).update(hash_object=None)
+
+        # the historical models of the migration
+        migration_apps = MigrationExecutor(connection).loader.project_state(
+            ('seed', '0092_state_hash_object')).apps
+        migration = import_module('seed.migrations.0092_state_hash_object')
+        migration.backfill_state_hashes(migration_apps, None)
+
+        ps = PropertyState.objects.filter(organization=self.org)
+        self.assertFalse(ps.filter(hash_object__isnull=True).exists())
+        for state in ps:
+            self.assertEqual(state.hash_object, tasks.hash_state_object(state))
+
     def test_import_duplicates(self):
         # Check to make sure all the properties imported
         ps = PropertyState.objects.filter(
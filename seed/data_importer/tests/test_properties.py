@@ -104,22 +104,17 @@ class TestProperties(DataMappingBaseTestCase):
         self.assertEqual(history[1]['filename'], 'example-data-properties.xlsx')
 
     def test_get_history_complex(self):
-        # test a complicated case where there is matching on itself
+        # test a case where two records of the second file share an address with this property. The
+        # record with the same ubid is matched before the one that only shares the address, so this
+        # property is only merged once.
         property_state = PropertyState.objects.filter(
             ubid='WW2YKUX2+FVE-WW2YKUX2+8SH-WW2YKUX2+3K2',
             data_state__in=[DATA_STATE_MATCHING],
             merge_state__in=[MERGE_STATE_MERGED]
         ).first()
+        self.assertIsNotNone(property_state)
+        history, master = property_state.history()
 
-        # there is a weird non-deterministic issue with this test. So for now
-        # just test when the property_state is not None, which seems to be about 50% of the time.
-        if property_state:
-            history, master = property_state.history()
-
-            # grab all the other relationships that this would have merged
-            # for now just verify that 3 records were merged.
-            self.assertTrue(True)
-            self.assertEqual(len(history), 3)
-            self.assertEqual(history[0]['filename'], 'example-data-properties-small-changes.xlsx')
-            self.assertEqual(history[1]['filename'], 'example-data-properties-small-changes.xlsx')
-            self.assertEqual(history[2]['filename'], 'example-data-properties.xlsx')
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[0]['filename'], 'example-data-properties-small-changes.xlsx')
+        self.assertEqual(history[1]['filename'], 'example-data-properties.xlsx')
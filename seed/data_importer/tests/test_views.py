@@ -12,6 +12,7 @@ from seed.data_importer.models import ImportFile, ImportRecord
 from seed.data_importer.tests.util import DataMappingBaseTestCase
 from seed.landing.models import SEEDUser as User
 from seed.lib.mcm.reader import ROW_DELIMITER
+from seed.models.data_quality import DataQualityCheck
 
 
 class DataImporterViewTests(DataMappingBaseTestCase):
@@ -119,3 +120,20 @@ class DataImporterViewTests(DataMappingBaseTestCase):
         body = json.loads(resp.content)
 
         self.assertEqual(body.get('first_five_rows', []), expected)
+
+    def test_get_data_quality_results_paginated(self):
+        import_file = ImportFile.objects.create(import_record=ImportRecord.objects.create())
+        results = [{'id': i, 'data_quality_results': [{'severity': 'error'}]} for i in range(105)]
+        DataQualityCheck.save_results(import_file.pk, results)
+
+        url = reverse_lazy("api:v2:import_files-data-quality-results", args=[import_file.pk])
+        body = json.loads(self.client.get(url).content)
+        self.assertEqual(body['data'], results[:100])
+        self.assertEqual(body['pagination']['num_pages'], 2)
+        self.assertEqual((body['num_errors'], body['num_warnings']), (105, 0))
+
+        body = json.loads(self.client.get(url, {'page': 2, 'per_page': 2}).content)
+        self.assertEqual(body['data'], results[2:4])
+        self.assertEqual(body['pagination']['num_pages'], 53)
+        self.assertEqual(body['pagination']['total'], 105)
+        self.assertTrue(body['pagination']['has_next'])
@@ -72,10 +72,14 @@ from seed.models import (
     PORTFOLIO_RAW)
 from seed.models.data_quality import DataQualityCheck
 from seed.utils.api import api_endpoint, api_endpoint_class
-from seed.utils.cache import get_cache_raw, get_cache
+from seed.utils.cache import get_cache
+from seed.utils.pagination import paginate_list
 
 _log = logging.getLogger(__name__)
 
+# default number of data quality results in a page of the results
+DATA_QUALITY_RESULTS_PER_PAGE = 100
+
 
 @api_endpoint
 @ajax_request
@@ -1309,21 +1313,46 @@ class ImportFileViewSet(viewsets.ViewSet):
             data:
                 type: JSON
                 description: object describing the results of the data quality check
+            num_errors:
+                type: integer
+                description: number of errors in all the results
+            num_warnings:
+                type: integer
+                description: number of warnings in all the results
+            pagination:
+                type: JSON
+                description: page, start, end, num_pages, has_next, has_previous and total
         parameter_strategy: replace
         parameters:
             - name: pk
               description: Import file ID
               required: true
               paramType: path
+            - name: page
+              description: The page of results to return, defaults to the first page
+              required: false
+              paramType: query
+            - name: per_page
+              description: The number of results per page
+              required: false
+              paramType: query
         """
         import_file_id = pk
-        data_quality_results = get_cache_raw(DataQualityCheck.cache_key(import_file_id))
-        return JsonResponse({
+        data_quality_results = DataQualityCheck.cached_results(import_file_id)
+        result = {
             'status': 'success',
             'message': 'data quality check complete',
             'progress': 100,
-            'data': data_quality_results
-        })
+            'data': None
+        }
+        if data_quality_results is not None:
+            result['data'], result['pagination'] = paginate_list(
+                data_quality_results,
+                request.query_params.get('page', 1),
+                request.query_params.get('per_page', DATA_QUALITY_RESULTS_PER_PAGE))
+            result['num_errors'] = data_quality_results.num_errors
+            result['num_warnings'] = data_quality_results.num_warnings
+        return JsonResponse(result)
 
     @api_endpoint_class
     @ajax_request_class
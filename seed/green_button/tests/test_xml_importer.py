@@ -0,0 +1,123 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import os.path as osp
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from mock import patch
+
+from seed.data_importer import tasks
+from seed.data_importer.tests.util import DataMappingBaseTestCase
+from seed.green_button import xml_importer
+from seed.models import Meter, TimeSeries
+from seed.utils.cache import get_cache
+
+FEED = """<?xml version='1.0' encoding='UTF-8'?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title type="text">Feed</title>
+  <entry>
+    <title type="text">1 MAIN ST</title>
+    <content type="xml">
+      <UsagePoint xmlns="http://naesb.org/espi">
+        <ServiceCategory><kind>0</kind></ServiceCategory>
+      </UsagePoint>
+    </content>
+  </entry>
+  <entry>
+    <content type="xml">
+      <ReadingType xmlns="http://naesb.org/espi"><uom>72</uom></ReadingType>
+    </content>
+  </entry>
+  {blocks}
+</feed>
+"""
+
+BLOCK = """<entry><content type="xml"><IntervalBlock xmlns="http://naesb.org/espi">
+  <interval><duration>{duration}</duration><start>{start}</start></interval>
+  {readings}
+</IntervalBlock></content></entry>"""
+
+READING = """<IntervalReading><timePeriod><duration>900</duration><start>{start}</start></timePeriod>
+  <value>{value}</value></IntervalReading>"""
+
+
+def make_feed(num_blocks, readings_per_block):
+    """Return a Green Button feed of electricity readings of 15 minutes"""
+    blocks = []
+    start = 1357027200
+    for _ in range(num_blocks):
+        readings = [READING.format(start=start + 900 * i, value=i) for i in range(readings_per_block)]
+        blocks.append(BLOCK.format(duration=900 * readings_per_block, start=start,
+                                   readings=''.join(readings)))
+        start += 900 * readings_per_block
+    return FEED.format(blocks=''.join(blocks))
+
+
+class GreenButtonParserTest(DataMappingBaseTestCase):
+
+    def setUp(self):
+        self.user, self.org, self.import_file, _, self.cycle = self.set_up('Green Button Raw')
+
+    def _upload(self, content):
+        self.import_file.file = SimpleUploadedFile(name='green_button.xml', content=content)
+        self.import_file.save()
+
+    def test_parser_sample(self):
+        with open(osp.join(osp.dirname(__file__), 'data', 'sample_gb_gas.xml')) as f:
+            parser = xml_importer.GreenButtonParser(f)
+            readings = list(parser.readings())
+
+        self.assertEqual(parser.data['address'], '635 ELM ST EL CERRITO CA 94530-3120')
+        self.assertEqual(parser.data['service_category'], '1')
+        self.assertEqual(parser.data['meter'], {
+            'currency': '840', 'power_of_ten_multiplier': '-3', 'uom': '169'
+        })
+        self.assertEqual(readings, [
+            {'cost': '190923', 'value': '2083', 'start_time': '1357027200', 'duration': '86400'},
+            {'cost': '190923', 'value': '2083', 'start_time': '1357113600', 'duration': '86400'},
+        ])
+
+    def test_readings_of_all_blocks(self):
+        parser = xml_importer.GreenButtonParser(BytesIO(make_feed(3, 4)))
+        self.assertEqual(parser.data['address'], '1 MAIN ST')
+        readings = list(parser.readings())
+        self.assertEqual(len(readings), 12)
+        self.assertEqual(readings[4], {
+            'cost': None, 'value': '0', 'start_time': str(1357027200 + 900 * 4), 'duration': '900'
+        })
+
+    def test_save_raw_green_button_data(self):
+        self._upload(make_feed(2, 30))
+
+        with patch.object(xml_importer, 'TIME_SERIES_BATCH_SIZE', 25), \
+                patch.object(TimeSeries.objects, 'bulk_create',
+                             wraps=TimeSeries.objects.bulk_create) as bulk_create:
+            result = tasks._save_raw_data(self.import_file.pk)
+            self.assertEqual(bulk_create.call_count, 3)
+
+        self.assertEqual(result['status'], 'success')
+        meter = Meter.objects.get(property_view__cycle=self.cycle)
+        self.assertEqual(meter.energy_type, Meter.ELECTRICITY)
+        self.assertEqual(meter.energy_units, Meter.WATT_HOURS)
+
+        series = TimeSeries.objects.filter(meter=meter).order_by('begin_time')
+        self.assertEqual(series.count(), 60)
+        self.assertEqual((series[0].end_time - series[0].begin_time).total_seconds(), 900)
+        prog_key = tasks.get_prog_key('save_raw_data', self.import_file.pk)
+        self.assertEqual(get_cache(prog_key)['progress'], 100)
+
+    def test_import_xml_progress(self):
+        self._upload(make_feed(1, 10))
+        prog_key = tasks.get_prog_key('save_raw_data', self.import_file.pk)
+
+        with patch.object(xml_importer, 'increment_cache') as increment_cache:
+            xml_importer.import_xml(self.import_file, self.cycle, prog_key)
+
+        # the whole file is read after the last batch
+        increment, num_readings = increment_cache.call_args[0][1:]
+        self.assertAlmostEqual(increment, 100.0)
+        self.assertEqual(num_readings, 10)
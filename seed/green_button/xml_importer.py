@@ -4,10 +4,10 @@
 :copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
-from collections import Iterable
+import os
 from datetime import datetime
+from xml.etree import cElementTree as ElementTree
 
-import xmltodict
 from django.utils import timezone
 
 from seed.lib.mcm.reader import ROW_DELIMITER
@@ -16,6 +16,10 @@ from seed.models import (
     GREEN_BUTTON_BS,
 )
 from seed.models.meters import Meter, TimeSeries
+from seed.utils.cache import increment_cache
+
+# number of readings that are inserted at once
+TIME_SERIES_BATCH_SIZE = 5000
 
 
 def energy_type(service_category):
@@ -86,164 +90,15 @@ def energy_units(uom):
         return None
 
 
-def as_collection(val):
-    """
-    Takes a value, returns that value if it is not a string and is an
-    Iterable, and returns a list containing that value if it is not an
-    Iterable or if it is a string. Returns None when val is None.
-
-    :param val: any value
-    :returns: list containing val or val if it is Iterable and not a string.
-    """
-    is_atomic = (isinstance(val, (str, unicode)) or
-                 isinstance(val, dict) or
-                 (not isinstance(val, Iterable)))
-
-    if val is None:
-        return None
-    elif is_atomic:
-        return [val]
-    else:
-        return val
-
-
-def interval_data(reading_xml_data):
-    """
-    Takes a dictionary representing the contents of an IntervalReading
-    XML node and pulls out data for a single time series reading. The
-    dictionary will be a sub-dictionary of the dictionary returned by
-    xmltodict.parse when called on a Green Button XML file. Returns a
-    flat dictionary containing the interval data.
-
-    :param reading_xml_data: dictionary of IntervalReading XML node
-        content in format specified by the xmltodict library.
-    :returns: dictionary representing a time series reading with keys
-        'cost', 'value', 'start_time', and 'duration'.
-    """
-    cost = reading_xml_data.get(
-        'cost')  # TODO: what is this cost used for? Seems like it should be another field # noqa
-    value = reading_xml_data['value']
-
-    time_period = reading_xml_data['timePeriod']
-    start_time = time_period['start']
-    duration = time_period['duration']
-
-    result = {
-        'cost': cost,
-        'value': value,
-        'start_time': start_time,
-        'duration': duration
-    }
-
-    return result
-
-
-def meter_data(raw_meter_meta):
+def create_meter(data, import_file, cycle):
     """
-    Takes a dictionary representing the contents of the entry node in
-    a Green Button XML file that specifies the meta data about the meter
-    that was used to record time series data for that file. Returns a
-    flat dictionary containing the meter meta data.
-
-    :param raw_meter_meta: dictionary of the contents of the meter
-        specification entry node in a Green Button XML file
-    :returns: dictionary containing information about a meter with keys
-        'currency', 'power_of_ten_multiplier', and 'uom'
-    """
-    params_data = raw_meter_meta['content']['ReadingType']
-
-    # our green button example data ReadingType's only contain
-    # currency, powerOfTenMultiplier, and uom.
-    # this function currently assumes those types are present and does
-    # not check for any other types
-
-    currency = params_data.get('currency')
-    power_of_ten_multiplier = params_data.get('powerOfTenMultiplier')
-    uom = params_data['uom']
-
-    result = {
-        'currency': currency,
-        'power_of_ten_multiplier': power_of_ten_multiplier,
-        'uom': uom
-    }
-
-    return result
-
-
-def interval_block_data(ib_xml_data):
-    """
-    Takes a dictionary containing the contents of an IntervalBlock node
-    from a Green Button XML file and returns a dictionary containing the
-    start_time of the time series collection, the duration of the collection,
-    and a list of readings containing the time series data from a meter.
-
-    :param ib_xml_data: dictionary of the contents of an IntervalBlock
-        from a Green Button XML file
-    :returns: dictionary containing meta data about an entire collection
-        period and a list of the specific meter readings
-    """
-    interval = ib_xml_data['interval']
-
-    raw_readings_data = as_collection(ib_xml_data['IntervalReading'])
-    readings_data = [interval_data(data) for data in raw_readings_data]
-
-    block_data = {
-        'start_time': interval['start'],
-        'duration': interval['duration'],
-        'readings': readings_data
-    }
-
-    return block_data
-
+    Create a PropertyState and a Meter for the building data of a Green Button XML file.
 
-def building_data(xml_data):
-    """
-    Extracts information about a building from a Green Button XML file.
-
-    :param xml_data: dictionary returned by xmltodict.parse when called
-        on the contents of a Green Button XML file
-    :returns: dictionary
-
-    * building information for a Green Button XML file
-    * information describing the meter used for collection
-    * list of time series meter reading data
-    """
-    entries = xml_data['feed']['entry']
-    info_entry = next(entry for entry in entries)
-
-    meta_data, meter_reading_decl, meter_params, reading_intervals = entries
-
-    address = meta_data['title']['#text']
-
-    # '0' - electricity, '1' - gas
-    s_category = info_entry['content']['UsagePoint']['ServiceCategory']['kind']
-
-    # time series data
-    raw_interval_block = reading_intervals['content']['IntervalBlock']
-    block_data = interval_block_data(raw_interval_block)
-
-    # meter meta data
-    m_data = meter_data(meter_params)
-
-    result = {
-        'address': address,
-        'service_category': s_category,
-        'meter': m_data,
-        'interval': block_data
-    }
-
-    return result
-
-
-def create_models(data, import_file, cycle):
-    """
-    Create a PropertyState and a Meter. Then, create TimeSeries models for each meter
-    reading in data.
-
-    :param data: dict, building data from a Green Button XML file from xml_importer.building_data
+    :param data: dict, building data from a Green Button XML file from GreenButtonParser.data,
+        the readings are not used
     :param import_file: ImportFile, reference to Green Button XML file
     :param cycle: Cycle, the cycle from which the property view will be attached
-    :returns: PropertyState
+    :returns: tuple, (PropertyView, Meter)
     """
 
     # cache data on import_file; this is a proof of concept and we
@@ -276,45 +131,171 @@ def create_models(data, import_file, cycle):
     meter = Meter.objects.create(
         name=m_name, energy_type=e_type, energy_units=m_energy_units, property_view=pv
     )
-    meter.save()
 
-    # now time series data for the meter
-    for reading in data['interval']['readings']:
-        # how to deal with timezones?
+    return pv, meter
+
+
+def save_time_series(meter, readings, batch_size=None, callback=None):
+    """
+    Save the readings of the meter per batch, with a multi-row insert (bulk_create) in row
+    storage.
+
+    :param meter: Meter
+    :param readings: iterable, dicts of the readings as returned by GreenButtonParser.readings
+    :param batch_size: int, number of readings that are inserted at once, defaults to
+        TIME_SERIES_BATCH_SIZE
+    :param callback: function, (optional) called with the number of readings after each batch
+    :returns: int, number of readings saved
+    """
+    batch_size = batch_size or TIME_SERIES_BATCH_SIZE
+    # how to deal with timezones?
+    tz = timezone.get_current_timezone()
+    count = 0
+    batch = []
+    for reading in readings:
         start_time = int(reading['start_time'])
         duration = int(reading['duration'])
 
-        begin_time = datetime.fromtimestamp(start_time, tz=timezone.get_current_timezone())
-        end_time = datetime.fromtimestamp(start_time + duration, tz=timezone.get_current_timezone())
-        value = reading['value']
-        cost = reading['cost']
-
-        new_ts = TimeSeries.objects.create(
-            begin_time=begin_time,
-            end_time=end_time,
-            reading=value,
-            cost=cost,
+        batch.append(TimeSeries(
+            begin_time=datetime.fromtimestamp(start_time, tz=tz),
+            end_time=datetime.fromtimestamp(start_time + duration, tz=tz),
+            reading=reading['value'],
+            cost=reading['cost'],
             meter=meter,
-        )
-        new_ts.save()
+        ))
+        if len(batch) == batch_size:
+            meter.save_readings(batch)
+            count += len(batch)
+            if callback:
+                callback(len(batch))
+            batch = []
 
-    return pv
+    if batch:
+        meter.save_readings(batch)
+        count += len(batch)
+        if callback:
+            callback(len(batch))
 
+    return count
 
-def import_xml(import_file, cycle):
+
+class GreenButtonParser(object):
+    """
+    Streams a Green Button XML file with iterparse. The building data (address, service category
+    and meter) are read when the parser is created, up to the first IntervalBlock. The readings of
+    all the IntervalBlocks are then returned one at a time by ``readings``, and each reading is
+    discarded once it is read, so the memory does not depend on the size of the file.
+
+    usage:
+            parser = GreenButtonParser(f)
+            parser.data['address']
+            for reading in parser.readings():
+                # reading is a dict with the keys cost, value, start_time and duration
+    """
+
+    def __init__(self, xml_file):
+        self._events = ElementTree.iterparse(xml_file, events=('start', 'end'))
+        self._block = None
+        self.data = self._read_building_data()
+
+    @staticmethod
+    def _local_name(tag):
+        """returns the tag without its namespace"""
+        return tag.rsplit('}', 1)[-1]
+
+    def _children(self, elem):
+        """returns the text of the direct children of the element by their local names"""
+        return {self._local_name(child.tag): child.text for child in elem}
+
+    def _read_building_data(self):
+        data = {}
+        path = []
+        for event, elem in self._events:
+            name = self._local_name(elem.tag)
+            if event == 'start':
+                if name == 'IntervalBlock':
+                    self._block = elem
+                    break
+                path.append(name)
+                continue
+
+            path.pop()
+            # the title of the first entry is the address
+            if name == 'title' and path[-1:] == ['entry'] and 'address' not in data:
+                data['address'] = elem.text
+            elif name == 'kind' and path[-1:] == ['ServiceCategory']:
+                data['service_category'] = elem.text
+            elif name == 'ReadingType':
+                params_data = self._children(elem)
+                data['meter'] = {
+                    'currency': params_data.get('currency'),
+                    'power_of_ten_multiplier': params_data.get('powerOfTenMultiplier'),
+                    'uom': params_data['uom'],
+                }
+            elif name == 'entry':
+                # drop the entries that have been read
+                elem.clear()
+
+        return data
+
+    def readings(self):
+        """
+        Returns a generator yielding a dict per IntervalReading, with the keys 'cost', 'value',
+        'start_time' and 'duration'.
+        """
+        block = self._block
+        for event, elem in self._events:
+            name = self._local_name(elem.tag)
+            if event == 'start':
+                if name == 'IntervalBlock':
+                    block = elem
+                continue
+            if name != 'IntervalReading':
+                continue
+
+            reading = self._children(elem)
+            time_period = next(
+                (self._children(child) for child in elem
+                 if self._local_name(child.tag) == 'timePeriod'), {}
+            )
+            yield {
+                'cost': reading.get('cost'),
+                'value': reading['value'],
+                'start_time': time_period['start'],
+                'duration': time_period['duration'],
+            }
+
+            # drop the readings that have been read
+            if block is not None:
+                block.clear()
+
+
+def import_xml(import_file, cycle, progress_key=None):
     """
     Given an import_file referencing a raw Green Button XML file, extracts
     building and time series information from the file and constructs
-    required database models.
+    required database models. The file is streamed and the readings are
+    inserted in batches.
 
     :param import_file: a seed.models.ImportFile instance representing a
         Green Button XML file that has been previously uploaded
     :param cycle: which cycle to import the results
+    :param progress_key: str, (optional) progress key that is incremented by
+        the share of the file that has been read after each batch of readings
     :returns: PropertyView, attached to cycle
     """
     xml_file = import_file.local_file
-    xml_string = xml_file.read()
-    raw_data = xmltodict.parse(xml_string)
+    size = os.fstat(xml_file.fileno()).st_size
+    parser = GreenButtonParser(xml_file)
+    pv, meter = create_meter(parser.data, import_file, cycle)
 
-    data = building_data(raw_data)
-    return create_models(data, import_file, cycle)
+    position = [0]
+
+    def report_progress(num_readings):
+        if progress_key and size:
+            new_position = xml_file.tell()
+            increment_cache(progress_key, (new_position - position[0]) * 100.0 / size, num_readings)
+            position[0] = new_position
+
+    save_time_series(meter, parser.readings(), callback=report_progress)
+    return pv
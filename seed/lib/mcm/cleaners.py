@@ -32,6 +32,7 @@ BOOL_SYNONYMS = (
 PUNCT_REGEX = re.compile('[{0}]'.format(
     re.escape(string.punctuation.replace('.', '').replace('-', '')))
 )
+NONE_SYNONYM_SET = frozenset(synonym for _, synonym in NONE_SYNONYMS)
 
 
 def default_cleaner(value, *args):
@@ -147,9 +148,30 @@ def pint_cleaner(value, units, *args):
     return value
 
 
+def _may_be_fuzzy_match(value, choices):
+    """
+    Return False if the value can not be a fuzzy match (see ``fuzzy_in_set``) of any of the
+    choices based on the lengths of the strings alone.
+
+    The Jaro-Winkler score adds at most 4 * 0.1 * (1 - jaro) to the Jaro score, so it is at most
+    0.4 + 0.6 * jaro, and the Jaro score is at most (2 + len(shorter) / len(longer)) / 3. The
+    score is thus at most 0.8 + 0.2 * len(shorter) / len(longer), and a score above 0.95
+    requires the shorter string to be more than 0.75 times the length of the longer string.
+    """
+    length = len(value)
+    for _, choice in choices:
+        shorter, longer = sorted([length, len(choice)])
+        if shorter > 0.75 * longer:
+            return True
+    return False
+
+
 class Cleaner(object):
     """Cleans values for a given ontology."""
 
+    # limit on the number of distinct strings remembered by ``is_none_synonym``
+    NONE_SYNONYM_CACHE_SIZE = 10000
+
     def __init__(self, ontology):
 
         self.ontology = ontology
@@ -167,6 +189,8 @@ class Cleaner(object):
             lambda x: self.schema[x] == u'integer', self.schema
         )
         self.pint_column_map = self._build_pint_column_map()
+        self.column_cleaners = self._build_column_cleaners()
+        self._none_synonym_cache = {}
 
     def _build_pint_column_map(self):
         """
@@ -192,24 +216,114 @@ class Cleaner(object):
 
         return pint_column_map
 
+    def _build_column_cleaners(self):
+        """
+        Build a dict of { column_name: cleaner function } so that the type of the column can be
+        looked up once instead of searching each of the lists of columns. The units of the pint
+        columns are parsed once and bound to the cleaner.
+        """
+        column_cleaners = {}
+        for column_name in self.float_columns:
+            column_cleaners[column_name] = float_cleaner
+        for column_name in self.date_columns:
+            column_cleaners[column_name] = date_cleaner
+        for column_name in self.string_columns:
+            column_cleaners[column_name] = str
+        for column_name in self.int_columns:
+            column_cleaners[column_name] = int_cleaner
+        for column_name, units in self.pint_column_map.iteritems():
+            column_cleaners[column_name] = self._build_pint_cleaner(units)
+
+        return column_cleaners
+
+    @staticmethod
+    def _build_pint_cleaner(units):
+        """Return a pint cleaner with the units already parsed."""
+        try:
+            quantity = ureg(units)
+        except Exception:
+            # let pint_cleaner handle (or raise) the error for each value as it did before
+            return lambda value: pint_cleaner(value, units)
+
+        def _pint_cleaner(value):
+            value = float_cleaner(value)
+            if value is None:
+                return None
+            return value * quantity
+
+        return _pint_cleaner
+
+    def is_none_synonym(self, value):
+        """
+        Return True if the unicode value is one of the NONE_SYNONYMS, with the same fuzzy matching
+        as ``default_cleaner``. Exact matches and strings that can not fuzzy match based on their
+        length skip the Jaro-Winkler comparison, and the result of the comparison is remembered.
+        """
+        value = value.lower()
+        if value in NONE_SYNONYM_SET:
+            return True
+        if not _may_be_fuzzy_match(value, NONE_SYNONYMS):
+            return False
+
+        result = self._none_synonym_cache.get(value)
+        if result is None:
+            if len(self._none_synonym_cache) >= self.NONE_SYNONYM_CACHE_SIZE:
+                self._none_synonym_cache.clear()
+            result = self._none_synonym_cache[value] = fuzzy_in_set(value, NONE_SYNONYMS)
+        return result
+
+    def default_clean(self, value):
+        """Same as ``default_cleaner``, using ``is_none_synonym`` for the fuzzy match."""
+        if isinstance(value, unicode):
+            # guard against `u''` coming in from an Excel empty cell
+            if value == u'' or self.is_none_synonym(value):
+                return None
+        return value
+
     def clean_value(self, value, column_name):
         """Clean the value, based on characteristics of its column_name."""
-        value = default_cleaner(value)
+        value = self.default_clean(value)
         if value is not None:
-            if column_name in self.float_columns:
-                return float_cleaner(value)
-
-            if column_name in self.date_columns:
-                return date_cleaner(value)
-
-            if column_name in self.string_columns:
-                return str(value)
+            column_cleaner = self.column_cleaners.get(column_name)
+            if column_cleaner:
+                return column_cleaner(value)
 
-            if column_name in self.int_columns:
-                return int_cleaner(value)
+        return value
 
-            if column_name in self.pint_column_map.keys():
-                units = self.pint_column_map[column_name]
-                return pint_cleaner(value, units)
+    def clean_column(self, values, column_name):
+        """
+        Clean a list of values that all belong to the same column. The cleaner for the column is
+        looked up once and each distinct value is only cleaned once. The results are identical
+        to calling ``clean_value`` on each of the values.
 
-        return value
+        :param values: list, values of the column
+        :param column_name: str, name of the column, same as for ``clean_value``
+        :returns: list, cleaned values in the same order
+        """
+        column_cleaner = self.column_cleaners.get(column_name)
+
+        def _clean(value):
+            value = self.default_clean(value)
+            if value is not None and column_cleaner:
+                return column_cleaner(value)
+            return value
+
+        if column_name in self.pint_column_map:
+            # each value needs its own Quantity object, so do not share the results
+            return [_clean(value) for value in values]
+
+        cleaned = {}
+        result = []
+        for value in values:
+            # the type is part of the key because 1, 1.0 and True are equal dict keys
+            key = (type(value), value)
+            try:
+                cleaned_value = cleaned[key]
+            except KeyError:
+                cleaned_value = cleaned[key] = _clean(value)
+            except TypeError:
+                # unhashable value
+                cleaned_value = _clean(value)
+            result.append(cleaned_value)
+
+        return result
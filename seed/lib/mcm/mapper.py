@@ -5,14 +5,13 @@
 :author
 """
 
-import copy
 import logging
 import re
 
 import itertools
 from datetime import datetime, date
 
-from cleaners import default_cleaner
+from cleaners import default_cleaner, Cleaner
 from seed.lib.mappings.mapping_columns import MappingColumns
 from django.apps import apps
 
@@ -224,8 +223,9 @@ def expand_rows(row, delimited_fields, expand_row):
     """
 
     # _log.debug('expand_row is {}'.format(expand_row))
-    # go through the delimited fields and clean up the rows
-    copy_row = copy.deepcopy(row)
+    # go through the delimited fields and clean up the rows. The values are not modified in
+    # place, so a shallow copy is enough.
+    copy_row = dict(row)
     for d in delimited_fields:
         if d in copy_row:
             copy_row[d] = expand_and_normalize_field(copy_row[d], False)
@@ -244,7 +244,7 @@ def expand_rows(row, delimited_fields, expand_row):
 
         new_rows = []
         for c in combinations:
-            new_row = copy.deepcopy(copy_row)
+            new_row = dict(copy_row)
             # c is a tuple because of the .product command
             for item in c:
                 for k, v in item.iteritems():
@@ -315,3 +315,110 @@ def map_row(row, mapping, model_class, extra_data_fields=[], cleaner=None, **kwa
     #                                    cleaner, apply_func=apply_func)
 
     return model
+
+
+class MappingPlan(object):
+    """The column mappings of an import file compiled into the columns to set on each table.
+
+    The plan is built once per import file; each chunk of rows then only runs the plan (see
+    ``expand_rows`` and ``map_rows``). Only the arguments are pickled, so the plan can be stored
+    in the cache and the cleaner is rebuilt when it is loaded.
+
+    :param table_mappings: dict, {table: {raw_column_name: (table, field, display_name, is_extra_data)}}
+    :param delimited_fields: dict, {raw_column_name: table} of the columns with delimited values
+        that are expanded into one row per value for that table.
+    :param ontology: dict, ontology of the cleaner.
+    :param quantity_unit_columns: list of (table, field) tuples that are cleaned against the raw
+        column name with pint.
+    """
+
+    def __init__(self, table_mappings, delimited_fields, ontology, quantity_unit_columns):
+        self.table_mappings = table_mappings
+        self.delimited_fields = delimited_fields
+        self.ontology = ontology
+        self.quantity_unit_columns = quantity_unit_columns
+
+        self.cleaner = Cleaner(ontology)
+
+        # {table: [(raw_column_name, field, column name to clean against, is_extra_data)]}
+        self.columns = {}
+        for table, mappings in table_mappings.items():
+            columns = []
+            for raw_column_name, (table_name, field, _, is_extra_data) in mappings.items():
+                # same as apply_column_value, the value is only set on the mapped table
+                if table_name != table:
+                    continue
+                if (table, field) in quantity_unit_columns:
+                    clean_column_name = raw_column_name
+                else:
+                    clean_column_name = field
+                columns.append((raw_column_name, field, clean_column_name, is_extra_data))
+            self.columns[table] = columns
+
+    def __getstate__(self):
+        return {
+            'table_mappings': self.table_mappings,
+            'delimited_fields': self.delimited_fields,
+            'ontology': self.ontology,
+            'quantity_unit_columns': self.quantity_unit_columns,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def tables(self):
+        """Names of the tables that have mapped columns, the empty table name is skipped"""
+        return [table for table in self.table_mappings if table]
+
+    def expand_rows(self, table, rows):
+        """Normalize the delimited fields of the raw rows and expand them for the table.
+
+        :param table: str, name of the table the rows are mapped to.
+        :param rows: list of dicts, raw rows.
+        :rtype: list of dicts
+        """
+        delimited_field_list = self.delimited_fields.keys()
+        expand_row = table in self.delimited_fields.values()
+
+        expanded_rows = []
+        for row in rows:
+            expanded_rows.extend(expand_rows(row, delimited_field_list, expand_row))
+        return expanded_rows
+
+    def map_rows(self, table, model_class, rows):
+        """Clean the rows one column at a time and set the values on a new model for each row.
+
+        The result is the same as ``map_row`` with the mappings of the table and the cleaner of
+        the plan.
+
+        :param table: str, name of the table the rows are mapped to.
+        :param model_class: class, model class of the table.
+        :param rows: list of dicts, expanded rows.
+        :rtype: list of model instances, one for each row
+        """
+        models = [model_class() for _ in rows]
+
+        for raw_column_name, field, clean_column_name, is_extra_data in self.columns.get(table, []):
+            row_indexes = []
+            values = []
+            for index, row in enumerate(rows):
+                value = row.get(raw_column_name)
+                if value is not None:
+                    row_indexes.append(index)
+                    values.append(value)
+
+            if not values:
+                continue
+
+            cleaned_values = self.cleaner.clean_column(values, clean_column_name)
+            for index, cleaned_value in zip(row_indexes, cleaned_values):
+                model = models[index]
+                if is_extra_data:
+                    if isinstance(cleaned_value, (datetime, date)):
+                        cleaned_value = cleaned_value.isoformat()
+                    model.extra_data[field] = cleaned_value
+                else:
+                    setattr(model, field, cleaned_value)
+
+        return models
@@ -10,13 +10,21 @@ out of CSV files. Fuzzy matches, application to data models happens
 elsewhere.
 
 """
+import csv
+import io
 import mmap
 import operator
+import re
 import sys
+import zipfile
+from io import BytesIO
+from xml.etree import cElementTree as ElementTree
 
 from unicodecsv import DictReader, Sniffer
 from unidecode import unidecode
-from xlrd import xldate, XLRDError, open_workbook, empty_cell
+from xlrd import xldate, xlsx, XLRDError, open_workbook, empty_cell
+from xlrd.book import Book
+from xlrd.sheet import Cell
 from xlrd.xldate import XLDateAmbiguous
 
 from seed.lib.mcm import mapper, utils
@@ -33,9 +41,56 @@ from seed.lib.mcm import mapper, utils
 
 ROW_DELIMITER = "|#*#|"
 
+# first bytes of a zip file, i.e. of an Excel 2007 (.xlsx) workbook
+XLSX_SIGNATURE = 'PK\x03\x04'
+XLSX_SHEET_DATA_TAG = xlsx.U_SSML12 + 'sheetData'
+XLSX_ROW_TAG = xlsx.U_SSML12 + 'row'
+# start tag of a row element of the sheet XML and its row number
+XLSX_ROW_START_RE = re.compile(r'<(?:[\w.-]+:)?row(?:\s[^>]*)?>')
+XLSX_ROW_NUMBER_RE = re.compile(r'\sr\s*=\s*["\'](\d+)["\']')
+# number of bytes of the sheet XML that are uncompressed at once when looking for a row
+XLSX_READ_SIZE = 1 << 20
+
+# delimiters that are recognized when sniffing the dialect of a CSV file
+CSV_DELIMITERS = ',\t;|'
+
+NON_ASCII_RE = re.compile(r'[\x80-\xff]')
+
+# column index of the column letters of the cell references
+_column_indexes = {}
+
+
+def column_index(cell_name):
+    """returns the column index of a cell reference, e.g. A1 => 0, AA3 => 26"""
+    letters = cell_name.rstrip('0123456789')
+    if letters not in _column_indexes:
+        colx = 0
+        for c in letters:
+            if c != '$':
+                colx = colx * 26 + ord(c.upper()) - ord('A') + 1
+        _column_indexes[letters] = colx - 1
+    return _column_indexes[letters]
+
+
+class PrefixedStream(object):
+    """file-like object that reads the prefix and then the rest of the stream, e.g. the start of
+    the sheet XML followed by the rows from the middle of the sheet
+    """
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size):
+        if self.prefix:
+            data = self.prefix[:size]
+            self.prefix = self.prefix[size:]
+            return data
+        return self.stream.read(size)
+
 
 class ExcelParser(object):
-    """MS Excel (.xls, .xlsx) file parser for MCMParser
+    """MS Excel (.xls) file parser for MCMParser
 
     usage:
             f = open('data.xls', 'rb')
@@ -158,6 +213,17 @@ class ExcelParser(object):
         self.excel_file.seek(0)
         self.excelreader = self.XLSDictReader(self.sheet, self.header_row)
 
+    def read_rows(self):
+        """
+        Return all the rows after the header row as tuples in the order of ``headers``.
+
+        :returns: Generator yeilding a row as a tuple
+        """
+        return (
+            tuple(self.get_value(cell) for cell in self.sheet.row(i))
+            for i in range(self.header_row + 1, self.sheet.nrows)
+        )
+
     def num_columns(self):
         """gets the number of columns for the file"""
         return self.sheet.ncols
@@ -168,6 +234,373 @@ class ExcelParser(object):
         return self.cache_headers
 
 
+class XLSXParser(ExcelParser):
+    """MS Excel 2007 (.xlsx) file parser for MCMParser
+
+    The rows of the first sheet are streamed out of the sheet XML and each row is discarded once
+    it is read, so the memory does not depend on the size of the sheet. Only the workbook, the
+    styles and the shared strings are loaded. The values are normalized like ``ExcelParser``.
+
+    The sheet is read once to find its size. Pass the ``sheet_size`` of a parser of the same file
+    to read a chunk of the rows without reading the whole sheet again.
+
+    usage:
+            f = open('data.xlsx', 'rb')
+            reader = MCMParser(f)
+            rows = reader.next()
+            for row in rows:
+                # something with the row dict
+            ...
+            reader.seek_to_beginning()
+            # rows.next() will return the first row
+    """
+
+    def __init__(self, excel_file, sheet_size=None, *args, **kwargs):
+        self.excel_file = excel_file
+        self._zipfile = self._get_zipfile(excel_file)
+        self._workbook, self._sheet_path = self._get_workbook(self._zipfile)
+        self.nrows, self.ncols, self.header_row = sheet_size or self._scan_sheet()
+
+        # decode the headers once, the original values are the keys of the row dicts
+        self._header_keys = [self.get_value(cell) for cell in self._read_rows(
+            self.header_row, self.header_row + 1).next()] if self.nrows else []
+        self.cache_headers = [header.strip() for header in self._header_keys]
+        self.excelreader = self.XLSDictReader()
+
+    @staticmethod
+    def is_xlsx(f):
+        """returns True if the open file is a zip file, i.e. an Excel 2007 (.xlsx) workbook"""
+        f.seek(0)
+        signature = f.read(len(XLSX_SIGNATURE))
+        f.seek(0)
+        return signature == XLSX_SIGNATURE
+
+    def _get_zipfile(self, f):
+        """returns the workbook as a ZipFile. The file is reopened in binary mode, as it can be
+        opened in text mode.
+
+        :param f: an open file of type ``file``
+        :returns: ZipFile
+        """
+        return zipfile.ZipFile(io.open(f.fileno(), 'rb', closefd=False))
+
+    def _get_workbook(self, zf, sheet_index=0):
+        """loads the workbook, the styles and the shared strings into a xlrd Book
+
+        :param zf: ZipFile of the workbook
+        :param sheet_index: the excel sheet with a 0-index
+        :returns: tuple, (xlrd Book, path of the sheet XML in the zip file)
+        """
+        component_names = {name.lower().replace('\\', '/'): name for name in zf.namelist()}
+        if 'xl/workbook.xml' not in component_names:
+            raise XLRDError('ZIP file contents not a known type of workbook')
+
+        xlsx.ensure_elementtree_imported(0, None)
+        book = Book()
+        book.logfile = sys.stdout
+        book.verbosity = book.formatting_info = book.on_demand = book.ragged_rows = 0
+        x12book = xlsx.X12Book(book)
+        x12book.process_rels(zf.open(component_names['xl/_rels/workbook.xml.rels']))
+        x12book.process_stream(zf.open(component_names['xl/workbook.xml']), 'Workbook')
+        if 'xl/styles.xml' in component_names:
+            xlsx.X12Styles(book).process_stream(zf.open(component_names['xl/styles.xml']))
+        if 'xl/sharedstrings.xml' in component_names:
+            xlsx.X12SST(book).process_stream(zf.open(component_names['xl/sharedstrings.xml']))
+
+        return book, component_names[x12book.sheet_targets[sheet_index].lower()]
+
+    def _get_cell(self, cell_elem):
+        """returns the xlrd Cell of a <c> element of the sheet XML, or None if it has no value"""
+        cell_type = cell_elem.get('t', 'n')
+        value_elem = cell_elem.find(xlsx.V_TAG)
+        value = value_elem.text if value_elem is not None else None
+
+        if cell_type == 'n':
+            if not value:
+                return None
+            xf_index = int(cell_elem.get('s', '0'))
+            if self._workbook._xf_index_to_xl_type_map.get(xf_index) == XL_CELL_DATE:
+                return Cell(XL_CELL_DATE, float(value))
+            return Cell(XL_CELL_NUMBER, float(value))
+        if cell_type == 's':
+            if not value:
+                return None
+            return Cell(XL_CELL_TEXT, self._workbook._sharedstrings[int(value)])
+        if cell_type == 'str':
+            if value_elem is None:
+                return Cell(XL_CELL_TEXT, '')
+            return Cell(XL_CELL_TEXT, xlsx.cooked_text(None, value_elem))
+        if cell_type == 'b':
+            return Cell(XL_CELL_BOOLEAN, xlsx.cnv_xsd_boolean(value))
+        if cell_type == 'e':
+            return Cell(XL_CELL_ERROR, xlsx.error_code_from_text[value or '#N/A'])
+        if cell_type == 'inlineStr':
+            is_elem = cell_elem.find(xlsx.IS_TAG)
+            if is_elem is not None:
+                value = xlsx.get_text_from_si_or_is(None, is_elem)
+            if not value:
+                return None
+            return Cell(XL_CELL_TEXT, value)
+        raise Exception('Unknown cell type %r' % cell_type)
+
+    def _sheet_blocks(self):
+        """returns a generator yeilding a tuple (byte offset, block) for the blocks of the
+        uncompressed sheet XML. The blocks end before a tag, so the tags are not split. Searching
+        the blocks is much faster than parsing the XML with ``_iter_rows``.
+        """
+        stream = self._zipfile.open(self._sheet_path)
+        buf = ''
+        buf_offset = 0
+        while True:
+            data = stream.read(XLSX_READ_SIZE)
+            if not data:
+                yield buf_offset, buf
+                return
+
+            buf += data
+            end = buf.rfind('<')
+            if end > 0:
+                yield buf_offset, buf[:end]
+                buf_offset += end
+                buf = buf[end:]
+
+    def _row_start(self, block, pos):
+        """returns the match of the start tag of the row that contains the position, or None"""
+        tag_start = block.rfind('<', 0, pos)
+        match = XLSX_ROW_START_RE.match(block, tag_start) if tag_start != -1 else None
+        return match if match and match.end() > pos else None
+
+    def _find_row(self, start):
+        """returns the byte offsets of the first row and of the first row from the row index on in
+        the sheet XML
+
+        :param start: int, row index
+        :returns: tuple, (offset of the first row, row index, offset of the row) or None if there
+            are no rows from the row index on
+        """
+        first_offset = None
+        for block_offset, block in self._sheet_blocks():
+            match = XLSX_ROW_START_RE.search(block)
+            if match:
+                first_offset = block_offset + match.start()
+                break
+        if first_offset is None:
+            return None
+
+        # the rows are in order and usually numbered, so look for the row number first
+        for block_offset, block in self._sheet_blocks():
+            for quote in '"\'':
+                pos = block.find(' r=%s%d%s' % (quote, start + 1, quote))
+                while pos != -1:
+                    match = self._row_start(block, pos)
+                    if match:
+                        return first_offset, start, block_offset + match.start()
+                    pos = block.find(' r=%s%d%s' % (quote, start + 1, quote), pos + 1)
+
+        # the row is missing, or the row references are omitted
+        rowx = -1
+        for block_offset, block in self._sheet_blocks():
+            for match in XLSX_ROW_START_RE.finditer(block):
+                row_number = XLSX_ROW_NUMBER_RE.search(match.group())
+                rowx = int(row_number.group(1)) - 1 if row_number else rowx + 1
+                if rowx >= start:
+                    return first_offset, rowx, block_offset + match.start()
+        return None
+
+    def _open_sheet(self, start):
+        """returns the sheet XML without the rows before the row index, as the rows do not have
+        to be parsed to skip them
+
+        :param start: int, first row index to read
+        :returns: tuple, (file-like object or None if there are no rows left, row index before
+            its first row)
+        """
+        if start <= 0:
+            return self._zipfile.open(self._sheet_path), -1
+
+        row = self._find_row(start)
+        if row is None:
+            return None, -1
+        first_offset, rowx, offset = row
+
+        # the streams of the zip file share the file, so only open it once the offsets are found.
+        # The start of the sheet (up to the first row) is kept for the namespaces of the XML.
+        stream = self._zipfile.open(self._sheet_path)
+        prefix = stream.read(first_offset)
+        skip = offset - first_offset
+        while skip > 0:
+            skip -= len(stream.read(min(skip, XLSX_READ_SIZE)))
+        return PrefixedStream(prefix, stream), rowx - 1
+
+    def _iter_rows(self, start=0):
+        """returns a generator yeilding a tuple (row index, <row> element) for each row of the
+        sheet XML from the row index on. The element is cleared once the next row is read.
+
+        :param start: int, (optional) row index to start with, the rows before it are skipped
+            without parsing them
+        """
+        sheet_data = None
+        stream, rowx = self._open_sheet(start)
+        if stream is None:
+            return
+
+        for event, elem in ElementTree.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == XLSX_SHEET_DATA_TAG:
+                    sheet_data = elem
+                continue
+            if elem.tag != XLSX_ROW_TAG:
+                continue
+
+            # the row reference is optional
+            row_number = elem.get('r')
+            rowx = int(row_number) - 1 if row_number else rowx + 1
+            yield rowx, elem
+
+            # drop the rows that have been read
+            sheet_data.clear()
+
+    def _get_cells(self, row_elem):
+        """returns the list of (column index, xlrd Cell) of the cells of a <row> element that have
+        a value
+        """
+        colx = -1
+        cells = []
+        for cell_elem in row_elem:
+            # the cell reference is optional
+            cell_name = cell_elem.get('r')
+            colx = column_index(cell_name) if cell_name else colx + 1
+            cell = self._get_cell(cell_elem)
+            if cell is not None:
+                cells.append((colx, cell))
+        return cells
+
+    def _scan_sheet(self):
+        """reads through the sheet once to find its size and the best guess for the header row,
+        which is the first row without empty cells (as in ``ExcelParser``)
+
+        :returns: tuple, (number of rows, number of columns, index of header row)
+        """
+        nrows = ncols = 0
+        header_row = None
+        for rowx, row_elem in self._iter_rows():
+            cells = self._get_cells(row_elem)
+            if not cells:
+                continue
+            nrows = rowx + 1
+            row_ncols = max(colx for colx, _ in cells) + 1
+            if row_ncols > ncols:
+                # the rows before this one can not be full anymore
+                ncols = row_ncols
+                header_row = None
+            if header_row is None and len(cells) == ncols:
+                header_row = rowx
+
+        # default to first row
+        return nrows, ncols, header_row or 0
+
+    def _read_rows(self, start, end):
+        """returns a generator yeilding the list of the cells of each row between the row indexes.
+        The missing rows and cells are empty. The rows before ``start`` are skipped without
+        parsing them.
+
+        :param start: int, first row index
+        :param end: int, row index to stop before
+        :returns: Generator yeilding a row as a list of xlrd Cells
+        """
+        end = min(end, self.nrows)
+        next_rowx = start
+        for rowx, row_elem in self._iter_rows(start):
+            if rowx < start:
+                continue
+            if rowx >= end:
+                break
+            for _ in range(next_rowx, rowx):
+                yield [empty_cell] * self.ncols
+            row = [empty_cell] * self.ncols
+            for colx, cell in self._get_cells(row_elem):
+                row[colx] = cell
+            yield row
+            next_rowx = rowx + 1
+
+        for _ in range(next_rowx, end):
+            yield [empty_cell] * self.ncols
+
+    def XLSDictReader(self, start=None, end=None):
+        """returns a generator yeilding a dict per row from the XLSX file
+
+        :param start: int, (optional) first row index to return, defaults to the row after the header
+        :param end: int, (optional) row index to stop before, defaults to the end of the sheet
+        :returns: Generator yeilding a row as Dict
+        """
+        if start is None:
+            start = self.header_row + 1
+        if end is None:
+            end = self.nrows
+
+        return (
+            dict(zip(self._header_keys, [self.get_value(cell) for cell in row]))
+            for row in self._read_rows(start, end)
+        )
+
+    def seek_to_beginning(self):
+        """seeks to the beginning of the file, the headers are not parsed again"""
+        self.excelreader = self.XLSDictReader()
+
+    def plan_chunks(self, chunk_size):
+        """
+        Split the data rows of the sheet into row index ranges.
+
+        :param chunk_size: int, number of rows per chunk
+        :returns: list of tuples, (start row index, end row index, number of rows)
+        """
+        chunks = []
+        for start in range(self.header_row + 1, self.nrows, chunk_size):
+            end = min(start + chunk_size, self.nrows)
+            chunks.append((start, end, end - start))
+        return chunks
+
+    def read_chunk(self, start, end):
+        """
+        Return the rows between the row indexes as returned by ``plan_chunks``. The start of the
+        chunk is looked up in the uncompressed sheet XML, only the rows of the chunk are parsed.
+
+        :param start: int, first row index
+        :param end: int, row index to stop before
+        :returns: Generator yeilding a row as Dict
+        """
+        return self.XLSDictReader(start, end)
+
+    def read_chunk_rows(self, start, end):
+        """
+        Return the rows between the row indexes as returned by ``plan_chunks`` as tuples in the
+        order of ``headers``.
+
+        :param start: int, first row index
+        :param end: int, row index to stop before
+        :returns: Generator yeilding a row as a tuple
+        """
+        return (tuple(self.get_value(cell) for cell in row) for row in self._read_rows(start, end))
+
+    def read_rows(self):
+        """
+        Return all the rows after the header row as tuples in the order of ``headers``. The
+        sheet is streamed once.
+
+        :returns: Generator yeilding a row as a tuple
+        """
+        return self.read_chunk_rows(self.header_row + 1, self.nrows)
+
+    def num_columns(self):
+        """gets the number of columns for the file"""
+        return self.ncols
+
+    @property
+    def sheet_size(self):
+        """tuple, (number of rows, number of columns, index of header row) of the sheet"""
+        return self.nrows, self.ncols, self.header_row
+
+
 class CSVParser(object):
     """CSV (.csv) file parser for MCMParser
 
@@ -197,16 +630,32 @@ class CSVParser(object):
 
         # Read a significant chunk of the data to improve the odds of
         # determining the dialect.  MCM is often run on very wide csv files.
-        dialect = Sniffer().sniff(self.csvfile.read(16384))
+        sample = self.csvfile.read(16384)
         self.csvfile.seek(0)
+        self.format_params = self._sniff_format_params(sample)
 
         if 'reader_type' not in kwargs:
-            return DictReader(self.csvfile, errors='replace')
+            return DictReader(self.csvfile, errors='replace', **self.format_params)
 
         else:
             reader_type = kwargs.get('reader_type')
             del kwargs['reader_type']
-            return reader_type(self.csvfile, dialect, **kwargs)
+            return reader_type(self.csvfile, Sniffer().sniff(sample), **kwargs)
+
+    def _sniff_format_params(self, sample):
+        """
+        Guess the delimiter of the file. Only the delimiter of the sniffed dialect is used, the
+        rows are always quoted with double quotes (which is what ``plan_chunks`` expects).
+
+        :param sample: str, the data to guess the delimiter from
+        :returns: dict, format parameters of the CSV readers, empty if the delimiter can not be
+            determined (i.e. the file is comma separated)
+        """
+        try:
+            dialect = Sniffer().sniff(sample, CSV_DELIMITERS)
+        except csv.Error:
+            return {}
+        return {'delimiter': dialect.delimiter}
 
     def clean_super_scripts(self):
         """Replaces column names with clean ones."""
@@ -230,6 +679,112 @@ class CSVParser(object):
         # skip header row
         self.next().next()
 
+    def _read_record(self):
+        """
+        Read one full CSV record from the current position of the file. A record can span
+        multiple lines if a quoted value contains a newline.
+
+        :returns: str, the raw record (empty string at the end of the file)
+        """
+        record = self.csvfile.readline()
+        # an odd number of quote characters means that the record continues on the next line
+        while record.count('"') % 2 == 1:
+            line = self.csvfile.readline()
+            if not line:
+                break
+            record += line
+        return record
+
+    def plan_chunks(self, chunk_size):
+        """
+        Split the data rows of the file into row-aligned byte ranges. Only the offsets are
+        calculated, the rows themselves are not parsed.
+
+        :param chunk_size: int, number of rows per chunk
+        :returns: list of tuples, (start byte offset, end byte offset, number of rows)
+        """
+        chunks = []
+        self.csvfile.seek(0)
+        # skip the header row
+        self._read_record()
+
+        chunk_start = self.csvfile.tell()
+        num_rows = 0
+        while True:
+            record = self._read_record()
+            if not record:
+                break
+
+            # DictReader skips blank lines, so do not count them as rows
+            if record.rstrip('\r\n'):
+                num_rows += 1
+
+            if num_rows == chunk_size:
+                chunk_end = self.csvfile.tell()
+                chunks.append((chunk_start, chunk_end, num_rows))
+                chunk_start = chunk_end
+                num_rows = 0
+
+        if num_rows:
+            chunks.append((chunk_start, self.csvfile.tell(), num_rows))
+
+        self.seek_to_beginning()
+        return chunks
+
+    def read_chunk(self, start, end):
+        """
+        Return the rows between the byte offsets as returned by ``plan_chunks``.
+
+        :param start: int, byte offset of the first row
+        :param end: int, byte offset to stop before
+        :returns: Generator yeilding a row as Dict
+        """
+        self.csvfile.seek(start)
+        # read whole lines up to the end offset rather than end - start bytes, the file may be
+        # opened with universal newlines so the number of bytes read can differ from the offsets
+        lines = []
+        while self.csvfile.tell() < end:
+            line = self.csvfile.readline()
+            if not line:
+                break
+            lines.append(line)
+        return DictReader(
+            BytesIO(''.join(lines)), fieldnames=self.csvreader.unicode_fieldnames, errors='replace',
+            **self.format_params
+        )
+
+    def read_chunk_rows(self, start, end):
+        """
+        Return the rows between the byte offsets as returned by ``plan_chunks`` as tuples in the
+        order of ``headers``, which is faster than ``read_chunk`` for saving the rows. The chunk is
+        read in one block and split by the C csv reader. The values are byte strings, only the
+        non-ASCII ones are decoded and transliterated with unidecode.
+
+        :param start: int, byte offset of the first row
+        :param end: int, byte offset to stop before
+        :returns: Generator yeilding a row as a tuple
+        """
+        # read the raw bytes, the file may be opened with universal newlines. The descriptor is
+        # reused, since the file may have been removed (e.g. an evicted staged file) since it was
+        # opened.
+        with io.open(self.csvfile.fileno(), 'rb', closefd=False) as f:
+            f.seek(start)
+            block = f.read(end - start)
+        block = block.replace('\r\n', '\n').replace('\r', '\n')
+        ascii_only = not NON_ASCII_RE.search(block)
+
+        num_columns = self.num_columns()
+        for row in csv.reader(block.splitlines(True), **self.format_params):
+            if not row:
+                # DictReader skips blank lines
+                continue
+            if not ascii_only:
+                row = [unidecode(value.decode('utf-8', 'replace')) if NON_ASCII_RE.search(value)
+                       else value for value in row]
+            if len(row) < num_columns:
+                row += [None] * (num_columns - len(row))
+            yield tuple(row[:num_columns])
+
     def num_columns(self):
         """gets the number of columns for the file"""
         return len(self.csvreader.unicode_fieldnames)
@@ -242,7 +797,7 @@ class CSVParser(object):
 
 class MCMParser(object):
     """
-    This Parser is a wrapper around CSVReader and ExcelParser which matches
+    This Parser is a wrapper around CSVReader, ExcelParser and XLSXParser which matches
     columnar data against a set of known ontologies and separates data
     according to those distinctions.
 
@@ -263,7 +818,7 @@ class MCMParser(object):
     """
 
     def __init__(self, import_file, *args, **kwargs):
-        self.reader = self._get_reader(import_file)
+        self.reader = self._get_reader(import_file, kwargs.get('sheet_size'))
         self.import_file = import_file
         if 'matching_func' not in kwargs:
             # Special note, contains expects arguments like the following
@@ -294,8 +849,11 @@ class MCMParser(object):
             # e.g. model.objects.get('some canonical id') or model_class()
             yield mapper.map_row(row, mapping, model_class)
 
-    def _get_reader(self, import_file):
+    def _get_reader(self, import_file, sheet_size=None):
         """returns a CSV or XLS/XLSX reader or raises an exception"""
+        if XLSXParser.is_xlsx(import_file):
+            return XLSXParser(import_file, sheet_size)
+
         try:
             return ExcelParser(import_file)
         except XLRDError as e:
@@ -308,6 +866,42 @@ class MCMParser(object):
         """calls the reader's next"""
         return self.reader.next()
 
+    def plan_chunks(self, chunk_size):
+        """
+        Split the file into chunks that can be read independently with ``read_chunk``. The
+        chunks are byte ranges for CSV files and row index ranges for XLSX files. XLS files are
+        not split, see ``read_rows``.
+
+        :param chunk_size: int, number of rows per chunk
+        :returns: list of tuples, (start, end, number of rows)
+        """
+        return self.reader.plan_chunks(chunk_size)
+
+    def read_chunk(self, start, end):
+        """calls the reader's read_chunk"""
+        return self.reader.read_chunk(start, end)
+
+    def read_chunk_rows(self, start, end):
+        """
+        Return the rows of a chunk as tuples, the values of each row are in the order of
+        ``headers``. Unlike ``read_chunk``, no dict is created per row and the values are
+        already cleaned (i.e. there are no unicode values).
+
+        :param start: int, start of the chunk as returned by ``plan_chunks``
+        :param end: int, end of the chunk as returned by ``plan_chunks``
+        :returns: Generator yeilding a row as a tuple
+        """
+        return self.reader.read_chunk_rows(start, end)
+
+    def read_rows(self):
+        """
+        Return all the rows of an XLS/XLSX file as tuples in the order of ``headers``. An XLS
+        workbook is loaded at once, so its rows are read once instead of in chunks.
+
+        :returns: Generator yeilding a row as a tuple
+        """
+        return self.reader.read_rows()
+
     def seek_to_beginning(self):
         """calls the reader's seek_to_beginning"""
         return self.reader.seek_to_beginning()
@@ -321,6 +915,14 @@ class MCMParser(object):
         """original ordered list of spreadsheet headers that are not cleaned"""
         return self.reader.headers
 
+    @property
+    def sheet_size(self):
+        """
+        The size of the sheet of an XLSX file, pass it to the parsers of the chunks so that they do
+        not read the whole sheet again. None for the other files.
+        """
+        return getattr(self.reader, 'sheet_size', None)
+
     @property
     def first_five_rows(self):
         """
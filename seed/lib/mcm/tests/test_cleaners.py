@@ -0,0 +1,76 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from unittest import TestCase
+
+from seed.lib.mcm import cleaners
+
+ONTOLOGY = {
+    'types': {
+        'float_col': 'float',
+        'date_col': 'date',
+        'string_col': 'string',
+        'int_col': 'integer',
+        'pint_col': ('quantity', 'ft**2'),
+    }
+}
+
+VALUES = [
+    u'1,123.45', u'50', u'', u'Not Available', u'not availble', u'N/A', u'n/a ', u'NA',
+    u'12/31/2013', u'2016-01-01', u'1990', u'-55', u'abc', u'Not Applicable: Standalone Property',
+    u'1', 1, 1.0, 50, -55.5, None, 'Not Available', 'bytes',
+]
+
+
+class TestCleaner(TestCase):
+
+    def setUp(self):
+        self.cleaner = cleaners.Cleaner(ONTOLOGY)
+
+    def test_is_none_synonym(self):
+        for value in [u'not available', u'Not Applicable', u'N/A', u'not availble']:
+            self.assertTrue(self.cleaner.is_none_synonym(value))
+        for value in [u'NA', u'1990', u'Not Applicable: Standalone Property']:
+            self.assertFalse(self.cleaner.is_none_synonym(value))
+
+    def test_is_none_synonym_matches_fuzzy_in_set(self):
+        # the length check skips only the values which fuzzy_in_set does not match
+        for _, synonym in cleaners.NONE_SYNONYMS:
+            for end in range(1, len(synonym) + 1):
+                value = synonym[:end]
+                self.assertEqual(self.cleaner.is_none_synonym(value),
+                                 cleaners.fuzzy_in_set(value, cleaners.NONE_SYNONYMS))
+
+    def test_clean_value_matches_default_cleaner(self):
+        for value in VALUES:
+            self.assertEqual(self.cleaner.clean_value(value, 'unknown_col'),
+                             cleaners.default_cleaner(value))
+
+    def test_clean_column_matches_clean_value(self):
+        for column_name in ONTOLOGY['types'].keys() + ['unknown_col']:
+            values = [v for v in VALUES if column_name != 'string_col' or v is not None]
+            expected = []
+            for value in values:
+                try:
+                    expected.append(self.cleaner.clean_value(value, column_name))
+                except TypeError:
+                    expected.append(TypeError)
+
+            result = []
+            for value in values:
+                try:
+                    result.append(self.cleaner.clean_column([value, value], column_name)[1])
+                except TypeError:
+                    result.append(TypeError)
+
+            self.assertEqual(result, expected)
+            self.assertEqual([type(v) for v in result], [type(v) for v in expected])
+
+    def test_clean_column_pint(self):
+        result = self.cleaner.clean_column([u'1,000', u'1,000', u'Not Available'], 'pint_col')
+        self.assertEqual(result[0], cleaners.pint_cleaner(u'1,000', 'ft**2'))
+        self.assertIsNot(result[0], result[1])
+        self.assertIsNone(result[2])
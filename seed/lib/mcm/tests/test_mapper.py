@@ -0,0 +1,94 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import pickle
+from unittest import TestCase
+
+from seed.lib.mcm import mapper
+from seed.lib.mcm.cleaners import Cleaner
+from seed.models import Column, PropertyState, TaxLotState
+
+ONTOLOGY = {
+    'types': {
+        'site_eui': 'float',
+        'Site EUI (GJ/m2)': ('quantity', 'GJ/m**2/year'),
+        'year_built': 'integer',
+        'release_date': 'date',
+    }
+}
+
+TABLE_MAPPINGS = {
+    'PropertyState': {
+        'PM ID': ('PropertyState', 'pm_property_id', 'PM Property ID', False),
+        'Site EUI (GJ/m2)': ('PropertyState', 'site_eui', 'Site EUI', False),
+        'Year Built': ('PropertyState', 'year_built', 'Year Built', False),
+        'Released': ('PropertyState', 'release_date', 'Release Date', True),
+        'Tax Lot': ('PropertyState', 'lot_number', 'Lot Number', False),
+    },
+    'TaxLotState': {
+        'Tax Lot': ('TaxLotState', 'jurisdiction_tax_lot_id', 'Jurisdiction Tax Lot ID', False),
+    },
+}
+
+ROWS = [
+    {'PM ID': '100', 'Site EUI (GJ/m2)': '1.5', 'Year Built': '1990', 'Released': '2016-01-01',
+     'Tax Lot': '11;22', 'Unmapped': 'x'},
+    {'PM ID': '200', 'Site EUI (GJ/m2)': 'Not Available', 'Year Built': None, 'Tax Lot': '33'},
+]
+
+
+class TestMappingPlan(TestCase):
+
+    def setUp(self):
+        self.plan = mapper.MappingPlan(TABLE_MAPPINGS, {'Tax Lot': 'TaxLotState'}, ONTOLOGY,
+                                       Column.QUANTITY_UNIT_COLUMNS)
+
+    def test_expand_rows(self):
+        rows = self.plan.expand_rows('TaxLotState', ROWS)
+        self.assertEqual([row['Tax Lot'] for row in rows], ['11', '22', '33'])
+
+        rows = self.plan.expand_rows('PropertyState', ROWS)
+        self.assertEqual([row['Tax Lot'] for row in rows], ['11;22', '33'])
+        # the original rows are not modified
+        self.assertEqual(ROWS[0]['Tax Lot'], '11;22')
+
+    def test_map_rows_matches_map_row(self):
+        cleaner = Cleaner(ONTOLOGY)
+        for table, model_class in [('PropertyState', PropertyState), ('TaxLotState', TaxLotState)]:
+            rows = self.plan.expand_rows(table, ROWS)
+            models = self.plan.map_rows(table, model_class, rows)
+            self.assertEqual(len(models), len(rows))
+
+            for row, model in zip(rows, models):
+                expected = mapper.map_row(row, TABLE_MAPPINGS[table], model_class, cleaner=cleaner)
+                self.assertEqual(model.extra_data, expected.extra_data)
+                for field in ['pm_property_id', 'site_eui', 'year_built', 'lot_number',
+                              'jurisdiction_tax_lot_id']:
+                    self.assertEqual(getattr(model, field, None), getattr(expected, field, None))
+
+        model = self.plan.map_rows('PropertyState', PropertyState, ROWS[:1])[0]
+        self.assertEqual(model.site_eui.magnitude, 1.5)
+        self.assertEqual(model.extra_data.keys(), ['release_date'])
+        self.assertTrue(model.extra_data['release_date'].startswith('2016-01-01T00:00:00'))
+
+    def test_extra_data_cleaned_to_none(self):
+        rows = [{'PM ID': '300', 'Released': 'Not Available'}, {'PM ID': '400', 'Released': ''}]
+        cleaner = Cleaner(ONTOLOGY)
+        models = self.plan.map_rows('PropertyState', PropertyState, rows)
+        for row, model in zip(rows, models):
+            expected = mapper.map_row(row, TABLE_MAPPINGS['PropertyState'], PropertyState,
+                                      cleaner=cleaner)
+            # the key is kept with a None value
+            self.assertEqual(model.extra_data, {'release_date': None})
+            self.assertEqual(model.extra_data, expected.extra_data)
+
+    def test_pickle(self):
+        plan = pickle.loads(pickle.dumps(self.plan))
+        for table in self.plan.tables:
+            self.assertEqual(sorted(plan.columns[table]), sorted(self.plan.columns[table]))
+        self.assertEqual(sorted(plan.tables), ['PropertyState', 'TaxLotState'])
+        model = plan.map_rows('PropertyState', PropertyState, ROWS[:1])[0]
+        self.assertEqual(model.site_eui.magnitude, 1.5)
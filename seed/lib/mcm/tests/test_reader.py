@@ -0,0 +1,261 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import os.path as osp
+import tempfile
+import zipfile
+from unittest import TestCase
+
+from mock import patch
+from unidecode import unidecode
+
+from seed.lib.mcm import reader
+
+
+class TestReaderChunks(TestCase):
+
+    def setUp(self):
+        self.data_dir = osp.join(osp.dirname(__file__), 'test_data')
+
+    def _read_all_chunks(self, parser, chunk_size):
+        rows = []
+        for start, end, num_rows in parser.plan_chunks(chunk_size):
+            chunk = list(parser.read_chunk(start, end))
+            self.assertEqual(len(chunk), num_rows)
+            rows.extend(chunk)
+        return rows
+
+    def test_csv_chunks(self):
+        with open(osp.join(self.data_dir, 'test_espm.csv'), 'rU') as f:
+            parser = reader.MCMParser(f)
+            expected = list(parser.next())
+            self.assertEqual(self._read_all_chunks(parser, 2), expected)
+
+    def test_xlsx_chunks(self):
+        with open(osp.join(self.data_dir, 'test_espm.xlsx'), 'rb') as f:
+            parser = reader.MCMParser(f)
+            expected = list(parser.next())
+            self.assertEqual(self._read_all_chunks(parser, 2), expected)
+
+    def test_csv_chunks_with_quoted_newlines(self):
+        data = 'id,notes\n1,"first\nline"\n\n2,second\n3,"a ""quoted"" value"\n'
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with open(f.name, 'rU') as csvfile:
+                parser = reader.MCMParser(csvfile)
+                chunks = parser.plan_chunks(2)
+                self.assertEqual([c[2] for c in chunks], [2, 1])
+
+                rows = self._read_all_chunks(parser, 2)
+                self.assertEqual([r['id'] for r in rows], ['1', '2', '3'])
+                self.assertEqual(rows[0]['notes'], 'first\nline')
+                self.assertEqual(rows[2]['notes'], 'a "quoted" value')
+
+    def test_csv_chunks_with_crlf_newlines(self):
+        data = 'id,name\r\n1,a\r\n2,b\r\n3,c\r\n4,d\r\n'
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with open(f.name, 'rU') as csvfile:
+                parser = reader.MCMParser(csvfile)
+                rows = self._read_all_chunks(parser, 2)
+                self.assertEqual([r['id'] for r in rows], ['1', '2', '3', '4'])
+
+
+class TestXLSXParser(TestCase):
+
+    WORKBOOK = (
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<workbookPr date1904="false"/>'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    )
+    RELS = (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    )
+    STYLES = (
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<cellXfs count="2"><xf numFmtId="0"/><xf numFmtId="14"/></cellXfs></styleSheet>'
+    )
+    SHARED_STRINGS = (
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<si><t>Report</t></si><si><t xml:space="preserve"> Name </t></si>'
+        '<si><t>Year Built</t></si>'
+        '<si><r><t xml:space="preserve">Gross </t></r><r><t>Floor Area (ft\xc2\xb2)</t></r></si>'
+        '<si><t>Caf\xc3\xa9</t></si></sst>'
+    )
+    # a title row before the headers, a missing row and cells, dates, booleans and inline strings
+    SHEET = (
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<sheetData>'
+        '<row r="1"><c r="A1" t="s"><v>0</v></c></row>'
+        '<row r="2"><c r="A2" t="s"><v>1</v></c><c r="B2" t="s"><v>2</v></c>'
+        '<c r="C2" t="s"><v>3</v></c><c r="D2" t="inlineStr"><is><t>Checked</t></is></c></row>'
+        '<row r="3"><c r="A3" t="s"><v>4</v></c><c r="B3" s="1"><v>43101</v></c>'
+        '<c r="C3"><v>1200.5</v></c><c r="D3" t="b"><v>1</v></c></row>'
+        '<row r="5"><c r="A5" t="inlineStr"><is><t>Office</t></is></c><c r="C5"><v>800</v></c>'
+        '<c r="D5"/></row>'
+        '</sheetData></worksheet>'
+    )
+    # the namespace has a prefix and the rows and cells are not numbered
+    UNNUMBERED_SHEET = (
+        '<x:worksheet xmlns:x="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<x:sheetData><x:row><x:c t="inlineStr"><x:is><x:t>Name</x:t></x:is></x:c>'
+        '<x:c t="inlineStr"><x:is><x:t>Value</x:t></x:is></x:c></x:row>' +
+        ''.join('<x:row><x:c t="inlineStr"><x:is><x:t>Row %d</x:t></x:is></x:c>'
+                '<x:c><x:v>%d</x:v></x:c></x:row>' % (i, i) for i in range(1, 6)) +
+        '</x:sheetData></x:worksheet>'
+    )
+
+    def setUp(self):
+        self.data_dir = osp.join(osp.dirname(__file__), 'test_data')
+
+    def _make_xlsx(self, sheet=SHEET):
+        f = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('xl/workbook.xml', self.WORKBOOK)
+            zf.writestr('xl/_rels/workbook.xml.rels', self.RELS)
+            zf.writestr('xl/styles.xml', self.STYLES)
+            zf.writestr('xl/sharedStrings.xml', self.SHARED_STRINGS)
+            zf.writestr('xl/worksheets/sheet1.xml', sheet)
+        f.flush()
+        return f
+
+    def _read(self, parser):
+        return parser.headers, list(parser.next()), parser.num_columns()
+
+    def assertMatchesExcelParser(self, filename):
+        with open(filename, 'rU') as f:
+            parser = reader.MCMParser(f)
+            self.assertIsInstance(parser.reader, reader.XLSXParser)
+            result = self._read(parser)
+
+            f.seek(0)
+            self.assertEqual(result, self._read(reader.ExcelParser(f)))
+        return result
+
+    def test_matches_excel_parser(self):
+        for filename in ['test_espm.xlsx', 'test_espm_date_format.xlsx']:
+            self.assertMatchesExcelParser(osp.join(self.data_dir, filename))
+
+    def test_streamed_values(self):
+        with self._make_xlsx() as f:
+            headers, rows, num_columns = self.assertMatchesExcelParser(f.name)
+            chunks = reader.XLSXParser(f).plan_chunks(2)
+
+        self.assertEqual(headers, ['Name', 'Year Built', 'Gross Floor Area (ft2)', 'Checked'])
+        self.assertEqual(num_columns, 4)
+        self.assertEqual(chunks, [(2, 4, 2), (4, 5, 1)])
+        self.assertEqual(rows, [
+            {' Name ': 'Cafe', 'Year Built': '2018-01-01 00:00:00',
+             'Gross Floor Area (ft2)': 1200.5, 'Checked': 1},
+            {' Name ': '', 'Year Built': '', 'Gross Floor Area (ft2)': '', 'Checked': ''},
+            {' Name ': 'Office', 'Year Built': '', 'Gross Floor Area (ft2)': 800, 'Checked': ''},
+        ])
+
+    def test_chunk_decodes_only_its_rows(self):
+        with self._make_xlsx() as f:
+            parser = reader.XLSXParser(f)
+            with patch.object(parser, '_get_cell', wraps=parser._get_cell) as mock_get_cell:
+                self.assertEqual(list(parser.read_chunk_rows(4, 5)), [('Office', '', 800, '')])
+            # the three cells of the last row, none of the rows before it
+            self.assertEqual(mock_get_cell.call_count, 3)
+
+    def test_chunk_with_sheet_size(self):
+        with self._make_xlsx() as f:
+            sheet_size = reader.MCMParser(f).sheet_size
+            with patch.object(reader.XLSXParser, '_scan_sheet') as mock_scan_sheet:
+                parser = reader.MCMParser(f, sheet_size=sheet_size)
+                self.assertEqual(parser.headers,
+                                 ['Name', 'Year Built', 'Gross Floor Area (ft2)', 'Checked'])
+                # the missing row before the chunk is empty
+                self.assertEqual(list(parser.read_chunk_rows(3, 5)),
+                                 [('', '', '', ''), ('Office', '', 800, '')])
+            self.assertFalse(mock_scan_sheet.called)
+
+    def test_chunk_of_unnumbered_rows(self):
+        with self._make_xlsx(self.UNNUMBERED_SHEET) as f:
+            # the tags are split between the blocks
+            with patch('seed.lib.mcm.reader.XLSX_READ_SIZE', 7):
+                parser = reader.XLSXParser(f)
+                self.assertEqual(parser.plan_chunks(2), [(1, 3, 2), (3, 5, 2), (5, 6, 1)])
+                self.assertEqual(list(parser.read_chunk_rows(3, 5)), [('Row 3', 3), ('Row 4', 4)])
+                self.assertEqual(list(parser.read_chunk_rows(5, 6)), [('Row 5', 5)])
+                self.assertEqual(list(parser.read_chunk_rows(6, 8)), [])
+
+    def test_read_rows_streams_once(self):
+        with self._make_xlsx() as f:
+            parser = reader.MCMParser(f)
+            with patch.object(parser.reader, '_iter_rows',
+                              wraps=parser.reader._iter_rows) as mock_iter_rows:
+                rows = list(parser.read_rows())
+            self.assertEqual(mock_iter_rows.call_count, 1)
+            self.assertEqual(rows, [
+                ('Cafe', '2018-01-01 00:00:00', 1200.5, 1), ('', '', '', ''),
+                ('Office', '', 800, ''),
+            ])
+
+    def test_other_files_are_not_streamed(self):
+        with open(osp.join(self.data_dir, 'test_espm.xls'), 'rb') as f:
+            self.assertIs(type(reader.MCMParser(f).reader), reader.ExcelParser)
+        with open(osp.join(self.data_dir, 'test_espm.csv'), 'rU') as f:
+            self.assertIsInstance(reader.MCMParser(f).reader, reader.CSVParser)
+
+
+class TestReadChunkRows(TestCase):
+
+    def setUp(self):
+        self.data_dir = osp.join(osp.dirname(__file__), 'test_data')
+
+    def _clean(self, row):
+        """cleans a row dict like tasks._save_raw_rows"""
+        return {
+            k.strip(): unidecode(v) if isinstance(v, unicode) else v for k, v in row.iteritems()
+        }
+
+    def assertRowsMatchChunks(self, parser):
+        for start, end, num_rows in parser.plan_chunks(2):
+            rows = list(parser.read_chunk_rows(start, end))
+            self.assertEqual(len(rows), num_rows)
+            self.assertEqual([dict(zip(parser.headers, row)) for row in rows],
+                             [self._clean(row) for row in parser.read_chunk(start, end)])
+            for row in rows:
+                self.assertFalse(any(isinstance(value, unicode) for value in row))
+
+    def test_files(self):
+        for filename in ['test_espm.csv', 'test_espm.xlsx']:
+            with open(osp.join(self.data_dir, filename), 'rU') as f:
+                self.assertRowsMatchChunks(reader.MCMParser(f))
+
+    def test_excel_read_rows(self):
+        for filename in ['test_espm.xls', 'test_espm.xlsx']:
+            with open(osp.join(self.data_dir, filename), 'rU') as f:
+                parser = reader.MCMParser(f)
+                rows = list(parser.read_rows())
+                self.assertEqual([dict(zip(parser.headers, row)) for row in rows],
+                                 [self._clean(row) for row in parser.next()])
+
+    def test_csv_sniffed_delimiter(self):
+        data = ('id;name;area (ft\xc2\xb2)\r\n1;"Caf\xc3\xa9; Bar";100\r\n\r\n'
+                '2;"multi\r\nline ""quoted""";\r\n3;short\r\n')
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with open(f.name, 'rU') as csvfile:
+                parser = reader.MCMParser(csvfile)
+                self.assertEqual(parser.headers, ['id', 'name', 'area (ft2)'])
+                self.assertRowsMatchChunks(parser)
+
+                start, end, _ = parser.plan_chunks(10)[0]
+                self.assertEqual(list(parser.read_chunk_rows(start, end)), [
+                    ('1', 'Cafe; Bar', '100'),
+                    ('2', 'multi\nline "quoted"', ''),
+                    ('3', 'short', None),
+                ])
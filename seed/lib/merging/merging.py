@@ -169,3 +169,35 @@ def merge_state(merged_state, state1, state2, can_attrs, default=None):
         PropertyState.merge_relationships(merged_state, state1, state2)
 
     return merged_state
+
+
+def merge_unsaved_state(merged_state, state1, state2, state_to_state):
+    """
+    Merge state1 and state2 into merged_state the same way as merge_state does with state2 as the
+    default, without keying the values on the states (unsaved states are not hashable) and without
+    merging the relationships (which needs saved states). This allows folding a list of states in
+    memory and saving the intermediate merged states afterwards.
+
+    :param merged_state: PropertyState/TaxLotState model inst.
+    :param state1: PropertyState/TaxLotState model inst. Left parent, can be unsaved.
+    :param state2: PropertyState/TaxLotState model inst. Right parent and default.
+    :param state_to_state: tuple, result of get_state_to_state_tuple for the type of the states
+    :return: inst(``merged_state``), updated.
+    """
+    for data_set_attr, can_attr in state_to_state:
+        if can_attr == 'import_file':
+            attr = 'import_file_id'
+            value1 = state1.import_file_id
+            value2 = state2.import_file_id
+        else:
+            attr = can_attr
+            value1 = getattr(state1, data_set_attr)
+            value2 = getattr(state2, data_set_attr)
+
+        # state2 is the default, so its value is used whenever it is set
+        setattr(merged_state, attr, value2 if value2 is not None else value1)
+
+    merged_extra_data, merged_extra_data_sources = _merge_extra_data(state1, state2, default=state2)
+    merged_state.extra_data = merged_extra_data
+
+    return merged_state
@@ -0,0 +1,46 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+"""
+Calculate the stored hash_object of the PropertyStates and TaxLotStates that do not have one (or of
+all the states with --all, e.g. after the hashed fields changed). The migration that added the
+column fills it for the existing states the same way.
+"""
+from django.core.management.base import BaseCommand
+
+from seed.models import PropertyState, TaxLotState
+from seed.utils.hashing import backfill_hash_objects
+
+
+class Command(BaseCommand):
+
+    help = 'Backfills the hash_object column of the property and tax lot states'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org',
+                            dest='organization',
+                            default=None,
+                            help='Comma separated list of organization ids, defaults to all')
+        parser.add_argument('--all',
+                            dest='all',
+                            default=False,
+                            action='store_true',
+                            help='Recalculate the hash of all states, not only the missing ones')
+        parser.add_argument('--batch-size',
+                            dest='batch_size',
+                            type=int,
+                            default=1000)
+
+    def handle(self, *args, **options):
+        for state_class in [PropertyState, TaxLotState]:
+            states = state_class.objects.all()
+            if options['organization']:
+                states = states.filter(organization_id__in=options['organization'].split(','))
+            if not options['all']:
+                states = states.filter(hash_object__isnull=True)
+
+            updated = backfill_hash_objects(states, options['batch_size'])
+            self.stdout.write('Updated the hash of %d %s objects' % (updated, state_class.__name__))
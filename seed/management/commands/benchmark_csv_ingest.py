@@ -0,0 +1,95 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+"""
+Times the reading of the chunks of a CSV file as they are saved by the raw data import, with the
+dict rows of ``read_chunk`` (cleaned like before) and with the tuple rows of ``read_chunk_rows``.
+The throughput is reported in MB/s of the file.
+"""
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from unidecode import unidecode
+
+from seed.lib.mcm.reader import MCMParser
+
+HEADER = ['Property Id', 'Property Name', 'Address 1', 'City', 'State/Province', 'Postal Code',
+          'Year Built', 'Property Floor Area (Buildings and Parking) (ft\xc2\xb2)',
+          'Site EUI (kBtu/ft\xc2\xb2)', 'Notes']
+
+
+def write_fixture(f, count, seed=0):
+    """Write a CSV file of count rows with some quoted and non-ASCII values"""
+    rng = random.Random(seed)
+    f.write(','.join(HEADER) + '\r\n')
+    for i in range(count):
+        name = 'Caf\xc3\xa9 %d' % i if rng.random() < 0.05 else 'Building %d' % i
+        notes = '"Renovated, %d"' % rng.randint(1990, 2017) if rng.random() < 0.2 else ''
+        f.write('%d,%s,%d Main St,Denver,CO,%05d,%d,%.1f,%.2f,%s\r\n' % (
+            i, name, rng.randint(1, 9999), rng.randint(80000, 80999), rng.randint(1900, 2017),
+            rng.uniform(1000, 500000), rng.uniform(10, 300), notes))
+
+
+def dict_rows(parser, start, end):
+    """The former implementation, which cleans every key and value of the dict rows"""
+    for row in parser.read_chunk(start, end):
+        yield {k.strip(): unidecode(v) if isinstance(v, unicode) else v for k, v in row.iteritems()}
+
+
+def tuple_rows(parser, start, end):
+    headers = parser.headers
+    for row in parser.read_chunk_rows(start, end):
+        yield dict(zip(headers, row))
+
+
+class Command(BaseCommand):
+
+    help = 'Benchmarks the reading of the rows of a CSV file by the raw data import'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows',
+                            type=int,
+                            default=1000000,
+                            help='Number of rows in the generated file')
+        parser.add_argument('--file',
+                            help='CSV file to read instead of a generated one')
+        parser.add_argument('--chunk-size',
+                            type=int,
+                            default=100,
+                            help='Number of rows per chunk')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not path:
+            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+                write_fixture(f, options['rows'])
+            path = f.name
+
+        try:
+            size = os.path.getsize(path) / 1024.0 / 1024.0
+            with open(path, 'rU') as f:
+                parser = MCMParser(f)
+
+                t0 = time.time()
+                chunks = parser.plan_chunks(options['chunk_size'])
+                elapsed = time.time() - t0
+                self.stdout.write('%.1f MB, %d rows: plan_chunks %.2fs (%.1f MB/s)' % (
+                    size, sum(c[2] for c in chunks), elapsed, size / elapsed))
+
+                for name, read_rows in [('dicts', dict_rows), ('tuples', tuple_rows)]:
+                    t0 = time.time()
+                    for start, end, _ in chunks:
+                        for _ in read_rows(parser, start, end):
+                            pass
+                    elapsed = time.time() - t0
+                    self.stdout.write('%.1f MB: %s %.2fs (%.1f MB/s)' % (
+                        size, name, elapsed, size / elapsed))
+        finally:
+            if not options['file']:
+                os.remove(path)
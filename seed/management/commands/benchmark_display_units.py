@@ -0,0 +1,80 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+"""
+Times the collapse of the Quantities of an inventory page to the display units of an
+organization, against converting every value with pint as it was done before.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from quantityfield import ureg
+
+from seed.lib.superperms.orgs.models import Organization
+from seed.models import PropertyState
+from seed.serializers.pint import (
+    AREA_DEFAULT_UNITS,
+    EUI_DEFAULT_UNITS,
+    apply_display_unit_preferences,
+    get_dimensionality,
+)
+
+
+def make_rows(count, seed=0):
+    """Return a page of property dicts with all the Quantity columns of a PropertyState populated"""
+    rng = random.Random(seed)
+    quantity_fields = [f for f in PropertyState._meta.fields if hasattr(f, 'base_units')]
+    rows = []
+    for i in range(count):
+        row = {'id': i, 'address_line_1': '%s Main St' % i}
+        for field in quantity_fields:
+            row[field.name] = ureg.Quantity(rng.uniform(0, 100000), field.base_units)
+        rows.append(row)
+    return rows
+
+
+def pint_collapse(org, row):
+    """The former implementation, which converts every value with Quantity.to"""
+    pint_specs = {
+        '[mass] / [time] ** 3': org.display_units_eui or EUI_DEFAULT_UNITS,
+        '[length] ** 2': org.display_units_area or AREA_DEFAULT_UNITS
+    }
+    result = {}
+    for k, x in row.iteritems():
+        if isinstance(x, ureg.Quantity):
+            x = round(x.to(pint_specs[get_dimensionality(x)]).magnitude,
+                      org.display_significant_figures)
+        result[k] = x
+    return result
+
+
+class Command(BaseCommand):
+
+    help = 'Benchmarks the conversion of an inventory page to the display units'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows',
+                            type=int,
+                            default=500,
+                            help='Number of rows in the page')
+        parser.add_argument('--repeat',
+                            type=int,
+                            default=5,
+                            help='Number of times the page is converted')
+
+    def handle(self, *args, **options):
+        org = Organization(display_units_eui='kWh/m**2/year', display_units_area='m**2',
+                           display_significant_figures=2)
+        rows = make_rows(options['rows'])
+
+        for name, collapse in [('pint', pint_collapse),
+                               ('factors', apply_display_unit_preferences)]:
+            t0 = time.time()
+            for _ in range(options['repeat']):
+                [collapse(org, row) for row in rows]
+            elapsed = (time.time() - t0) / options['repeat']
+            self.stdout.write('%d rows: %s %.4fs per page' % (len(rows), name, elapsed))
@@ -0,0 +1,66 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+"""
+Times the EquivalencePartitioner on synthetic (unsaved) PropertyStates.
+
+The linear reference implementation is quadratic, so it is only run up to
+--max-linear states.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from seed.data_importer.tasks import EquivalencePartitioner
+from seed.models import PropertyState
+
+
+def make_states(count, duplicate_ratio=0.1, seed=0):
+    """Return a list of PropertyStates where roughly duplicate_ratio of them match an earlier state"""
+    rng = random.Random(seed)
+    states = []
+    for i in range(count):
+        if states and rng.random() < duplicate_ratio:
+            match = states[rng.randrange(len(states))]
+            states.append(PropertyState(pm_property_id=match.pm_property_id,
+                                        normalized_address=match.normalized_address))
+        else:
+            states.append(PropertyState(pm_property_id=str(i),
+                                        custom_id_1=str(i) if rng.random() < 0.5 else None,
+                                        normalized_address='%s main st' % i))
+    return states
+
+
+class Command(BaseCommand):
+
+    help = 'Benchmarks the indexed and linear EquivalencePartitioner'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes',
+                            default='10000,100000,1000000',
+                            help='Comma separated number of states to partition')
+        parser.add_argument('--max-linear',
+                            type=int,
+                            default=10000,
+                            help='Largest size to run the linear partitioner on')
+
+    def handle(self, *args, **options):
+        partitioner = EquivalencePartitioner.make_propertystate_equivalence()
+
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            states = make_states(size)
+
+            t0 = time.time()
+            classes = partitioner.calculate_equivalence_classes(states)
+            indexed = time.time() - t0
+            self.stdout.write('%d states: indexed %.3fs (%d classes)' % (size, indexed, len(classes)))
+
+            if size <= options['max_linear']:
+                t0 = time.time()
+                linear_classes = partitioner._calculate_equivalence_classes_linear(states)
+                linear = time.time() - t0
+                self.stdout.write('%d states: linear %.3fs (%d classes)' % (size, linear, len(linear_classes)))
@@ -0,0 +1,117 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+"""
+Compares the row and block storage of the meter readings. The same interval data is saved for a
+meter of each storage mode, then the disk footprint (the growth of the table, its indexes and
+TOAST, and the size of the rows of the meter) and the latency of range reads are reported.
+Everything is rolled back at the end.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytz
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from seed.models import Meter, TimeSeries, TimeSeriesBlock
+
+
+def make_readings(begin, count, minutes, rng):
+    duration = timedelta(minutes=minutes)
+    return [
+        TimeSeries(
+            begin_time=begin + duration * i,
+            end_time=begin + duration * (i + 1),
+            reading=rng.uniform(0, 50),
+            cost=Decimal(rng.randint(0, 100000)).scaleb(-4),
+        ) for i in range(count)
+    ]
+
+
+def relation_size(model):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_total_relation_size(%s)', [model._meta.db_table])
+        return cursor.fetchone()[0]
+
+
+def rows_size(model, meter):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {} t WHERE meter_id = %s'.format(
+                model._meta.db_table),
+            [meter.pk])
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+
+    help = 'Benchmarks the disk footprint and range reads of the row and block storage of meters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days',
+                            type=int,
+                            default=365,
+                            help='Number of days of readings')
+        parser.add_argument('--minutes',
+                            type=int,
+                            default=15,
+                            help='Duration of the readings in minutes')
+        parser.add_argument('--reads',
+                            type=int,
+                            default=100,
+                            help='Number of range reads')
+        parser.add_argument('--window',
+                            type=int,
+                            default=7,
+                            help='Number of days of each range read')
+
+    def handle(self, *args, **options):
+        per_day = 24 * 60 // options['minutes']
+        begin = datetime(2017, 1, 1, tzinfo=pytz.UTC)
+        self.stdout.write('%d readings of %d minutes' % (
+            options['days'] * per_day, options['minutes']))
+
+        with transaction.atomic():
+            meters = []
+            for storage, model in [(Meter.ROW_STORAGE, TimeSeries),
+                                   (Meter.BLOCK_STORAGE, TimeSeriesBlock)]:
+                meter = Meter.objects.create(name='benchmark', energy_type=Meter.ELECTRICITY,
+                                             energy_units=Meter.KILOWATT_HOURS, storage=storage)
+                meters.append(meter)
+                name = meter.get_storage_display()
+                rng = random.Random(0)
+
+                size = relation_size(model)
+                t0 = time.time()
+                # save a month at a time, like the batches of an import
+                for day in range(0, options['days'], 30):
+                    count = min(30, options['days'] - day) * per_day
+                    meter.save_readings(
+                        make_readings(begin + timedelta(days=day), count, options['minutes'], rng))
+                elapsed = time.time() - t0
+                self.stdout.write('%s: write %.2fs, %.1f MB on disk, %.1f MB of rows' % (
+                    name, elapsed, (relation_size(model) - size) / 1024.0 / 1024.0,
+                    rows_size(model, meter) / 1024.0 / 1024.0))
+
+            for meter in meters:
+                rng = random.Random(0)
+                t0 = time.time()
+                count = 0
+                for _ in range(options['reads']):
+                    start = begin + timedelta(
+                        minutes=rng.randint(0, max(options['days'] - options['window'], 0) * per_day) *
+                        options['minutes'])
+                    count += sum(1 for _ in meter.readings(
+                        start, start + timedelta(days=options['window'])))
+                elapsed = time.time() - t0
+                self.stdout.write('%s: %d range reads of %d days, %.1f ms per read (%d readings)' % (
+                    meter.get_storage_display(), options['reads'], options['window'],
+                    elapsed * 1000 / options['reads'], count))
+
+            transaction.set_rollback(True)
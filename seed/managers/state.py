@@ -0,0 +1,31 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.db.models import Manager
+from django.db.models.query import QuerySet
+
+from seed.utils.address import normalize_address_str
+from seed.utils.hashing import hash_state_object
+
+
+class StateQuerySet(QuerySet):
+
+    def bulk_create(self, objs, batch_size=None):
+        """Set the normalized_address and hash_object of the states, which are otherwise calculated in save()"""
+        objs = list(objs)
+        for obj in objs:
+            if obj.address_line_1 is not None:
+                obj.normalized_address = normalize_address_str(obj.address_line_1)
+            else:
+                obj.normalized_address = None
+            obj.hash_object = hash_state_object(obj)
+        return super(StateQuerySet, self).bulk_create(objs, batch_size=batch_size)
+
+
+class StateManager(Manager):
+
+    def get_queryset(self):
+        return StateQuerySet(model=self.model, using=self._db)
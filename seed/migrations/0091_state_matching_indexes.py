@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2026-10-18 04:09
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orgs', '0006_organization_display_significant_figures'),
+        ('data_importer', '0009_importfile_uploaded_filename'),
+        ('seed', '0090_auto_20180508_1243'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='propertystate',
+            index_together=set([('analysis_state', 'organization'), ('import_file', 'data_state', 'merge_state'), ('organization', 'normalized_address'), ('organization', 'ubid'), ('organization', 'custom_id_1'), ('import_file', 'data_state'), ('organization', 'pm_property_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='taxlotstate',
+            index_together=set([('import_file', 'data_state'), ('organization', 'jurisdiction_tax_lot_id'), ('organization', 'custom_id_1'), ('organization', 'normalized_address'), ('import_file', 'data_state', 'merge_state')]),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2026-10-18 04:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from seed.utils.hashing import backfill_hash_objects
+
+
+def backfill_state_hashes(apps, schema_editor):
+    """the exact duplicates of the imported states are found by the stored hash"""
+    for model_name in ['PropertyState', 'TaxLotState']:
+        state_class = apps.get_model('seed', model_name)
+        backfill_hash_objects(state_class.objects.filter(hash_object__isnull=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orgs', '0006_organization_display_significant_figures'),
+        ('data_importer', '0009_importfile_uploaded_filename'),
+        ('seed', '0091_state_matching_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertystate',
+            name='hash_object',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='taxlotstate',
+            name='hash_object',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(backfill_state_hashes, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='propertystate',
+            index_together=set([('organization', 'hash_object'), ('analysis_state', 'organization'), ('import_file', 'data_state', 'merge_state'), ('organization', 'normalized_address'), ('organization', 'ubid'), ('organization', 'custom_id_1'), ('import_file', 'data_state'), ('organization', 'pm_property_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='taxlotstate',
+            index_together=set([('organization', 'hash_object'), ('import_file', 'data_state', 'merge_state'), ('organization', 'jurisdiction_tax_lot_id'), ('organization', 'custom_id_1'), ('import_file', 'data_state'), ('organization', 'normalized_address')]),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2026-10-18 05:25
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0092_state_hash_object'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='propertyview',
+            index_together=set([('state', 'cycle'), ('cycle', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='taxlotview',
+            index_together=set([('state', 'cycle'), ('cycle', 'id')]),
+        ),
+    ]
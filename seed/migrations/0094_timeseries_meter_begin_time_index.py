@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2026-10-18 06:30
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0093_inventory_view_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='timeseries',
+            index_together=set([('begin_time', 'end_time'), ('meter', 'begin_time')]),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2026-10-18 06:38
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0094_timeseries_meter_begin_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSeriesBlock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('begin_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('interval', models.IntegerField()),
+                ('count', models.IntegerField()),
+                ('readings', models.BinaryField()),
+                ('costs', models.BinaryField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='meter',
+            name='storage',
+            field=models.IntegerField(choices=[(1, b'Rows'), (2, b'Blocks')], default=1),
+        ),
+        migrations.AddField(
+            model_name='timeseriesblock',
+            name='meter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeseries_blocks', to='seed.Meter'),
+        ),
+        migrations.AlterIndexTogether(
+            name='timeseriesblock',
+            index_together=set([('meter', 'begin_time')]),
+        ),
+    ]
@@ -148,6 +148,7 @@ class Column(models.Model):
     # Do not return these columns to the front end -- when using the tax_lot_properties get_related method .
     EXCLUDED_COLUMN_RETURN_FIELDS = [
         'normalized_address',
+        'hash_object',
         # Records below are old and should not be used
         'source_eui_modeled_orig',
         'site_eui_orig',
@@ -176,6 +177,7 @@ class Column(models.Model):
     # Note that not all the endpoints are respecting this at the moment.
     EXCLUDED_API_FIELDS = [
         'normalized_address',
+        'hash_object',
     ]
 
     # These are the columns that are removed when looking to see if the records are the same
@@ -6,13 +6,17 @@
 """
 import json
 import logging
+import operator
 import re
+from collections import defaultdict
 from datetime import date, datetime
 from random import randint
 
 import pytz
 from django.apps import apps
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
 from django.utils.timezone import get_current_timezone, make_aware, make_naive
 from quantityfield import ureg
 
@@ -24,7 +28,7 @@ from seed.models import (
 from seed.models import obj_to_dict
 from seed.serializers.pint import pretty_units
 from seed.utils.cache import (
-    set_cache_raw, get_cache_raw
+    delete_many_cache, get_cache_raw, get_many_cache_raw, set_cache_raw, set_many_cache_raw
 )
 from seed.utils.time import convert_datestr
 
@@ -52,6 +56,9 @@ DATA_TYPES = [
     (TYPE_EUI, 'eui')
 ]
 
+# number of results of the checks saved in each page of the cache, see save_results
+RESULTS_PAGE_SIZE = 100
+
 SEVERITY_ERROR = 0
 SEVERITY_WARNING = 1
 SEVERITY = [
@@ -257,11 +264,11 @@ def format_pint_violation(rule, source_value):
 
     formatted_min = formatted_max = None
     incoming_data_units = source_value.units
-    rule_units = ureg(rule.units)
+    rule_units = rule.pint_units
     rule_value = source_value.to(rule_units)
 
     pretty_source_units = pretty_units(source_value)
-    pretty_rule_units = pretty_units(rule_value)
+    pretty_rule_units = rule.pretty_rule_units
 
     if incoming_data_units != rule_units:
         formatted_value = u"{:.1f} {} → {:.1f} {}".format(
@@ -277,6 +284,45 @@ def format_pint_violation(rule, source_value):
     return (formatted_value, formatted_min, formatted_max)
 
 
+class CachedResults(object):
+    """
+    The results of the checks saved in the cache by DataQualityCheck.save_results. Only the pages
+    of the results which are sliced or iterated are read from the cache, so it can be paginated
+    like a list without loading all the results.
+    """
+
+    def __init__(self, identifier, summary):
+        self.identifier = identifier
+        self.total = summary['total']
+        self.num_errors = summary['num_errors']
+        self.num_warnings = summary['num_warnings']
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += self.total
+            return self[index:index + 1][0]
+        start, stop, step = index.indices(self.total)
+        if start >= stop:
+            return []
+        pages = range(start // RESULTS_PAGE_SIZE, (stop - 1) // RESULTS_PAGE_SIZE + 1)
+        keys = [DataQualityCheck.page_cache_key(self.identifier, page) for page in pages]
+        cached = get_many_cache_raw(keys)
+        results = []
+        for key in keys:
+            results += cached.get(key, [])
+        offset = pages[0] * RESULTS_PAGE_SIZE
+        return results[start - offset:stop - offset:step]
+
+    def __iter__(self):
+        for start in range(0, self.total, RESULTS_PAGE_SIZE):
+            for result in self[start:start + RESULTS_PAGE_SIZE]:
+                yield result
+
+
 class Rule(models.Model):
     """
     Rules for DataQualityCheck
@@ -314,11 +360,70 @@ class Rule(models.Model):
             if self.text_match is None or self.text_match == '':
                 return True
 
-            if not re.search(self.text_match, value, re.IGNORECASE):
+            if not self.text_match_re.search(value):
                 return False
 
         return True
 
+    @cached_property
+    def text_match_re(self):
+        """The compiled text_match regex"""
+        return re.compile(self.text_match, re.IGNORECASE)
+
+    @cached_property
+    def pint_units(self):
+        """The units of the rule as a Quantity"""
+        return ureg(self.units)
+
+    @cached_property
+    def pretty_rule_units(self):
+        """The units of the rule formatted for the messages"""
+        return pretty_units(self.pint_units)
+
+    def typed_bound(self, bound_name, kind):
+        """
+        Return the min or max of the rule converted to compare it with a value. The bounds are
+        converted once per rule instance since a rule is evaluated against every row of a check.
+
+        :param bound_name: str, min or max
+        :param kind: str, datetime (aware, UTC), date or quantity
+        :return: datetime, date or Quantity
+        """
+        typed_bounds = self.__dict__.setdefault('_typed_bounds', {})
+        try:
+            return typed_bounds[(bound_name, kind)]
+        except KeyError:
+            bound = getattr(self, bound_name)
+            if kind == 'datetime':
+                typed = make_aware(datetime.strptime(str(int(bound)), '%Y%m%d'), pytz.UTC)
+            elif kind == 'date':
+                typed = datetime.strptime(str(int(bound)), '%Y%m%d').date()
+            else:
+                typed = bound * self.pint_units
+            typed_bounds[(bound_name, kind)] = typed
+            return typed
+
+    def _comparable(self, bound_name, value):
+        """
+        Convert the rule bound and the value into the correct types for checking the data
+
+        :return: tuple, (value, bound)
+        """
+        bound = getattr(self, bound_name)
+        if isinstance(value, datetime):
+            value = value.astimezone(get_current_timezone()).replace(tzinfo=pytz.UTC)
+            bound = self.typed_bound(bound_name, 'datetime')
+        elif isinstance(value, date):
+            bound = self.typed_bound(bound_name, 'date')
+        elif isinstance(value, int):
+            bound = int(bound)
+        elif isinstance(value, ureg.Quantity):
+            bound = self.typed_bound(bound_name, 'quantity')
+        elif not isinstance(value, (str, unicode)):
+            # must be a float...
+            value = float(value)
+        return value, bound
+
     def minimum_valid(self, value):
         """
         Validate that the value is not less than the minimum specified by the rule.
@@ -326,33 +431,18 @@ class Rule(models.Model):
         :param value: Value to validate rule against
         :return: bool, True is valid, False if the value is out of range
         """
-        # Convert the rule into the correct types for checking the data
-        rule_min = self.min
-        if rule_min is None:
+        if self.min is None:
             return True
-        else:
-            if isinstance(value, datetime):
-                value = value.astimezone(get_current_timezone()).replace(tzinfo=pytz.UTC)
-                rule_min = make_aware(datetime.strptime(str(int(rule_min)), '%Y%m%d'), pytz.UTC)
-            elif isinstance(value, date):
-                value = value
-                rule_min = datetime.strptime(str(int(rule_min)), '%Y%m%d').date()
-            elif isinstance(value, int):
-                rule_min = int(rule_min)
-            elif isinstance(value, ureg.Quantity):
-                rule_min = rule_min * ureg(self.units)
-            elif not isinstance(value, (str, unicode)):
-                # must be a float...
-                value = float(value)
 
-            try:
-                if value < rule_min:
-                    return False
-                else:
-                    # If rule_min is undefined/None or value is okay, then it is valid.
-                    return True
-            except ValueError:
-                raise ComparisonError("Value could not be compared numerically")
+        value, rule_min = self._comparable('min', value)
+        try:
+            if value < rule_min:
+                return False
+            else:
+                # If rule_min is undefined/None or value is okay, then it is valid.
+                return True
+        except ValueError:
+            raise ComparisonError("Value could not be compared numerically")
 
     def maximum_valid(self, value):
         """
@@ -361,32 +451,17 @@ class Rule(models.Model):
         :param value: Value to validate rule against
         :return: bool, True is valid, False if the value is out of range
         """
-        # Convert the rule into the correct types for checking the data
-        rule_max = self.max
-        if rule_max is None:
+        if self.max is None:
             return True
-        else:
-            if isinstance(value, datetime):
-                value = value.astimezone(get_current_timezone()).replace(tzinfo=pytz.UTC)
-                rule_max = make_aware(datetime.strptime(str(int(rule_max)), '%Y%m%d'), pytz.UTC)
-            elif isinstance(value, date):
-                value = value
-                rule_max = datetime.strptime(str(int(rule_max)), '%Y%m%d').date()
-            elif isinstance(value, int):
-                rule_max = int(rule_max)
-            elif isinstance(value, ureg.Quantity):
-                rule_max = rule_max * ureg(self.units)
-            elif not isinstance(value, (str, unicode)):
-                # must be a float...
-                value = float(value)
 
-            try:
-                if value > rule_max:
-                    return False
-                else:
-                    return True
-            except ValueError:
-                raise ComparisonError("Value could not be compared numerically")
+        value, rule_max = self._comparable('max', value)
+        try:
+            if value > rule_max:
+                return False
+            else:
+                return True
+        except ValueError:
+            raise ComparisonError("Value could not be compared numerically")
 
     def str_to_data_type(self, value):
         """
@@ -436,15 +511,15 @@ class Rule(models.Model):
         if isinstance(value, datetime):
             f_value = str(make_naive(value, pytz.UTC))
             if f_min is not None:
-                f_min = str(datetime.strptime(str(int(self.min)), '%Y%m%d'))
+                f_min = str(self.typed_bound('min', 'datetime').replace(tzinfo=None))
             if f_max is not None:
-                f_max = str(datetime.strptime(str(int(self.max)), '%Y%m%d'))
+                f_max = str(self.typed_bound('max', 'datetime').replace(tzinfo=None))
         elif isinstance(value, date):
             f_value = str(value)
             if f_min is not None:
-                f_min = str(datetime.strptime(str(int(self.min)), '%Y%m%d').date())
+                f_min = str(self.typed_bound('min', 'date'))
             if f_max is not None:
-                f_max = str(datetime.strptime(str(int(self.max)), '%Y%m%d').date())
+                f_max = str(self.typed_bound('max', 'date'))
         elif isinstance(value, int):
             f_value = str(value)
             if self.min is not None:
@@ -534,19 +609,110 @@ class DataQualityCheck(models.Model):
         if identifier is None:
             identifier = randint(100, 100000)
         cache_key = DataQualityCheck.cache_key(identifier)
-        set_cache_raw(cache_key, [])
+        DataQualityCheck.save_results(identifier, [])
+        set_cache_raw(DataQualityCheck.chunks_cache_key(identifier), 0)
         return cache_key
 
     @staticmethod
     def cache_key(identifier):
         """
-        Static method to return the location of the data_quality results from redis.
+        Static method to return the location of the data_quality results from redis. The results
+        are saved in pages, this key holds their number and the counts of the errors and warnings,
+        see save_results.
 
         :param identifier: Import file primary key
         :return:
         """
         return "data_quality_results__%s" % identifier
 
+    @staticmethod
+    def page_cache_key(identifier, page):
+        """Return the location of one page of the results of the checks"""
+        return "data_quality_results__%s__page__%s" % (identifier, page)
+
+    @staticmethod
+    def chunks_cache_key(identifier):
+        """Return the location of the number of chunks the results are saved in"""
+        return "data_quality_results__%s__chunks" % identifier
+
+    @staticmethod
+    def chunk_cache_key(identifier, chunk):
+        """Return the location of the results of one chunk of the checks"""
+        return "data_quality_results__%s__chunk__%s" % (identifier, chunk)
+
+    @staticmethod
+    def initialize_chunks(identifier, count):
+        """
+        Prepare the cache for the results of the chunks of the checks. Each chunk saves its
+        results in its own key (see save_to_cache), and merge_chunks combines them once all the
+        chunks are checked.
+
+        :param identifier: Import file primary key
+        :param count: int, number of chunks
+        :return: None
+        """
+        set_cache_raw(DataQualityCheck.chunks_cache_key(identifier), count, 86400)
+
+    @staticmethod
+    def merge_chunks(identifier):
+        """
+        Merge the results of the chunks into the results of the checks, sorted by id, and remove
+        the results of the chunks.
+
+        :param identifier: Import file primary key
+        :return: list, results of the checks
+        """
+        count = get_cache_raw(DataQualityCheck.chunks_cache_key(identifier)) or 0
+        keys = [DataQualityCheck.chunk_cache_key(identifier, chunk) for chunk in range(count)]
+        chunks = get_many_cache_raw(keys)
+
+        results = list(DataQualityCheck.cached_results(identifier) or [])
+        for key in keys:
+            results += chunks.get(key, [])
+        results.sort(key=lambda k: k['id'])
+
+        DataQualityCheck.save_results(identifier, results)
+        set_cache_raw(DataQualityCheck.chunks_cache_key(identifier), 0)
+        delete_many_cache(keys)
+        return results
+
+    @staticmethod
+    def save_results(identifier, results):
+        """
+        Save the results of the checks in pages of RESULTS_PAGE_SIZE results, so that a page of
+        the results can be read without loading all of them (see cached_results).
+
+        :param identifier: Import file primary key
+        :param results: list, results of the checks sorted by id
+        :return: None
+        """
+        pages = {}
+        for start in range(0, len(results), RESULTS_PAGE_SIZE):
+            key = DataQualityCheck.page_cache_key(identifier, start // RESULTS_PAGE_SIZE)
+            pages[key] = results[start:start + RESULTS_PAGE_SIZE]
+        severities = [result['severity'] for row in results
+                      for result in row['data_quality_results']]
+
+        set_many_cache_raw(pages, 86400)  # 24 hours
+        set_cache_raw(DataQualityCheck.cache_key(identifier), {
+            'total': len(results),
+            'num_errors': severities.count('error'),
+            'num_warnings': severities.count('warning'),
+        }, 86400)
+
+    @staticmethod
+    def cached_results(identifier):
+        """
+        Return the results of the checks saved in the cache.
+
+        :param identifier: Import file primary key
+        :return: CachedResults, or None if there are no results in the cache
+        """
+        summary = get_cache_raw(DataQualityCheck.cache_key(identifier))
+        if summary is None:
+            return None
+        return CachedResults(identifier, summary)
+
     def check_data(self, record_type, rows):
         """
         Send in data as a queryset from the Property/Taxlot ids.
@@ -563,6 +729,12 @@ class DataQualityCheck(models.Model):
         # grab all the rules once, save query time
         rules = self.rules.filter(enabled=True, table_name=record_type).order_by('field', 'severity')
 
+        # load the linked properties / tax lots of the rows and their labels at once, the label
+        # changes are then made in memory and saved at the end
+        rows = list(rows)
+        linked_ids, existing_labels = self._get_linked_labels(record_type, rows)
+        labels = {linked_id: set(label_ids) for linked_id, label_ids in existing_labels.items()}
+
         # Get the list of the field names that will show in every result
         fields = self.get_fieldnames(record_type)
         for row in rows:
@@ -575,7 +747,9 @@ class DataQualityCheck(models.Model):
                 self.results[row.id]['data_quality_results'] = []
 
             # Run the checks
-            self._check(rules, row)
+            self._check(rules, row, linked_ids.get(row.id), labels)
+
+        self._save_status_labels(record_type, existing_labels, labels)
 
         # Prune the results will remove any entries that have zero data_quality_results
         for k, v in self.results.items():
@@ -591,36 +765,85 @@ class DataQualityCheck(models.Model):
     def reset_results(self):
         self.results = {}
 
-    def _check(self, rules, row):
+    @staticmethod
+    def _get_label_model(record_type):
+        """Return the through model of the labels and the name of its linked id field"""
+        if record_type == 'PropertyState':
+            return apps.get_model('seed', 'Property_labels'), 'property_id'
+        return apps.get_model('seed', 'TaxLot_labels'), 'taxlot_id'
+
+    def _get_linked_labels(self, record_type, rows):
+        """
+        Load the properties / tax lots linked to the rows and the ids of their labels.
+
+        :param record_type: one of PropertyState | TaxLotState
+        :param rows: list, PropertyStates or TaxLotStates
+        :return: tuple, (dict of the linked id by state id, dict of the set of label ids by
+            linked id)
+        """
+        label_class, linked_field = self._get_label_model(record_type)
+        view_class = PropertyView if record_type == 'PropertyState' else TaxLotView
+        linked_ids = dict(
+            view_class.objects.filter(state_id__in=[row.id for row in rows]).values_list(
+                'state_id', linked_field)
+        )
+
+        labels = {linked_id: set() for linked_id in linked_ids.values()}
+        for linked_id, label_id in label_class.objects.filter(
+                **{linked_field + '__in': labels.keys()}).values_list(linked_field, 'statuslabel_id'):
+            labels[linked_id].add(label_id)
+        return linked_ids, labels
+
+    def _save_status_labels(self, record_type, existing_labels, labels):
+        """
+        Save the label changes of the checks, with one insert of the new labels and one delete of
+        the removed ones.
+
+        :param record_type: one of PropertyState | TaxLotState
+        :param existing_labels: dict, set of the label ids in the database by linked id
+        :param labels: dict, set of the label ids after the checks by linked id
+        :return: None
+        """
+        label_class, linked_field = self._get_label_model(record_type)
+        added = []
+        removed = defaultdict(list)
+        for linked_id, label_ids in labels.items():
+            for label_id in label_ids - existing_labels[linked_id]:
+                added.append((linked_id, label_id))
+            for label_id in existing_labels[linked_id] - label_ids:
+                removed[label_id].append(linked_id)
+
+        if added:
+            try:
+                with transaction.atomic():
+                    label_class.objects.bulk_create([
+                        label_class(**{linked_field: linked_id, 'statuslabel_id': label_id})
+                        for linked_id, label_id in added
+                    ])
+            except IntegrityError:
+                # another check labeled some of the same records in the meantime
+                for linked_id, label_id in added:
+                    label_class.objects.get_or_create(
+                        **{linked_field: linked_id, 'statuslabel_id': label_id})
+
+        if removed:
+            label_class.objects.filter(reduce(operator.or_, [
+                Q(**{'statuslabel_id': label_id, linked_field + '__in': linked_ids})
+                for label_id, linked_ids in removed.items()
+            ])).delete()
+
+    def _check(self, rules, row, linked_id, labels):
         """
         Check for errors in the min/max of the values.
 
         :param rules: list, rules to run from database objects
         :param row: PropertyState or TaxLotState, row of data to check
+        :param linked_id: int, id of the Property or TaxLot of the row, None if the row has no view
+        :param labels: dict, set of the label ids by linked id, updated with the label changes
         :return: None
         """
-        # check if the row has any rules applied to it
-        model_labels = {'linked_id': None, 'label_ids': []}
-        if row.__class__.__name__ == 'PropertyState':
-            label = apps.get_model('seed', 'Property_labels')
-            if PropertyView.objects.filter(state=row).exists():
-                model_labels['linked_id'] = PropertyView.objects.get(state=row).property_id
-                model_labels['label_ids'] = list(
-                    label.objects.filter(property_id=model_labels['linked_id']).values_list(
-                        'statuslabel_id', flat=True)
-                )
-                # _log.debug("Property {} has {} labels".format(model_labels['linked_id'],
-                #                                               len(model_labels['label_ids'])))
-        elif row.__class__.__name__ == 'TaxLotState':
-            label = apps.get_model('seed', 'TaxLot_labels')
-            if TaxLotView.objects.filter(state=row).exists():
-                model_labels['linked_id'] = TaxLotView.objects.get(state=row).taxlot_id
-                model_labels['label_ids'] = list(
-                    label.objects.filter(taxlot_id=model_labels['linked_id']).values_list(
-                        'statuslabel_id', flat=True)
-                )
-                # _log.debug("TaxLot {} has {} labels".format(model_labels['linked_id'],
-                #                                             len(model_labels['label_ids'])))
+        # the labels of the linked property or tax lot before the checks of the row
+        label_ids = set(labels.get(linked_id, ()))
 
         # rename the propertystate_id and taxlot_id to be model_id
         for rule in rules:
@@ -643,32 +866,29 @@ class DataQualityCheck(models.Model):
                 if (rule.table_name, rule.field) in self.column_lookup:
                     display_name = self.column_lookup[(rule.table_name, rule.field)]
 
-                # get the status_labels for the linked properties and tax lots
-                linked_id = model_labels['linked_id']
-
                 if (rule.table_name, rule.field) not in self.column_lookup:
                     # If the rule is not in the column lookup, then it may have been a required
                     # field that wasn't mapped
                     if rule.required:
                         self.add_result_missing_req(row.id, rule, display_name, value)
-                        label_applied = self.update_status_label(label, rule, linked_id)
+                        label_applied = self.update_status_label(labels, rule, linked_id)
                 elif value is None or value == '':
                     # Empty fields
                     if rule.required:
                         self.add_result_missing_and_none(row.id, rule, display_name, value)
-                        label_applied = self.update_status_label(label, rule, linked_id)
+                        label_applied = self.update_status_label(labels, rule, linked_id)
                     elif rule.not_null:
                         self.add_result_is_null(row.id, rule, display_name, value)
-                        label_applied = self.update_status_label(label, rule, linked_id)
+                        label_applied = self.update_status_label(labels, rule, linked_id)
                 elif not rule.valid_text(value):
                     self.add_result_string_error(row.id, rule, display_name, value)
-                    label_applied = self.update_status_label(label, rule, linked_id)
+                    label_applied = self.update_status_label(labels, rule, linked_id)
                 else:
                     try:
                         if not rule.minimum_valid(value):
                             s_min, s_max, s_value = rule.format_strings(value)
                             self.add_result_min_error(row.id, rule, display_name, s_value, s_min)
-                            label_applied = self.update_status_label(label, rule, linked_id)
+                            label_applied = self.update_status_label(labels, rule, linked_id)
                     except ComparisonError:
                         s_min, s_max, s_value = rule.format_strings(value)
                         self.add_result_comparison_error(row.id, rule, display_name, s_value, s_min)
@@ -678,38 +898,29 @@ class DataQualityCheck(models.Model):
                         if not rule.maximum_valid(value):
                             s_min, s_max, s_value = rule.format_strings(value)
                             self.add_result_max_error(row.id, rule, display_name, s_value, s_max)
-                            label_applied = self.update_status_label(label, rule, linked_id)
+                            label_applied = self.update_status_label(labels, rule, linked_id)
                     except ComparisonError:
                         s_min, s_max, s_value = rule.format_strings(value)
                         self.add_result_comparison_error(row.id, rule, display_name, s_value, s_max)
                         continue
 
-                if not label_applied and rule.status_label_id in model_labels['label_ids']:
-                    self.remove_status_label(label, rule, linked_id)
+                if not label_applied and rule.status_label_id in label_ids:
+                    self.remove_status_label(labels, rule, linked_id)
 
-    def save_to_cache(self, identifier):
+    def save_to_cache(self, identifier, chunk=0):
         """
-        Save the results to the cache database. The data in the cache are
-        stored as a list of dictionaries. The data in this class are stored as
-        a dict of dict. This is important to remember because the data from the
-        cache cannot be simply loaded into the above structure.
+        Save the results of a chunk of the checks to the cache database, in a key of their own so
+        that the chunks checked in parallel do not overwrite each other. The data in the cache are
+        stored as a list of dictionaries. The data in this class are stored as a dict of dict.
+        This is important to remember because the data from the cache cannot be simply loaded
+        into the above structure.
 
         :param identifier: Import file primary key
+        :param chunk: int, index of the chunk, see initialize_chunks
         :return: None
         """
-
-        # change the format of the data in the cache. Make this a list of
-        # objects instead of object of objects.
-        existing_results = get_cache_raw(DataQualityCheck.cache_key(identifier)) or []
-
-        results = []
-        for key, value in self.results.items():
-            results.append(value)
-
-        existing_results += results
-
-        z = sorted(existing_results, key=lambda k: k['id'])
-        set_cache_raw(DataQualityCheck.cache_key(identifier), z, 86400)  # 24 hours
+        set_cache_raw(DataQualityCheck.chunk_cache_key(identifier, chunk),
+                      self.results.values(), 86400)  # 24 hours
 
     def initialize_rules(self):
         """
@@ -863,40 +1074,29 @@ class DataQualityCheck(models.Model):
             'severity': rule.get_severity_display(),
         })
 
-    def update_status_label(self, label_class, rule, linked_id):
+    def update_status_label(self, labels, rule, linked_id):
         """
 
-        :param label_class: statuslabel object, either property label or taxlot label
+        :param labels: dict, set of the label ids by linked id
         :param rule: rule object
-        :param linked_id: id of propertystate or taxlotstate object
+        :param linked_id: id of the linked property or taxlot object
         :return: boolean, if labeled was applied
         """
 
         if rule.status_label_id is not None and linked_id is not None:
-            if rule.table_name == 'PropertyState':
-                label_class.objects.get_or_create(property_id=linked_id,
-                                                  statuslabel_id=rule.status_label_id)
-            else:
-                label_class.objects.get_or_create(taxlot_id=linked_id,
-                                                  statuslabel_id=rule.status_label_id)
+            labels[linked_id].add(rule.status_label_id)
             return True
 
-    def remove_status_label(self, label_class, rule, linked_id):
+    def remove_status_label(self, labels, rule, linked_id):
         """
         Remove label because it did not match any of the range exceptions
 
-        :param label_class: statuslabel object, either property label or taxlot label
+        :param labels: dict, set of the label ids by linked id
         :param rule: rule object
-        :param linked_id: id of propertystate or taxlotstate object
-        :return: boolean, if labeled was applied
+        :param linked_id: id of the linked property or taxlot object
+        :return: None
         """
-
-        if rule.table_name == 'PropertyState':
-            label_class.objects.filter(property_id=linked_id,
-                                       statuslabel_id=rule.status_label_id).delete()
-        else:
-            label_class.objects.filter(taxlot_id=linked_id,
-                                       statuslabel_id=rule.status_label_id).delete()
+        labels[linked_id].discard(rule.status_label_id)
 
     def retrieve_result_by_address(self, address):
         """
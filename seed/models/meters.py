@@ -2,11 +2,25 @@
 """
 :copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 """
+import math
+import struct
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import izip
+from operator import attrgetter
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Sum
+from django.utils import timezone
 
 from seed.models import PropertyView, Scenario
 
+# decimal places of the costs, which are packed as integers
+COST_DECIMAL_PLACES = 4
+
+# packed cost of the readings without a cost
+_NO_COST = -2 ** 63
+
 
 class Meter(models.Model):
     NATURAL_GAS = 1
@@ -64,6 +78,15 @@ class Meter(models.Model):
         (WATT_HOURS, 'Wh'),
     )
 
+    # the readings are saved as a TimeSeries per reading, or packed in a TimeSeriesBlock per day
+    ROW_STORAGE = 1
+    BLOCK_STORAGE = 2
+
+    STORAGE_MODES = (
+        (ROW_STORAGE, 'Rows'),
+        (BLOCK_STORAGE, 'Blocks'),
+    )
+
     name = models.CharField(max_length=100)
     property_view = models.ForeignKey(PropertyView, related_name='meters',
                                       on_delete=models.CASCADE, null=True, blank=True)
@@ -71,6 +94,53 @@ class Meter(models.Model):
                                  on_delete=models.CASCADE, null=True)
     energy_type = models.IntegerField(choices=ENERGY_TYPES)
     energy_units = models.IntegerField(choices=ENERGY_UNITS)
+    storage = models.IntegerField(choices=STORAGE_MODES, default=ROW_STORAGE)
+
+    def save_readings(self, readings):
+        """
+        Save the readings of the meter in its storage mode. In block storage, the readings are
+        merged with the saved readings of the same days, and replace the ones with the same
+        begin time.
+
+        :param readings: iterable, unsaved TimeSeries
+        """
+        readings = list(readings)
+        for reading in readings:
+            reading.meter = self
+
+        if self.storage == self.ROW_STORAGE:
+            TimeSeries.objects.bulk_create(readings)
+        else:
+            TimeSeriesBlock.save_readings(self, readings)
+
+    def readings(self, start=None, end=None):
+        """
+        Return the readings of the meter ordered by begin time, whatever the storage mode.
+
+        :param start: datetime, (optional) only the readings that begin at or after it
+        :param end: datetime, (optional) only the readings that begin before it
+        :return: iterator of TimeSeries, which are not saved in block storage
+        """
+        if self.storage == self.ROW_STORAGE:
+            ts = self.timeseries_set.all()
+            if start is not None:
+                ts = ts.filter(begin_time__gte=start)
+            if end is not None:
+                ts = ts.filter(begin_time__lt=end)
+            return ts.order_by('begin_time').iterator()
+
+        blocks = self.timeseries_blocks.all()
+        if start is not None:
+            blocks = blocks.filter(end_time__gte=start)
+        if end is not None:
+            blocks = blocks.filter(begin_time__lt=end)
+        return _readings_in_range(blocks.order_by('begin_time').iterator(), start, end)
+
+    def readings_count(self):
+        """Return the number of readings of the meter"""
+        if self.storage == self.ROW_STORAGE:
+            return self.timeseries_set.count()
+        return self.timeseries_blocks.aggregate(count=Sum('count'))['count'] or 0
 
 
 class TimeSeries(models.Model):
@@ -82,4 +152,151 @@ class TimeSeries(models.Model):
     meter = models.ForeignKey(Meter, null=True, blank=True)
 
     class Meta:
-        index_together = [['begin_time', 'end_time']]
+        index_together = [['begin_time', 'end_time'], ['meter', 'begin_time']]
+
+
+class TimeSeriesBlock(models.Model):
+    """
+    For storing the contiguous readings of a meter on a day (in UTC) that have the same duration.
+    The readings and costs are packed as 8 byte values, which takes a fraction of the
+    space of a TimeSeries per reading and its indexes.
+    """
+    meter = models.ForeignKey(Meter, related_name='timeseries_blocks', on_delete=models.CASCADE)
+    begin_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    # duration of each reading in seconds
+    interval = models.IntegerField()
+    count = models.IntegerField()
+    # floats, NaN for no reading
+    readings = models.BinaryField()
+    # integers in units of 10 ** -COST_DECIMAL_PLACES, null when none of the readings has a cost
+    costs = models.BinaryField(null=True)
+
+    class Meta:
+        index_together = [['meter', 'begin_time']]
+
+    def expand(self):
+        """
+        Return the readings of the block.
+
+        :return: generator of unsaved TimeSeries
+        """
+        readings = _unpack('d', self.readings)
+        if self.costs is None:
+            costs = [_NO_COST] * self.count
+        else:
+            costs = _unpack('q', self.costs)
+
+        duration = timedelta(seconds=self.interval)
+        begin_time = self.begin_time
+        for reading, cost in izip(readings, costs):
+            yield TimeSeries(
+                begin_time=begin_time,
+                end_time=begin_time + duration,
+                reading=None if math.isnan(reading) else reading,
+                cost=None if cost == _NO_COST else Decimal(cost).scaleb(-COST_DECIMAL_PLACES),
+                meter_id=self.meter_id,
+            )
+            begin_time += duration
+
+    @classmethod
+    def pack(cls, meter, readings):
+        """
+        Pack the readings in blocks. A new block is started on each day, and when a reading does
+        not follow the previous one or has another duration.
+
+        :param meter: Meter
+        :param readings: iterable, TimeSeries with a begin and end time
+        :return: list of unsaved TimeSeriesBlock
+        """
+        blocks = []
+        block = None
+        for reading in sorted(readings, key=attrgetter('begin_time')):
+            if reading.begin_time is None or reading.end_time is None:
+                raise ValueError('The readings of blocks need a begin and end time')
+
+            interval = int((reading.end_time - reading.begin_time).total_seconds())
+            if (block is None or interval != block[1] or
+                    reading.begin_time != block[0] + timedelta(seconds=interval * len(block[2])) or
+                    _block_day(reading.begin_time) != _block_day(block[0])):
+                block = (reading.begin_time, interval, [])
+                blocks.append(block)
+            block[2].append(reading)
+
+        return [cls._create_block(meter, *b) for b in blocks]
+
+    @classmethod
+    def _create_block(cls, meter, begin_time, interval, readings):
+        costs = [_pack_cost(r.cost) for r in readings]
+        return cls(
+            meter=meter,
+            begin_time=begin_time,
+            end_time=begin_time + timedelta(seconds=interval * len(readings)),
+            interval=interval,
+            count=len(readings),
+            readings=_pack('d', [float('nan') if r.reading is None else float(r.reading)
+                                 for r in readings]),
+            costs=None if all(c == _NO_COST for c in costs) else _pack('q', costs),
+        )
+
+    @classmethod
+    def save_readings(cls, meter, readings):
+        """
+        Merge the readings with the saved blocks of their days, then save the blocks again.
+
+        :param meter: Meter
+        :param readings: list, TimeSeries with a begin and end time
+        """
+        if not readings:
+            return
+
+        days = {_block_day(r.begin_time) for r in readings}
+        saved = [
+            b for b in meter.timeseries_blocks.filter(
+                begin_time__gte=_day_start(min(days)),
+                begin_time__lt=_day_start(max(days) + timedelta(days=1)),
+            ) if _block_day(b.begin_time) in days
+        ]
+
+        merged = {}
+        for block in saved:
+            merged.update((r.begin_time, r) for r in block.expand())
+        merged.update((r.begin_time, r) for r in readings)
+
+        with transaction.atomic():
+            cls.objects.filter(id__in=[b.id for b in saved]).delete()
+            cls.objects.bulk_create(cls.pack(meter, merged.values()))
+
+
+def _block_day(value):
+    return value.astimezone(timezone.utc).date()
+
+
+def _day_start(day):
+    return datetime.combine(day, time()).replace(tzinfo=timezone.utc)
+
+
+def _readings_in_range(blocks, start, end):
+    for block in blocks:
+        for reading in block.expand():
+            if start is not None and reading.begin_time < start:
+                continue
+            if end is not None and reading.begin_time >= end:
+                break
+            yield reading
+
+
+def _pack_cost(cost):
+    if cost is None:
+        return _NO_COST
+    return int(Decimal(str(cost)).scaleb(COST_DECIMAL_PLACES).to_integral_value())
+
+
+def _pack(typecode, values):
+    """Pack the values as little-endian 8 byte values, whatever the byte order of the server"""
+    return struct.pack('<{}{}'.format(len(values), typecode), *values)
+
+
+def _unpack(typecode, value):
+    value = bytes(value)
+    return struct.unpack('<{}{}'.format(len(value) // 8, typecode), value)
@@ -16,7 +16,7 @@ from django.apps import apps
 from django.contrib.postgres.fields import JSONField
 from django.db import IntegrityError
 from django.db import models
-from django.db.models.signals import pre_delete, post_save
+from django.db.models.signals import pre_delete, post_delete, post_save
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
 from quantityfield.fields import QuantityField
@@ -35,8 +35,11 @@ from seed.models import (
     MERGE_STATE_UNKNOWN,
     TaxLotProperty
 )
+from seed.managers.state import StateManager
 from seed.utils.address import normalize_address_str
 from seed.utils.generic import split_model_fields, obj_to_dict
+from seed.utils.hashing import hash_state_object
+from seed.utils.pagination import invalidate_inventory_count
 from seed.utils.time import convert_datestr
 from seed.utils.time import convert_to_js_timestamp
 
@@ -211,11 +214,23 @@ class PropertyState(models.Model):
     extra_data = JSONField(default=dict, blank=True)
     measures = models.ManyToManyField('Measure', through='PropertyMeasure')
 
+    # MD5 of the data of the state, see seed.utils.hashing.hash_state_object. Calculated on save
+    # and bulk_create, and used to find exact duplicates.
+    hash_object = models.CharField(max_length=32, null=True, blank=True, default=None, editable=False)
+
+    objects = StateManager()
+
     class Meta:
         index_together = [
             ['import_file', 'data_state'],
             ['import_file', 'data_state', 'merge_state'],
             ['analysis_state', 'organization'],
+            # fields used to look up the matching states of an import
+            ['organization', 'ubid'],
+            ['organization', 'pm_property_id'],
+            ['organization', 'custom_id_1'],
+            ['organization', 'normalized_address'],
+            ['organization', 'hash_object'],
         ]
 
     def promote(self, cycle, property_id=None):
@@ -337,6 +352,10 @@ class PropertyState(models.Model):
         else:
             self.normalized_address = None
 
+        self.hash_object = hash_state_object(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'hash_object'}
+
         return super(PropertyState, self).save(*args, **kwargs)
 
     def history(self):
@@ -643,6 +662,24 @@ class PropertyState(models.Model):
 
         return merged_state
 
+    @classmethod
+    def ids_with_relationships(cls, state_ids):
+        """
+        Return the ids of the states that have any of the relationships that are copied by
+        merge_relationships (scenarios, building files, simulations or measures).
+
+        :param state_ids: list, PropertyState ids
+        :return: set, PropertyState ids
+        """
+        related_ids = set()
+        for model_name in ['Scenario', 'BuildingFile', 'Simulation', 'PropertyMeasure']:
+            related_ids.update(
+                apps.get_model('seed', model_name).objects.filter(
+                    property_state_id__in=state_ids
+                ).values_list('property_state_id', flat=True)
+            )
+        return related_ids
+
 
 @receiver(pre_delete, sender=PropertyState)
 def pre_delete_state(sender, **kwargs):
@@ -671,11 +708,14 @@ class PropertyView(models.Model):
 
     class Meta:
         unique_together = ('property', 'cycle',)
-        index_together = [['state', 'cycle']]
+        # ['cycle', 'id'] serves the keyset pagination of the inventory lists
+        index_together = [['state', 'cycle'], ['cycle', 'id']]
 
     def __init__(self, *args, **kwargs):
         self._import_filename = kwargs.pop('import_filename', None)
         super(PropertyView, self).__init__(*args, **kwargs)
+        # the cycle when loaded, so the cached count of a cycle the view is moved from is forgotten
+        self._loaded_cycle_id = self.__dict__.get('cycle_id')
 
     def initialize_audit_logs(self, **kwargs):
         kwargs.update({
@@ -730,10 +770,24 @@ class PropertyView(models.Model):
 def post_save_property_view(sender, **kwargs):
     """
     When changing/saving the PropertyView, go ahead and touch the Property (if linked) so that the record
-    receives an updated datetime
+    receives an updated datetime. The cached number of views of the cycle (and of the previous cycle
+    of a view that is moved) is forgotten as well.
     """
     if kwargs['instance'].property:
         kwargs['instance'].property.save()
+    view = kwargs['instance']
+    invalidate_inventory_count('property', view.cycle_id)
+    if view._loaded_cycle_id not in (None, view.cycle_id):
+        invalidate_inventory_count('property', view._loaded_cycle_id)
+    view._loaded_cycle_id = view.cycle_id
+
+
+@receiver(post_delete, sender=PropertyView)
+def post_delete_property_view(sender, **kwargs):
+    """
+    Forget the cached number of PropertyViews of the cycle when one is deleted
+    """
+    invalidate_inventory_count('property', kwargs['instance'].cycle_id)
 
 
 class PropertyAuditLog(models.Model):
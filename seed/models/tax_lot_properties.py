@@ -101,6 +101,21 @@ class TaxLotProperty(models.Model):
                 data[f.name] = list(data[f.name])
         return data
 
+    @classmethod
+    def _notes_count(cls, view_id_field, view_ids):
+        """
+        Return the number of notes of each of the views in a single query.
+
+        :param view_id_field: str, property_view_id or taxlot_view_id
+        :param view_ids: list, ids of the views
+        :return: dict, {view_id: notes count}, views without notes are not included
+        """
+        return dict(
+            apps.get_model('seed', 'Note').objects.filter(
+                **{view_id_field + '__in': view_ids}
+            ).values_list(view_id_field).annotate(count=models.Count('id')).order_by()
+        )
+
     @classmethod
     def get_related(cls, object_list, show_columns, columns_from_database):
         """
@@ -153,7 +168,7 @@ class TaxLotProperty(models.Model):
 
         # Ids of propertyviews to look up in m2m
         ids = [obj.pk for obj in object_list]
-        joins = TaxLotProperty.objects.filter(**{lookups['obj_query_in']: ids}).select_related(lookups['related_view'])
+        joins = list(TaxLotProperty.objects.filter(**{lookups['obj_query_in']: ids}))
 
         # Get all ids of tax lots on these joins
         related_ids = [getattr(j, lookups['related_view_id']) for j in joins]
@@ -170,12 +185,14 @@ class TaxLotProperty(models.Model):
             else:
                 obj_column_name_mapping[column['column_name']] = column['name']
 
+        # The measures are not returned in the list for now, excluding them also avoids a query
+        # per state
         related_map = {}
         for related_view in related_views:
             related_dict = TaxLotProperty.model_to_dict_with_mapping(related_view.state,
                                                                      related_column_name_mapping,
                                                                      fields=show_columns,
-                                                                     exclude=['extra_data'])
+                                                                     exclude=['extra_data', 'measures'])
 
             related_dict[lookups['related_state_id']] = related_view.state.id
 
@@ -206,9 +223,11 @@ class TaxLotProperty(models.Model):
 
         # Not sure what this code is really doing, but it only exists for TaxLotViews
         if lookups['obj_class'] == 'TaxLotView':
-            # Get whole taxlotstate table:
+            # Get the tax lots of the related property views
             tuple_prop_to_jurisdiction_tl = tuple(
-                TaxLotProperty.objects.values_list('property_view_id', 'taxlot_view__state__jurisdiction_tax_lot_id')
+                TaxLotProperty.objects.filter(
+                    property_view_id__in=[join.property_view_id for join in joins]
+                ).values_list('property_view_id', 'taxlot_view__state__jurisdiction_tax_lot_id')
             )
 
             # create a mapping that defaults to an empty list
@@ -218,6 +237,21 @@ class TaxLotProperty(models.Model):
             for name, pth in tuple_prop_to_jurisdiction_tl:
                 prop_to_jurisdiction_tl[name].append(pth)
 
+        # Count the notes of all of the views (and related views) at once
+        obj_notes_count = cls._notes_count(lookups['obj_view_id'], ids)
+        related_notes_count = cls._notes_count(lookups['related_view_id'], related_ids)
+
+        # Label names of the properties / tax lots of the views, ordered by name
+        if lookups['obj_class'] == 'PropertyView':
+            labels_through = apps.get_model('seed', 'Property').labels.through
+        else:
+            labels_through = apps.get_model('seed', 'TaxLot').labels.through
+        label_names = defaultdict(list)
+        for obj_id, label_name in labels_through.objects.filter(
+            **{lookups['obj_id'] + '__in': [getattr(obj, lookups['obj_id']) for obj in object_list]}
+        ).values_list(lookups['obj_id'], 'statuslabel__name').order_by('statuslabel__name'):
+            label_names[obj_id].append(label_name)
+
         # A mapping of object's view pk to a list of related state info for a related view
         join_map = {}
         for join in joins:
@@ -246,11 +280,7 @@ class TaxLotProperty(models.Model):
                     lookups['related_view_id']: getattr(join, lookups['related_view_id'])
                 })
 
-            join_dict['notes_count'] = getattr(join, lookups['related_view']).notes.count()
-
-            # remove the measures from this view for now
-            if join_dict.get('measures'):
-                del join_dict['measures']
+            join_dict['notes_count'] = related_notes_count.get(getattr(join, lookups['related_view_id']), 0)
 
             try:
                 join_map[getattr(join, lookups['obj_view_id'])].append(join_dict)
@@ -262,7 +292,7 @@ class TaxLotProperty(models.Model):
             obj_dict = TaxLotProperty.model_to_dict_with_mapping(obj.state,
                                                                  obj_column_name_mapping,
                                                                  fields=show_columns,
-                                                                 exclude=['extra_data'])
+                                                                 exclude=['extra_data', 'measures'])
 
             obj_dict = dict(
                 obj_dict.items() +
@@ -275,7 +305,7 @@ class TaxLotProperty(models.Model):
 
             # Use property_id instead of default (state_id)
             obj_dict['id'] = getattr(obj, lookups['obj_id'])
-            obj_dict['notes_count'] = obj.notes.count()
+            obj_dict['notes_count'] = obj_notes_count.get(obj.pk, 0)
 
             obj_dict[lookups['obj_state_id']] = obj.state.id
             obj_dict[lookups['obj_view_id']] = obj.id
@@ -295,20 +325,10 @@ class TaxLotProperty(models.Model):
             # All the related tax lot states.
             obj_dict['related'] = join_map.get(obj.pk, [])
 
-            # remove the measures from this view for now
-            if obj_dict.get('measures'):
-                del obj_dict['measures']
-
-            label_string = []
-            if hasattr(obj, 'property'):
-                for label in obj.property.labels.all().order_by('name'):
-                    label_string.append(label.name)
-                obj_dict['property_labels'] = ','.join(label_string)
-
-            elif hasattr(obj, 'taxlot'):
-                for label in obj.taxlot.labels.all().order_by('name'):
-                    label_string.append(label.name)
-                obj_dict['taxlot_labels'] = ','.join(label_string)
+            if lookups['obj_class'] == 'PropertyView':
+                obj_dict['property_labels'] = ','.join(label_names[obj.property_id])
+            else:
+                obj_dict['taxlot_labels'] = ','.join(label_names[obj.taxlot_id])
 
             results.append(obj_dict)
 
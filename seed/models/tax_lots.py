@@ -12,7 +12,7 @@ from os import path
 
 from django.contrib.postgres.fields import JSONField
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from auditlog import AUDIT_IMPORT
@@ -29,8 +29,11 @@ from seed.models import (
     MERGE_STATE,
     MERGE_STATE_UNKNOWN,
 )
+from seed.managers.state import StateManager
 from seed.utils.address import normalize_address_str
 from seed.utils.generic import split_model_fields, obj_to_dict
+from seed.utils.hashing import hash_state_object
+from seed.utils.pagination import invalidate_inventory_count
 from seed.utils.time import convert_to_js_timestamp
 
 _log = logging.getLogger(__name__)
@@ -81,10 +84,21 @@ class TaxLotState(models.Model):
 
     extra_data = JSONField(default=dict, blank=True)
 
+    # MD5 of the data of the state, see seed.utils.hashing.hash_state_object. Calculated on save
+    # and bulk_create, and used to find exact duplicates.
+    hash_object = models.CharField(max_length=32, null=True, blank=True, default=None, editable=False)
+
+    objects = StateManager()
+
     class Meta:
         index_together = [
             ['import_file', 'data_state'],
-            ['import_file', 'data_state', 'merge_state']
+            ['import_file', 'data_state', 'merge_state'],
+            # fields used to look up the matching states of an import
+            ['organization', 'jurisdiction_tax_lot_id'],
+            ['organization', 'custom_id_1'],
+            ['organization', 'normalized_address'],
+            ['organization', 'hash_object'],
         ]
 
     def __unicode__(self):
@@ -185,6 +199,10 @@ class TaxLotState(models.Model):
         else:
             self.normalized_address = None
 
+        self.hash_object = hash_state_object(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'hash_object'}
+
         return super(TaxLotState, self).save(*args, **kwargs)
 
     def history(self):
@@ -380,11 +398,14 @@ class TaxLotView(models.Model):
 
     class Meta:
         unique_together = ('taxlot', 'cycle',)
-        index_together = [['state', 'cycle']]
+        # ['cycle', 'id'] serves the keyset pagination of the inventory lists
+        index_together = [['state', 'cycle'], ['cycle', 'id']]
 
     def __init__(self, *args, **kwargs):
         self._import_filename = kwargs.pop('import_filename', None)
         super(TaxLotView, self).__init__(*args, **kwargs)
+        # the cycle when loaded, so the cached count of a cycle the view is moved from is forgotten
+        self._loaded_cycle_id = self.__dict__.get('cycle_id')
 
     def initialize_audit_logs(self, **kwargs):
         kwargs.update({
@@ -441,10 +462,24 @@ class TaxLotView(models.Model):
 def post_save_taxlot_view(sender, **kwargs):
     """
     When changing/saving the TaxLotView, go ahead and touch the TaxLot (if linked) so that the record
-    receives an updated datetime
+    receives an updated datetime. The cached number of views of the cycle (and of the previous cycle
+    of a view that is moved) is forgotten as well.
     """
     if kwargs['instance'].taxlot:
         kwargs['instance'].taxlot.save()
+    view = kwargs['instance']
+    invalidate_inventory_count('taxlot', view.cycle_id)
+    if view._loaded_cycle_id not in (None, view.cycle_id):
+        invalidate_inventory_count('taxlot', view._loaded_cycle_id)
+    view._loaded_cycle_id = view.cycle_id
+
+
+@receiver(post_delete, sender=TaxLotView)
+def post_delete_taxlot_view(sender, **kwargs):
+    """
+    Forget the cached number of TaxLotViews of the cycle when one is deleted
+    """
+    invalidate_inventory_count('taxlot', kwargs['instance'].cycle_id)
 
 
 class TaxLotAuditLog(models.Model):
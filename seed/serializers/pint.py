@@ -26,31 +26,81 @@ def get_dimensionality(quantity_object):
     return str(quantity_object.dimensionality)
 
 
+class DisplayUnitConverter(object):
+    """
+    Collapses Quantity objects down to straight Floats in the display units of an organization.
+    The conversion factor from the units of a value to the display units is computed once per
+    unit (i.e. once per Quantity column), after which collapsing a value is a multiplication and a
+    round.
+    """
+
+    def __init__(self, display_units_eui, display_units_area, significant_figures):
+        # make extensible / field name agnostic by just branching on the dimensionality
+        # and not the field name (eg. 'gross_floor_area') ... the dimensionality gets
+        # enforced separately by the django pint column type
+        self.pint_specs = {
+            EUI_DIMENSIONALITY: display_units_eui or EUI_DEFAULT_UNITS,
+            AREA_DIMENSIONALITY: display_units_area or AREA_DEFAULT_UNITS
+        }
+        self.significant_figures = significant_figures
+        self.factors = {}
+
+    def factor(self, units):
+        """
+        Return the factor which converts a magnitude in the units to the display units
+
+        :param units: UnitsContainer, the units of a Quantity
+        :return: float
+        """
+        try:
+            return self.factors[units]
+        except KeyError:
+            quantity = ureg.Quantity(1.0, units)
+            pint_spec = self.pint_specs[get_dimensionality(quantity)]
+            factor = self.factors[units] = quantity.to(pint_spec).magnitude
+            return factor
+
+    def collapse(self, x):
+        """Collapse a Quantity, or the Quantities of a list of dicts, see collapse_unit"""
+        if isinstance(x, ureg.Quantity):
+            return round(x.magnitude * self.factor(x._units), self.significant_figures)
+        elif isinstance(x, list):
+            # recurse out to collapse a dict for eg. the `related` key that
+            # contains properties when the pt_dict is for a taxlot and vice-versa
+            return [self.collapse_dict(y) for y in x]
+        else:
+            return x
+
+    def collapse_dict(self, pt_dict):
+        """Collapse the Quantities of a dict, see apply_display_unit_preferences"""
+        return {k: self.collapse(v) for k, v in pt_dict.iteritems()}
+
+
+# converters by the display preferences, which there are only a handful of
+_converters = {}
+
+
+def get_display_unit_converter(org):
+    """
+    Return the DisplayUnitConverter for the display preferences of the organization. Converters
+    are shared between the organizations with the same preferences and live as long as the
+    process, so the conversion factors are only computed the first time they are needed.
+    """
+    preferences = (org.display_units_eui, org.display_units_area, org.display_significant_figures)
+    try:
+        return _converters[preferences]
+    except KeyError:
+        converter = _converters[preferences] = DisplayUnitConverter(*preferences)
+        return converter
+
+
 def collapse_unit(org, x):
     """
     Collapse a Quantity object present down to a straight Float, per the
     preferences of the organization supplied (or the base units). Generally
     used to hide the fact of Quantities from Angular.
     """
-    # make extensible / field name agnostic by just branching on the dimensionality
-    # and not the field name (eg. 'gross_floor_area') ... the dimensionality gets
-    # enforced separately by the django pint column type
-    pint_specs = {
-        EUI_DIMENSIONALITY: org.display_units_eui or EUI_DEFAULT_UNITS,
-        AREA_DIMENSIONALITY: org.display_units_area or AREA_DEFAULT_UNITS
-    }
-
-    if isinstance(x, ureg.Quantity):
-        dimensionality = get_dimensionality(x)
-        pint_spec = pint_specs[dimensionality]
-        converted_value = x.to(pint_spec).magnitude
-        return round(converted_value, org.display_significant_figures)
-    elif isinstance(x, list):
-        # recurse out to collapse a dict for eg. the `related` key that
-        # contains properties when the pt_dict is for a taxlot and vice-versa
-        return [apply_display_unit_preferences(org, y) for y in x]
-    else:
-        return x
+    return get_display_unit_converter(org).collapse(x)
 
 
 def apply_display_unit_preferences(org, pt_dict):
@@ -59,9 +109,7 @@ def apply_display_unit_preferences(org, pt_dict):
     API and collapse any Quantity objects present down to a straight float, per
     the organization preferences.
     """
-    converted_dict = {k: collapse_unit(org, v) for k, v in pt_dict.iteritems()}
-
-    return converted_dict
+    return get_display_unit_converter(org).collapse_dict(pt_dict)
 
 
 def pretty_units(quantity):
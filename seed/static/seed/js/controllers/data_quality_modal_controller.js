@@ -6,18 +6,22 @@ angular.module('BE.seed.controller.data_quality_modal', [])
   .controller('data_quality_modal_controller', [
     '$scope',
     '$uibModalInstance',
+    'data_quality_service',
     'search_service',
     'naturalSort',
     'dataQualityResults',
+    'pagination',
     'name',
     'uploaded',
     'importFileId',
     'orgId',
     function ($scope,
               $uibModalInstance,
+              data_quality_service,
               search_service,
               naturalSort,
               dataQualityResults,
+              pagination,
               name,
               uploaded,
               importFileId,
@@ -26,6 +30,7 @@ angular.module('BE.seed.controller.data_quality_modal', [])
       $scope.uploaded = moment.utc(uploaded).local().format('MMMM Do YYYY, h:mm:ss A Z');
       var originalDataQualityResults = dataQualityResults || [];
       $scope.dataQualityResults = originalDataQualityResults;
+      $scope.pagination = pagination;
       $scope.importFileId = importFileId;
       $scope.orgId = orgId;
 
@@ -161,6 +166,20 @@ angular.module('BE.seed.controller.data_quality_modal', [])
         }
       };
 
+      /**
+       * load_page: replace the results with another page of the results of the import file
+       */
+      $scope.load_page = function (page) {
+        data_quality_service.get_data_quality_results(importFileId, page).then(function (data) {
+          originalDataQualityResults = data.data || [];
+          $scope.pagination = data.pagination;
+          $scope.dataQualityResults = originalDataQualityResults;
+          $scope.search.number_per_page = $scope.dataQualityResults.length;
+          if ($scope.search.sort_column !== null) $scope.sortData();
+          $scope.search.filter_search();
+        });
+      };
+
       $scope.search.num_pages = 1;
       $scope.search.number_per_page = $scope.dataQualityResults.length;
       $scope.search.sort_column = null;
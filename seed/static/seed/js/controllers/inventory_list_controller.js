@@ -326,6 +326,7 @@ angular.module('BE.seed.controller.inventory_list', [])
                 dataQualityResults: function () {
                   return result;
                 },
+                pagination: _.constant(null),
                 name: _.constant(null),
                 uploaded: _.constant(null),
                 importFileId: _.constant(response.progress_key.split(':').pop()),
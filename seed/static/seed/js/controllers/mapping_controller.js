@@ -472,14 +472,8 @@ angular.module('BE.seed.controller.mapping', [])
           $scope.data_quality_results = data_quality_service.get_data_quality_results($scope.import_file.id);
           $scope.data_quality_results.then(function (data) {
             $scope.data_quality_results_ready = true;
-            $scope.data_quality_errors = 0;
-            $scope.data_quality_warnings = 0;
-            _.forEach(data, function (datum) {
-              _.forEach(datum.data_quality_results, function (result) {
-                if (result.severity === 'error') $scope.data_quality_errors++;
-                else if (result.severity === 'warning') $scope.data_quality_warnings++;
-              });
-            });
+            $scope.data_quality_errors = data.num_errors || 0;
+            $scope.data_quality_warnings = data.num_warnings || 0;
           });
         });
       };
@@ -702,7 +696,14 @@ angular.module('BE.seed.controller.mapping', [])
           size: 'lg',
           resolve: {
             dataQualityResults: function () {
-              return $scope.data_quality_results;
+              return $scope.data_quality_results.then(function (data) {
+                return data.data;
+              });
+            },
+            pagination: function () {
+              return $scope.data_quality_results.then(function (data) {
+                return data.pagination;
+              });
             },
             name: function () {
               return $scope.import_file.uploaded_filename;
@@ -13,12 +13,19 @@ angular.module('BE.seed.service.data_quality', []).factory('data_quality_service
 
     /**
      * get_data_quality_results
-     * return data_quality results.
+     * return a page of data_quality results, with the pagination and the number of errors and warnings.
      * @param import_file_id: int, represents file import id.
+     * @param page: int, page of the results, defaults to the first page.
+     * @param per_page: int, number of results per page, defaults to 100.
      */
-    data_quality_factory.get_data_quality_results = function (import_file_id) {
-      return $http.get('/api/v2/import_files/' + import_file_id + '/data_quality_results/').then(function (response) {
-        return response.data.data;
+    data_quality_factory.get_data_quality_results = function (import_file_id, page, per_page) {
+      return $http.get('/api/v2/import_files/' + import_file_id + '/data_quality_results/', {
+        params: {
+          page: page,
+          per_page: per_page
+        }
+      }).then(function (response) {
+        return response.data;
       });
     };
 
@@ -6,19 +6,23 @@
 """
 from __future__ import absolute_import
 
+import csv
 import sys
+import tempfile
 
 from celery import chord, chain
 from celery import shared_task
 from celery.utils.log import get_task_logger
 from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.core.mail import send_mail
 from django.core.urlresolvers import reverse_lazy
 from django.template import loader
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 
-from seed.decorators import lock_and_track
+from seed.decorators import get_prog_key, lock_and_track
 from seed.landing.models import SEEDUser as User
 from seed.lib.mcm.utils import batch
 from seed.lib.superperms.orgs.models import Organization, OrganizationUser
@@ -26,7 +30,14 @@ from seed.models import (
     Property, PropertyState,
     TaxLot, TaxLotState
 )
-from seed.utils.cache import set_cache, increment_cache
+from seed.utils.cache import set_cache, set_cache_raw, increment_cache
+from seed.utils.export import (
+    InventoryExport,
+    EXPORT_FILE_TIMEOUT,
+    get_export_file_key,
+    get_export_file_path,
+    purge_export_files,
+)
 
 logger = get_task_logger(__name__)
 
@@ -218,3 +229,65 @@ def _delete_organization_taxlot_state_chunk(del_ids, prog_key, increment, org_pk
     """deletes a list of ``del_ids`` and increments the cache"""
     TaxLotState.objects.filter(organization_id=org_pk, pk__in=del_ids).delete()
     increment_cache(prog_key, increment * 100)
+
+
+@shared_task
+def export_inventory(export_id, organization_id, cycle_pk, inventory_type, columns, ids, filename):
+    """
+    Write an export of the inventory list (see InventoryExport) to a csv file in the default
+    storage, one batch of views at a time. The progress is reported under the progress key of
+    'export_inventory' and the export_id. Once done, the file can be downloaded for
+    EXPORT_FILE_TIMEOUT seconds, and the files of the exports that have expired are deleted.
+
+    :param export_id: str, unique id of the export
+    :param organization_id: int, id of the organization
+    :param cycle_pk: int, id of the cycle
+    :param inventory_type: str, properties or taxlots
+    :param columns: list, names of the columns to export, None for all
+    :param ids: list, ids of the properties or tax lots to export, empty for all
+    :param filename: str, name of the downloaded file
+    """
+    prog_key = get_prog_key('export_inventory', export_id)
+    result = {
+        'status': 'parsing',
+        'progress': 0,
+        'progress_key': prog_key,
+        'export_id': export_id,
+    }
+    set_cache(prog_key, result['status'], result)
+
+    purge_export_files()
+
+    try:
+        inventory_export = InventoryExport(organization_id, cycle_pk, inventory_type, columns, ids)
+        total = inventory_export.count()
+
+        with tempfile.TemporaryFile() as f:
+            writer = csv.writer(f)
+            writer.writerow(inventory_export.header)
+
+            exported = 0
+            for views in inventory_export.batches():
+                writer.writerows(inventory_export.batch_rows(views))
+                exported += len(views)
+                result['progress'] = min(round(exported * 100.0 / max(total, 1), 2), 100)
+                set_cache(prog_key, result['status'], result)
+
+            f.seek(0)
+            path = default_storage.save(get_export_file_path(export_id, filename), File(f))
+    except Exception as e:
+        result['status'] = 'error'
+        result['message'] = str(e)
+        set_cache(prog_key, result['status'], result)
+        raise
+
+    set_cache_raw(get_export_file_key(export_id), {
+        'organization_id': int(organization_id),
+        'path': path,
+        'filename': filename,
+    }, EXPORT_FILE_TIMEOUT)
+
+    result['status'] = 'success'
+    result['progress'] = 100
+    set_cache(prog_key, result['status'], result)
+    return result
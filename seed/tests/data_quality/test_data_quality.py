@@ -0,0 +1,189 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from datetime import date, datetime
+
+import mock
+import pytz
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from quantityfield import ureg
+
+from seed.landing.models import SEEDUser as User
+from seed.models import (
+    PropertyState,
+    PropertyView,
+    StatusLabel,
+)
+from seed.models.data_quality import (
+    DataQualityCheck,
+    RULE_TYPE_CUSTOM,
+    Rule,
+    SEVERITY_ERROR,
+    TYPE_DATE,
+    TYPE_EUI,
+    TYPE_NUMBER,
+    TYPE_STRING,
+)
+from seed.test_helpers.fake import (
+    FakeCycleFactory,
+    FakePropertyFactory,
+    FakePropertyStateFactory,
+)
+from seed.tests.util import DeleteModelsTestCase
+from seed.utils.cache import delete_many_cache, get_cache_raw
+from seed.utils.organizations import create_organization
+
+
+class DataQualityCheckTests(DeleteModelsTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('test_user@demo.com', 'test_user@demo.com',
+                                                  'test_pass')
+        self.org, _, _ = create_organization(self.user)
+        self.cycle = FakeCycleFactory(organization=self.org, user=self.user).get_cycle(
+            start=datetime(2010, 10, 10, tzinfo=timezone.get_current_timezone()))
+        self.property_factory = FakePropertyFactory(organization=self.org)
+        self.property_state_factory = FakePropertyStateFactory(organization=self.org)
+
+        self.label = StatusLabel.objects.create(name='old building', super_organization=self.org)
+        self.other_label = StatusLabel.objects.create(name='other', super_organization=self.org)
+        self.dq = DataQualityCheck.retrieve(self.org)
+        self.dq.remove_all_rules()
+        self.dq.add_rule({
+            'table_name': 'PropertyState',
+            'field': 'year_built',
+            'data_type': TYPE_NUMBER,
+            'min': 1800,
+            'rule_type': RULE_TYPE_CUSTOM,
+            'severity': SEVERITY_ERROR,
+            'status_label': self.label,
+        })
+
+    def _create_row(self, year_built, labels=None, view=True):
+        state = self.property_state_factory.get_property_state(year_built=year_built)
+        if view:
+            prprty = self.property_factory.get_property()
+            prprty.labels.add(*(labels or []))
+            PropertyView.objects.create(property=prprty, cycle=self.cycle, state=state)
+        return state
+
+    def _check(self, states):
+        dq = DataQualityCheck.retrieve(self.org)
+        rows = PropertyState.objects.filter(id__in=[s.id for s in states]).order_by('id')
+        with CaptureQueriesContext(connection) as queries:
+            dq.check_data('PropertyState', rows)
+        return dq, len(queries)
+
+    def test_check_data_labels(self):
+        old = self._create_row(1700)
+        relabeled = self._create_row(2000, labels=[self.label, self.other_label])
+        unlinked = self._create_row(1750, view=False)
+        valid = self._create_row(2000, labels=[self.other_label])
+
+        dq, _ = self._check([old, relabeled, unlinked, valid])
+        self.assertEqual(sorted(dq.results.keys()), [old.id, unlinked.id])
+        self.assertEqual(dq.results[old.id]['data_quality_results'][0]['message'],
+                         'Year Built out of range')
+
+        def labels(state):
+            view = PropertyView.objects.get(state=state)
+            return set(view.property.labels.values_list('name', flat=True))
+
+        self.assertEqual(labels(old), {'old building'})
+        self.assertEqual(labels(relabeled), {'other'})
+        self.assertEqual(labels(valid), {'other'})
+
+        # checking again does not change the labels
+        self._check([old, relabeled, valid])
+        self.assertEqual(labels(old), {'old building'})
+        self.assertEqual(labels(relabeled), {'other'})
+
+    def test_check_data_number_of_queries(self):
+        _, queries = self._check([self._create_row(1700), self._create_row(2000, [self.label])])
+        _, more_queries = self._check([self._create_row(1700) for i in range(3)] +
+                                      [self._create_row(2000, [self.label]) for i in range(3)])
+        self.assertEqual(queries, more_queries)
+
+    def test_chunk_results_are_merged(self):
+        identifier = 'test_chunks'
+        DataQualityCheck.initialize_cache(identifier)
+        DataQualityCheck.initialize_chunks(identifier, 3)
+
+        # the chunks are saved in any order, one of them without results
+        for chunk, ids in [(1, [5, 2]), (0, [4, 1]), (2, [])]:
+            dq = DataQualityCheck.retrieve(self.org)
+            dq.results = {i: {'id': i, 'data_quality_results': [{'severity': 'error'}]} for i in ids}
+            dq.save_to_cache(identifier, chunk)
+
+        results = DataQualityCheck.merge_chunks(identifier)
+        self.assertEqual([r['id'] for r in results], [1, 2, 4, 5])
+        self.assertEqual(list(DataQualityCheck.cached_results(identifier)), results)
+        self.assertIsNone(get_cache_raw(DataQualityCheck.chunk_cache_key(identifier, 0)))
+
+        # merging again keeps the results
+        self.assertEqual(DataQualityCheck.merge_chunks(identifier), results)
+
+    @mock.patch('seed.models.data_quality.RESULTS_PAGE_SIZE', 2)
+    def test_cached_results_read_only_their_pages(self):
+        identifier = 'test_pages'
+        results = [
+            {'id': i, 'data_quality_results': [{'severity': 'error'}, {'severity': 'warning'}]}
+            for i in range(5)
+        ]
+        DataQualityCheck.save_results(identifier, results)
+        cached = DataQualityCheck.cached_results(identifier)
+        self.assertEqual((len(cached), cached.num_errors, cached.num_warnings), (5, 5, 5))
+        self.assertEqual(list(cached), results)
+
+        # the first page is not needed to read the results after it
+        delete_many_cache([DataQualityCheck.page_cache_key(identifier, 0)])
+        self.assertEqual(cached[3:10], results[3:])
+        self.assertEqual(cached[-1], results[4])
+        self.assertEqual(cached[5:], [])
+
+        self.assertIsNone(DataQualityCheck.cached_results('test_no_pages'))
+
+
+class RuleTests(TestCase):
+
+    def test_date_bounds(self):
+        rule = Rule(data_type=TYPE_DATE, min=18890101, max=20201231)
+        self.assertTrue(rule.minimum_valid(date(1900, 1, 1)))
+        self.assertFalse(rule.minimum_valid(date(1800, 1, 1)))
+        self.assertFalse(rule.maximum_valid(date(2021, 1, 1)))
+        self.assertEqual(rule.format_strings(date(2021, 1, 1)),
+                         ['1889-01-01', '2020-12-31', '2021-01-01'])
+
+        value = datetime(2021, 1, 1, tzinfo=pytz.UTC)
+        self.assertTrue(rule.minimum_valid(value))
+        self.assertFalse(rule.maximum_valid(value))
+        self.assertEqual(rule.format_strings(value),
+                         ['1889-01-01 00:00:00', '2020-12-31 00:00:00', '2021-01-01 00:00:00'])
+
+    def test_quantity_bounds(self):
+        rule = Rule(data_type=TYPE_EUI, min=10, max=1000, units='kBtu/ft**2/year')
+        self.assertTrue(rule.minimum_valid(ureg.Quantity(50, 'kBtu/ft**2/year')))
+        self.assertFalse(rule.minimum_valid(ureg.Quantity(5, 'kBtu/ft**2/year')))
+        # the value is converted to the units of the rule
+        self.assertFalse(rule.maximum_valid(ureg.Quantity(5000, 'kWh/m**2/year')))
+        self.assertEqual(rule.format_strings(ureg.Quantity(5, 'kBtu/ft**2/year')),
+                         [u'10.0 kBtu/ft\xb2/year', u'1000.0 kBtu/ft\xb2/year',
+                          u'5.0 kBtu/ft\xb2/year'])
+
+    def test_numbers_and_text(self):
+        rule = Rule(data_type=TYPE_NUMBER, min=0.0, max=100.0)
+        self.assertTrue(rule.minimum_valid(0))
+        self.assertFalse(rule.maximum_valid(100.5))
+        self.assertEqual(rule.format_strings(101), ['0', '100', '101'])
+        self.assertEqual(rule.format_strings(100.5), ['0.0', '100.0', '100.5'])
+
+        rule = Rule(data_type=TYPE_STRING, text_match='^main')
+        self.assertTrue(rule.valid_text('MAIN st'))
+        self.assertFalse(rule.valid_text('1 main st'))
+        self.assertTrue(rule.valid_text(5))
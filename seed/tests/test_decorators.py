@@ -6,13 +6,14 @@
 """
 import json
 
+import mock
 from django.http import HttpResponse
 from django.test import TestCase, RequestFactory
 from rest_framework.test import APIRequestFactory
 
 from seed import decorators
 from seed.utils.cache import make_key, get_cache, get_lock, increment_cache, \
-    clear_cache
+    clear_cache, get_cache_raw, set_cache
 
 
 class TestException(Exception):
@@ -58,6 +59,45 @@ class TestDecorators(TestCase):
         expected = 100.0
         self.assertEqual(float(get_cache(test_key)['progress']), expected)
 
+    def test_increment_cache_after_set_cache(self):
+        """The increments add up to the progress that was set, until it is set again."""
+        test_key = make_key('increment_test')
+        set_cache(test_key, 'not-started', {'progress': 10, 'progress_key': test_key})
+        increment_cache(test_key, 1.0 / 3 * 100)
+        increment_cache(test_key, 1.0 / 3 * 100)
+
+        progress = get_cache(test_key)
+        self.assertEqual(progress['progress'], 76.66)
+        self.assertEqual(progress['status'], 'parsing')
+        self.assertEqual(progress['progress_key'], test_key)
+
+        set_cache(test_key, 'success', {'progress': 100})
+        self.assertEqual(get_cache(test_key), {'status': 'success', 'progress': 100})
+
+    def test_get_cache_is_read_only(self):
+        test_key = make_key('increment_test')
+        increment_cache(test_key, 25.0)
+        stored = get_cache_raw(test_key)
+        with mock.patch('django.core.cache.cache.set') as cache_set:
+            get_cache(test_key)
+            get_cache(make_key('missing_test'))
+        self.assertFalse(cache_set.called)
+        self.assertEqual(get_cache_raw(test_key), stored)
+
+    def test_increment_cache_throughput(self):
+        test_key = make_key('increment_test')
+        with mock.patch('seed.utils.cache.time.time', return_value=1000.0):
+            increment_cache(test_key, 10.0, rows=100)
+        with mock.patch('seed.utils.cache.time.time', return_value=1002.0):
+            increment_cache(test_key, 10.0, rows=100)
+            progress = get_cache(test_key)
+
+        self.assertEqual(progress['progress'], 20.0)
+        self.assertEqual(progress['rows'], 200)
+        self.assertEqual(progress['rows_per_second'], 100.0)
+        # 20% in 2 seconds, the remaining 80% take 8 seconds
+        self.assertEqual(progress['eta_seconds'], 8.0)
+
     # Tests for decorators themselves.
 
     def test_locking(self):
@@ -5,9 +5,13 @@
 :author
 """
 import json
+from datetime import datetime, timedelta
+from decimal import Decimal
 
+import pytz
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
@@ -77,6 +81,7 @@ class TestMeterViewSet(TestCase):
                 "timeseries_count": 0,
                 "energy_units": 1,
                 "energy_type": 2,
+                "storage": Meter.ROW_STORAGE,
                 "pk": meter.pk,
                 "model": "seed.meter",
                 "id": meter.pk,
@@ -140,13 +145,127 @@ class TestMeterViewSet(TestCase):
             "begin": "2015-01-01 08:00:00+00:00",
             "end": "2015-01-01 08:00:00+00:00",
             "value": 23.0,
+            "cost": None,
         }
 
-        jdata = json.loads(resp.content)
+        jdata = json.loads(b''.join(resp.streaming_content))
         self.assertEqual(jdata['status'], "success")
         self.assertEqual(len(jdata['meter']['data']), 100)
         self.assertDictEqual(jdata['meter']['data'][0], expected)
 
+    def _create_hourly_timeseries(self, hours, storage=Meter.ROW_STORAGE):
+        meter = Meter.objects.create(
+            name='test',
+            energy_type=Meter.ELECTRICITY,
+            energy_units=Meter.KILOWATT_HOURS,
+            storage=storage,
+        )
+        begin = datetime(2015, 1, 1, tzinfo=pytz.UTC)
+        meter.save_readings([
+            TimeSeries(
+                begin_time=begin + timedelta(hours=i),
+                end_time=begin + timedelta(hours=i + 1),
+                reading=i,
+                cost=Decimal('0.5'),
+            ) for i in range(hours)
+        ])
+        return meter
+
+    def _get_timeseries(self, meter, params):
+        client = APIClient()
+        client.login(username=self.user.username, password='secret')
+        url = reverse('api:v2:meters-get-timeseries', args=(meter.pk,))
+        return client.get(url, params)
+
+    def test_get_timeseries_bounds(self):
+        meter = self._create_hourly_timeseries(48)
+
+        resp = self._get_timeseries(meter, {
+            'start': '2015-01-01T10:00:00Z', 'end': '2015-01-01T13:00:00Z'
+        })
+
+        data = json.loads(b''.join(resp.streaming_content))['meter']['data']
+        self.assertEqual([d['value'] for d in data], [10.0, 11.0, 12.0])
+        # the end is the end of the reading, not its beginning
+        self.assertEqual(data[0]['end'], '2015-01-01 11:00:00+00:00')
+        self.assertEqual(data[0]['cost'], 0.5)
+
+    def test_get_timeseries_aggregated(self):
+        meter = self._create_hourly_timeseries(48)
+
+        with timezone.override(pytz.UTC):
+            resp = self._get_timeseries(meter, {'interval': 'day', 'start': '2015-01-01'})
+        jdata = json.loads(b''.join(resp.streaming_content))
+        self._assert_daily_points(meter, jdata)
+
+    def test_get_timeseries_aggregated_blocks(self):
+        meter = self._create_hourly_timeseries(48, storage=Meter.BLOCK_STORAGE)
+        rows_meter = self._create_hourly_timeseries(48)
+
+        with timezone.override(pytz.UTC):
+            resp = self._get_timeseries(meter, {'interval': 'day', 'start': '2015-01-01'})
+        jdata = json.loads(b''.join(resp.streaming_content))
+        self._assert_daily_points(meter, jdata)
+
+        # the time zone of the periods is the current one, like date_trunc
+        for params in [{'interval': 'hour'}, {'interval': 'day'}, {'interval': 'month'}, {}]:
+            resp = self._get_timeseries(meter, params)
+            rows_resp = self._get_timeseries(rows_meter, params)
+            self.assertEqual(json.loads(b''.join(resp.streaming_content))['meter']['data'],
+                             json.loads(b''.join(rows_resp.streaming_content))['meter']['data'])
+
+    def _assert_daily_points(self, meter, jdata):
+        self.assertEqual(jdata['meter']['id'], meter.pk)
+        data = jdata['meter']['data']
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[1]['begin'], '2015-01-02 00:00:00+00:00')
+        self.assertEqual(data[1]['end'], '2015-01-03 00:00:00+00:00')
+        self.assertEqual(data[1]['count'], 24)
+        self.assertDictEqual(data[1]['reading'], {
+            'sum': float(sum(range(24, 48))), 'mean': 35.5, 'min': 24.0, 'max': 47.0
+        })
+        self.assertDictEqual(data[1]['cost'], {'sum': 12.0, 'mean': 0.5, 'min': 0.5, 'max': 0.5})
+
+    def test_get_timeseries_aggregated_end_of_dst(self):
+        for storage in [Meter.ROW_STORAGE, Meter.BLOCK_STORAGE]:
+            self._assert_end_of_dst_points(self._create_hourly_timeseries(0, storage=storage))
+
+    def _assert_end_of_dst_points(self, meter):
+        # 2017-11-05 from 00:00 PDT to 02:00 PST, the hour from 01:00 is repeated
+        begin = datetime(2017, 11, 5, 7, tzinfo=pytz.UTC)
+        meter.save_readings([
+            TimeSeries(
+                begin_time=begin + timedelta(hours=i),
+                end_time=begin + timedelta(hours=i + 1),
+                reading=i,
+            ) for i in range(4)
+        ])
+
+        with timezone.override(pytz.timezone('America/Los_Angeles')):
+            hours = self._get_timeseries(meter, {'interval': 'hour'})
+            days = self._get_timeseries(meter, {'interval': 'day'})
+        hours = json.loads(b''.join(hours.streaming_content))['meter']['data']
+        self.assertEqual([(d['begin'], d['reading']['sum']) for d in hours], [
+            ('2017-11-05 00:00:00-07:00', 0.0),
+            ('2017-11-05 01:00:00-07:00', 1.0),
+            ('2017-11-05 01:00:00-08:00', 2.0),
+            ('2017-11-05 02:00:00-08:00', 3.0),
+        ])
+        days = json.loads(b''.join(days.streaming_content))['meter']['data']
+        self.assertEqual([(d['begin'], d['count']) for d in days], [
+            ('2017-11-05 00:00:00-07:00', 4),
+        ])
+
+    def test_get_timeseries_invalid_params(self):
+        meter = self._create_hourly_timeseries(1)
+
+        resp = self._get_timeseries(meter, {'interval': 'week'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(resp.content)['status'], 'error')
+
+        resp = self._get_timeseries(meter, {'start': 'yesterday'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
         # Not yet implemented
         # def test_add_timeseries(self):
         #     """Adding time series works."""
@@ -0,0 +1,88 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytz
+from django.test import TestCase
+
+from seed.models import Meter, TimeSeries, TimeSeriesBlock
+
+BEGIN = datetime(2015, 1, 1, 20, tzinfo=pytz.UTC)
+
+
+def make_readings(count, begin=BEGIN, minutes=15):
+    """Return unsaved readings of the duration that follow each other"""
+    duration = timedelta(minutes=minutes)
+    return [
+        TimeSeries(
+            begin_time=begin + duration * i,
+            end_time=begin + duration * (i + 1),
+            reading=i * 1.5,
+            cost=Decimal('0.1234') * i if i % 3 else None,
+        ) for i in range(count)
+    ]
+
+
+class TestMeterStorage(TestCase):
+
+    def _meter(self, storage):
+        return Meter.objects.create(
+            name='test',
+            energy_type=Meter.ELECTRICITY,
+            energy_units=Meter.KILOWATT_HOURS,
+            storage=storage,
+        )
+
+    def _values(self, readings):
+        return [(r.begin_time, r.end_time, r.reading, r.cost) for r in readings]
+
+    def test_blocks_read_like_rows(self):
+        readings = make_readings(200)
+        readings[5].reading = None
+        rows = self._meter(Meter.ROW_STORAGE)
+        rows.save_readings(readings)
+        blocks = self._meter(Meter.BLOCK_STORAGE)
+        blocks.save_readings(make_readings(200)[::-1])
+        blocks.save_readings([readings[5]])
+
+        self.assertEqual(TimeSeries.objects.filter(meter=blocks).count(), 0)
+        # the readings are split at midnight (UTC)
+        self.assertEqual(TimeSeriesBlock.objects.filter(meter=blocks).count(), 3)
+        self.assertEqual(blocks.readings_count(), 200)
+        self.assertEqual(self._values(blocks.readings()), self._values(rows.readings()))
+
+        start = BEGIN + timedelta(hours=3, minutes=50)
+        end = BEGIN + timedelta(days=1, hours=5)
+        expected = self._values(rows.readings(start, end))
+        self.assertEqual(len(expected), 100)
+        self.assertEqual(self._values(blocks.readings(start, end)), expected)
+
+    def test_blocks_are_merged(self):
+        meter = self._meter(Meter.BLOCK_STORAGE)
+        readings = make_readings(12)
+        meter.save_readings(readings[:4] + readings[8:])
+        self.assertEqual(meter.timeseries_blocks.count(), 2)
+
+        # the missing readings join the blocks, and the others replace the saved ones
+        readings[9].reading = 100.0
+        meter.save_readings(readings[4:10])
+        self.assertEqual(meter.timeseries_blocks.count(), 1)
+        self.assertEqual(self._values(meter.readings()), self._values(readings))
+
+    def test_pack_splits_blocks(self):
+        readings = make_readings(4) + make_readings(2, BEGIN + timedelta(hours=2), minutes=60)
+        blocks = TimeSeriesBlock.pack(self._meter(Meter.BLOCK_STORAGE), readings)
+
+        self.assertEqual([(b.begin_time, b.interval, b.count) for b in blocks], [
+            (BEGIN, 900, 4),
+            (BEGIN + timedelta(hours=2), 3600, 2),
+        ])
+        self.assertEqual(len(blocks[0].readings), 4 * 8)
+        self.assertEqual(blocks[1].end_time, BEGIN + timedelta(hours=4))
+        # the costs are only packed when there are some
+        self.assertIsNone(TimeSeriesBlock.pack(blocks[0].meter, readings[:1])[0].costs)
@@ -0,0 +1,57 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.test import TestCase
+from quantityfield import ureg
+
+from seed.lib.superperms.orgs.models import Organization
+from seed.serializers.pint import (
+    apply_display_unit_preferences,
+    collapse_unit,
+    get_display_unit_converter,
+)
+
+
+class TestDisplayUnitConversion(TestCase):
+
+    def setUp(self):
+        self.org = Organization(display_units_eui='kWh/m**2/year', display_units_area='m**2',
+                                display_significant_figures=3)
+
+    def test_collapse_unit_matches_pint_conversion(self):
+        for value in [0, 1, 12.345, 98765.4321]:
+            area = ureg.Quantity(value, 'ft**2')
+            self.assertEqual(collapse_unit(self.org, area), round(area.to('m**2').magnitude, 3))
+            eui = ureg.Quantity(value, 'kBtu/ft**2/year')
+            self.assertEqual(collapse_unit(self.org, eui),
+                             round(eui.to('kWh/m**2/year').magnitude, 3))
+
+        # other values are left alone, and quantities of unknown dimensionality are not supported
+        self.assertEqual(collapse_unit(self.org, 'abc'), 'abc')
+        self.assertRaises(KeyError, collapse_unit, self.org, ureg.Quantity(1, 'ft'))
+
+    def test_apply_display_unit_preferences(self):
+        result = apply_display_unit_preferences(self.org, {
+            'gross_floor_area': ureg.Quantity(1000, 'ft**2'),
+            'address_line_1': '1 Main St',
+            'related': [{'site_eui': ureg.Quantity(10, 'kBtu/ft**2/year')}],
+        })
+        self.assertEqual(result, {
+            'gross_floor_area': 92.903,
+            'address_line_1': '1 Main St',
+            'related': [{'site_eui': 31.546}],
+        })
+
+    def test_converter_is_shared_by_preferences(self):
+        converter = get_display_unit_converter(self.org)
+        same_preferences = Organization(display_units_eui='kWh/m**2/year',
+                                        display_units_area='m**2',
+                                        display_significant_figures=3)
+        self.assertIs(get_display_unit_converter(same_preferences), converter)
+
+        self.org.display_units_area = 'ft**2'
+        self.assertIsNot(get_display_unit_converter(self.org), converter)
+        self.assertEqual(collapse_unit(self.org, ureg.Quantity(1000, 'ft**2')), 1000)
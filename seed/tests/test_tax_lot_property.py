@@ -4,23 +4,42 @@
 :copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
+import csv
 import json
+import os
+import time
 
+import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.urlresolvers import reverse_lazy
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from seed.landing.models import SEEDUser as User
 from seed.models import (
     Cycle,
     PropertyView,
     TaxLotProperty,
+    TaxLotView,
     Column,
 )
 from seed.test_helpers.fake import (
     FakePropertyFactory,
     FakePropertyStateFactory,
     FakePropertyViewFactory,
-    FakeStatusLabelFactory
+    FakeNoteFactory,
+    FakeStatusLabelFactory,
+    FakeTaxLotViewFactory,
+)
+from seed.utils.cache import get_cache, get_cache_raw
+from seed.utils.export import (
+    EXPORT_FILE_TIMEOUT,
+    get_export_file_key,
+    get_export_file_path,
+    purge_export_files,
 )
 from seed.utils.organizations import create_organization
 
@@ -79,6 +98,56 @@ class TestTaxLotProperty(TestCase):
         self.assertEqual(len(data), 50)
         self.assertEqual(len(data[0]['related']), 0)
 
+    def test_tax_lot_property_get_related_counts_and_labels(self):
+        """Test the notes counts, labels and calculated tax lot ids with a fixed number of queries"""
+        note_factory = FakeNoteFactory(organization=self.org, user=self.user)
+        taxlot_view_factory = FakeTaxLotViewFactory(organization=self.org, user=self.user)
+
+        property_views = []
+        for i in range(20):
+            pv = self.property_view_factory.get_property_view(cycle=self.cycle)
+            self.properties.append(pv.id)
+            property_views.append(pv)
+
+        # the first property has two notes, two labels and two tax lots, one without an id
+        pv = property_views[0]
+        note_factory.get_note(property_view=pv, name='note 1')
+        note_factory.get_note(property_view=pv, name='note 2')
+        pv.property.labels.add(self.label_factory.get_statuslabel(name='Violation'))
+        pv.property.labels.add(self.label_factory.get_statuslabel(name='Compliant'))
+        tlv = taxlot_view_factory.get_taxlot_view(cycle=self.cycle, jurisdiction_tax_lot_id='11')
+        note_factory.get_note(taxlot_view=tlv, name='tax lot note')
+        TaxLotProperty.objects.create(property_view=pv, taxlot_view=tlv, cycle=self.cycle)
+        tlv_2 = taxlot_view_factory.get_taxlot_view(cycle=self.cycle, jurisdiction_tax_lot_id=None)
+        TaxLotProperty.objects.create(property_view=pv, taxlot_view=tlv_2, cycle=self.cycle)
+
+        columns_from_database = Column.retrieve_all(self.org.id, 'property', False)
+        qs = PropertyView.objects.select_related('property', 'state', 'cycle').filter(
+            pk__in=self.properties).order_by('id')
+
+        data = TaxLotProperty.get_related(list(qs), None, columns_from_database)
+        self.assertEqual(data[0]['notes_count'], 2)
+        self.assertEqual(data[0]['property_labels'], 'Compliant,Violation')
+        self.assertEqual(len(data[0]['related']), 2)
+        related = [r for r in data[0]['related'] if r['taxlot_view_id'] == tlv.id][0]
+        self.assertEqual(related['notes_count'], 1)
+        self.assertEqual(data[1]['notes_count'], 0)
+        self.assertEqual(data[1]['property_labels'], '')
+
+        # the tax lot side computes the tax lot ids of the related properties
+        taxlot_data = TaxLotProperty.get_related(
+            list(TaxLotView.objects.select_related('taxlot', 'state', 'cycle').filter(pk=tlv.pk)),
+            None, Column.retrieve_all(self.org.id, 'taxlot', False))
+        self.assertEqual(taxlot_data[0]['notes_count'], 1)
+        self.assertEqual(taxlot_data[0]['related'][0]['calculated_taxlot_ids'], '11; Missing')
+
+        # the number of queries does not depend on the number of views
+        with CaptureQueriesContext(connection) as small_page:
+            TaxLotProperty.get_related(list(qs[:2]), None, columns_from_database)
+        with CaptureQueriesContext(connection) as large_page:
+            TaxLotProperty.get_related(list(qs), None, columns_from_database)
+        self.assertEqual(len(small_page), len(large_page))
+
     def test_csv_export(self):
         """Test to make sure get_related returns the fields"""
         for i in range(50):
@@ -102,7 +171,7 @@ class TestTaxLotProperty(TestCase):
         )
 
         # parse the content as array
-        data = response.content.split('\n')
+        data = ''.join(response.streaming_content).split('\n')
 
         print data
         self.assertTrue('Address Line 1' in data[0].split(','))
@@ -112,6 +181,100 @@ class TestTaxLotProperty(TestCase):
         # last row should be blank
         self.assertEqual(data[52], '')
 
+    def test_csv_export_in_order_of_ids(self):
+        """Test that the streamed rows of the batches follow the order of the requested ids"""
+        for i in range(5):
+            p = self.property_view_factory.get_property_view()
+            self.properties.append(p.id)
+        property_ids = list(
+            PropertyView.objects.filter(pk__in=self.properties).values_list('property_id', flat=True)
+        )
+        ids = list(reversed(property_ids))
+
+        url = reverse_lazy('api:v2.1:tax_lot_properties-csv')
+        with mock.patch('seed.utils.export.EXPORT_BATCH_SIZE', 2):
+            response = self.client.post(
+                url + '?{}={}&{}={}&{}={}'.format(
+                    'organization_id', self.org.pk,
+                    'cycle_id', self.cycle,
+                    'inventory_type', 'properties'
+                ),
+                data=json.dumps({'columns': ['id'], 'ids': ids}),
+                content_type='application/json'
+            )
+            self.assertTrue(response.streaming)
+            data = list(csv.reader(''.join(response.streaming_content).splitlines()))
+
+        self.assertEqual(data[0], ['ID', 'Property Labels'])
+        self.assertEqual([int(row[0]) for row in data[1:]], ids)
+
+    def test_background_export_and_ranged_download(self):
+        """Test the export task and downloading its file with and without a byte range"""
+        for i in range(5):
+            p = self.property_view_factory.get_property_view()
+            self.properties.append(p.id)
+
+        url = reverse_lazy('api:v2.1:tax_lot_properties-export')
+        with mock.patch('seed.utils.export.EXPORT_BATCH_SIZE', 2):
+            response = self.client.post(
+                url + '?{}={}&{}={}&{}={}'.format(
+                    'organization_id', self.org.pk,
+                    'cycle_id', self.cycle,
+                    'inventory_type', 'properties'
+                ),
+                data=json.dumps({'columns': ['id', 'address_line_1'], 'filename': 'my export.csv'}),
+                content_type='application/json'
+            )
+        result = json.loads(response.content)
+        self.assertEqual(result['status'], 'success')
+
+        # the task runs eagerly in the tests
+        progress = get_cache(result['progress_key'])
+        self.assertEqual(progress['status'], 'success')
+        self.assertEqual(progress['progress'], 100)
+
+        export_file = get_cache_raw(get_export_file_key(result['export_id']))
+        self.addCleanup(default_storage.delete, export_file['path'])
+        self.assertEqual(export_file['filename'], 'my_export.csv')
+
+        download_url = reverse_lazy('api:v2.1:tax_lot_properties-download')
+        query = '?organization_id={}&export_id={}'.format(self.org.pk, result['export_id'])
+        response = self.client.get(download_url + query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        content = ''.join(response.streaming_content)
+        data = list(csv.reader(content.splitlines()))
+        self.assertEqual(data[0], ['ID', 'address_line_1', 'Property Labels'])
+        self.assertEqual(len(data), 7)
+
+        # resume the download
+        response = self.client.get(download_url + query, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-{}/{}'.format(len(content) - 1, len(content)))
+        self.assertEqual(''.join(response.streaming_content), content[10:])
+
+        response = self.client.get(download_url + query, HTTP_RANGE='bytes={}-'.format(len(content)))
+        self.assertEqual(response.status_code, 416)
+
+        # another organization can not download the export
+        other_org, _, _ = create_organization(self.user)
+        response = self.client.get(
+            download_url + '?organization_id={}&export_id={}'.format(other_org.pk, result['export_id']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_purge_export_files(self):
+        """Test that the files of the expired exports are deleted"""
+        expired = default_storage.save(get_export_file_path('1', 'expired.csv'), ContentFile('1'))
+        current = default_storage.save(get_export_file_path('2', 'current.csv'), ContentFile('2'))
+        self.addCleanup(default_storage.delete, current)
+        self.addCleanup(default_storage.delete, expired)
+        mtime = time.time() - EXPORT_FILE_TIMEOUT - 60
+        os.utime(default_storage.path(expired), (mtime, mtime))
+
+        self.assertEqual(purge_export_files(), 1)
+        self.assertFalse(default_storage.exists(expired))
+        self.assertTrue(default_storage.exists(current))
+
     def tearDown(self):
         for x in self.properties:
             PropertyView.objects.get(pk=x).delete()
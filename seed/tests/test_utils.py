@@ -4,12 +4,19 @@
 :copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
+import os
+import shutil
+import tempfile
 from datetime import datetime
 
+import mock
 import pytz
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.test import TestCase
 from django.utils.timezone import make_aware
 
+from seed.utils import staged_files
 from seed.utils.generic import split_model_fields
 from seed.utils.strings import titlecase
 from seed.utils.time import convert_datestr
@@ -68,3 +75,96 @@ class StringTest(TestCase):
         self.assertEqual(titlecase("return_nicely's_home"), "Return Nicely's Home")
         self.assertEqual(titlecase("return nicely's home"), "Return Nicely's Home")
         self.assertEqual(titlecase("3rd_role"), "3rd Role")
+
+
+class StagedFilesTest(TestCase):
+
+    def setUp(self):
+        self.staged_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(staged_files, 'STAGED_FILES_DIR', self.staged_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.staged_dir)
+        self.storage = FileSystemStorage(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.storage.location)
+
+    def _file(self, name, data):
+        if not self.storage.exists(name):
+            self.storage.save(name, ContentFile(data))
+        f = self.storage.open(name)
+        f.chunks = mock.Mock(wraps=f.chunks)
+        return f
+
+    def test_stage_file_once(self):
+        f = self._file('data_imports/a.csv', 'a,b\n1,2\n')
+        path = staged_files.stage_file('import_file_1', f)
+        self.assertEqual(open(path).read(), 'a,b\n1,2\n')
+        self.assertEqual(os.listdir(self.staged_dir), [os.path.basename(path)])
+
+        # the local copy is reused, and a replaced file is staged again
+        self.assertEqual(staged_files.stage_file('import_file_1', f), path)
+        self.assertEqual(f.chunks.call_count, 1)
+        other = staged_files.stage_file('import_file_1', self._file('data_imports/b.csv', 'x'))
+        self.assertNotEqual(other, path)
+
+    def test_evict_least_recently_used(self):
+        paths = []
+        for i in range(3):
+            path = staged_files.stage_file('f{}'.format(i), self._file('f{}'.format(i), 'x' * 10))
+            os.utime(path, (1000 + i, 1000 + i))
+            paths.append(path)
+        # using a file makes it the most recently used
+        staged_files.stage_file('f0', self._file('f0', 'x' * 10))
+
+        with mock.patch.object(staged_files, 'STAGED_FILES_MAX_SIZE', 25):
+            staged_files.stage_file('f3', self._file('f3', 'x' * 10))
+
+        self.assertEqual([os.path.exists(p) for p in paths], [True, False, False])
+        self.assertEqual(len(os.listdir(self.staged_dir)), 2)
+
+    def test_open_evicted_file(self):
+        f = self._file('data_imports/a.csv', 'a,b\n')
+        stage_file = staged_files.stage_file
+
+        # another process removes the copy before it is opened
+        def stage_and_evict(key, field_file):
+            path = stage_file(key, field_file)
+            if f.chunks.call_count == 1:
+                os.remove(path)
+            return path
+
+        with mock.patch.object(staged_files, 'stage_file', side_effect=stage_and_evict):
+            with staged_files.open_staged_file('import_file_1', f) as staged:
+                self.assertEqual(staged.read(), 'a,b\n')
+        self.assertEqual(f.chunks.call_count, 2)
+
+    def test_directory_access(self):
+        f = self._file('data_imports/a.csv', 'a,b\n')
+
+        # a new directory is only accessible by its user
+        new_dir = os.path.join(self.staged_dir, 'staged')
+        with mock.patch.object(staged_files, 'STAGED_FILES_DIR', new_dir):
+            staged_files.stage_file('import_file_1', f)
+        self.assertEqual(os.stat(new_dir).st_mode & 0o777, 0o700)
+
+        os.chmod(self.staged_dir, 0o777)
+        staged_files.stage_file('import_file_1', f)
+        self.assertEqual(os.stat(self.staged_dir).st_mode & 0o777, 0o700)
+
+    def test_directory_of_another_user(self):
+        f = self._file('data_imports/a.csv', 'a,b\n')
+        with mock.patch.object(os, 'getuid', return_value=os.getuid() + 1):
+            self.assertRaises(IOError, staged_files.stage_file, 'import_file_1', f)
+        self.assertEqual(f.chunks.call_count, 0)
+
+        # nor a link to a directory
+        link = os.path.join(self.staged_dir, 'link')
+        os.symlink(self.staged_dir, link)
+        with mock.patch.object(staged_files, 'STAGED_FILES_DIR', link):
+            self.assertRaises(IOError, staged_files.stage_file, 'import_file_1', f)
+
+    def test_failed_copy_is_removed(self):
+        f = self._file('data_imports/a.csv', 'a,b\n')
+        f.chunks = mock.Mock(side_effect=IOError)
+        self.assertRaises(IOError, staged_files.stage_file, 'import_file_1', f)
+        self.assertEqual(os.listdir(self.staged_dir), [])
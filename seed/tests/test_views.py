@@ -34,6 +34,7 @@ from seed.test_helpers.fake import (
 )
 from seed.utils.cache import set_cache
 from seed.utils.organizations import create_organization
+from seed.utils.pagination import get_inventory_count
 
 DEFAULT_CUSTOM_COLUMNS = [
     'project_id',
@@ -837,6 +838,75 @@ class InventoryViewTests(DeleteModelsTestCase):
         self.assertEquals(pagination['has_previous'], False)
         self.assertEquals(pagination['total'], 0)
 
+    def test_get_properties_by_cursor(self):
+        views = []
+        for _ in range(5):
+            views.append(PropertyView.objects.create(
+                property=self.property_factory.get_property(), cycle=self.cycle,
+                state=self.property_state_factory.get_property_state()
+            ))
+
+        url = '/api/v2/properties/filter/?organization_id={}&cycle={}&per_page=2&cursor={}'
+        cursor = ''
+        ids = []
+        while cursor is not None:
+            response = self.client.post(url.format(self.org.pk, self.cycle.pk, cursor),
+                                        data={'columns': COLUMNS_TO_SEND})
+            result = json.loads(response.content)
+            pagination = result['pagination']
+            self.assertEquals(pagination['total'], 5)
+            self.assertEquals(pagination['has_next'], pagination['next_cursor'] is not None)
+            ids += [r['property_view_id'] for r in result['results']]
+            cursor = pagination['next_cursor']
+        self.assertEquals(ids, [v.id for v in views])
+
+        response = self.client.post(url.format(self.org.pk, self.cycle.pk, 'last'),
+                                    data={'columns': COLUMNS_TO_SEND})
+        self.assertEquals(response.status_code, 400)
+
+    def test_get_properties_cached_total(self):
+        def get_total():
+            response = self.client.get('/api/v2/properties/', {
+                'organization_id': self.org.pk, 'cycle': self.cycle.pk, 'per_page': 10
+            })
+            return json.loads(response.content)['pagination']['total']
+
+        self.assertEquals(get_total(), 0)
+        view = PropertyView.objects.create(
+            property=self.property_factory.get_property(), cycle=self.cycle,
+            state=self.property_state_factory.get_property_state()
+        )
+        self.assertEquals(get_total(), 1)
+
+        # the cached count is used until a view of the cycle is saved or deleted
+        with self.assertNumQueries(0):
+            self.assertEquals(
+                get_inventory_count('property', self.cycle.pk, PropertyView.objects.none()), 1)
+        view.delete()
+        self.assertEquals(get_total(), 0)
+
+    def test_get_properties_cached_total_of_moved_view(self):
+        other_cycle = self.cycle_factory.get_cycle(
+            start=datetime(2011, 10, 10, tzinfo=timezone.get_current_timezone()))
+        view = PropertyView.objects.create(
+            property=self.property_factory.get_property(), cycle=self.cycle,
+            state=self.property_state_factory.get_property_state()
+        )
+        view = PropertyView.objects.get(pk=view.pk)
+        queryset = PropertyView.objects.filter
+        self.assertEquals(
+            get_inventory_count('property', self.cycle.pk, queryset(cycle=self.cycle)), 1)
+        self.assertEquals(
+            get_inventory_count('property', other_cycle.pk, queryset(cycle=other_cycle)), 0)
+
+        # both the cycle the view is moved from and the one it is moved to are counted again
+        view.cycle = other_cycle
+        view.save()
+        self.assertEquals(
+            get_inventory_count('property', self.cycle.pk, queryset(cycle=self.cycle)), 0)
+        self.assertEquals(
+            get_inventory_count('property', other_cycle.pk, queryset(cycle=other_cycle)), 1)
+
     def test_get_property(self):
         property_state = self.property_state_factory.get_property_state()
         property_property = self.property_factory.get_property()
@@ -1291,6 +1361,29 @@ class InventoryViewTests(DeleteModelsTestCase):
         self.assertEquals(pagination['has_previous'], False)
         self.assertEquals(pagination['total'], 1)
 
+    def test_get_taxlots_by_cursor(self):
+        views = []
+        for _ in range(3):
+            views.append(TaxLotView.objects.create(
+                taxlot=TaxLot.objects.create(organization=self.org), cycle=self.cycle,
+                state=self.taxlot_state_factory.get_taxlot_state()
+            ))
+
+        url = '/api/v2/taxlots/filter/?organization_id={}&cycle={}&per_page=2&cursor={}'
+        response = self.client.post(url.format(self.org.pk, self.cycle.pk, 0),
+                                    data={'columns': COLUMNS_TO_SEND})
+        result = json.loads(response.content)
+        self.assertEquals([r['taxlot_view_id'] for r in result['results']], [views[0].id, views[1].id])
+        self.assertEquals(result['pagination']['next_cursor'], views[1].id)
+        self.assertEquals(result['pagination']['total'], 3)
+
+        response = self.client.post(url.format(self.org.pk, self.cycle.pk, views[1].id),
+                                    data={'columns': COLUMNS_TO_SEND})
+        result = json.loads(response.content)
+        self.assertEquals([r['taxlot_view_id'] for r in result['results']], [views[2].id])
+        self.assertEquals(result['pagination']['next_cursor'], None)
+        self.assertEquals(result['pagination']['has_next'], False)
+
     def test_get_taxlots_missing_jurisdiction_tax_lot_id(self):
         property_state = self.property_state_factory.get_property_state(extra_data={'extra_data_field': 'edfval'})
         property_property = self.property_factory.get_property(self.org)
@@ -4,9 +4,20 @@
 :copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
+from __future__ import absolute_import
+
+import time
+
 from django.core.cache import cache as django_cache
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
 
+# the progress added by increment_cache is counted in hundredths of a percent, so that it can be
+# added atomically by the cache (INCRBY in redis)
+PROGRESS_SCALE = 100
+
+# how long (in seconds) the progress of a task is kept. Reading the progress does not extend it.
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
 
 def make_key(key):
     return unicode(django_cache.make_key(key))
@@ -20,10 +31,38 @@ def get_cache_raw(key, default=None):
     return django_cache.get(key, default)
 
 
+def get_many_cache_raw(keys):
+    """Return a dict of the values of the keys which are in the cache, in one round trip"""
+    return django_cache.get_many(keys)
+
+
+def set_many_cache_raw(data, timeout=DEFAULT_TIMEOUT):
+    """Set the values of the keys of the dict data, in one round trip"""
+    django_cache.set_many(data, timeout)
+
+
+def _progress_counter_keys(progress_key):
+    """Return the keys of the progress, processed rows and start time counted by increment_cache"""
+    return ['{}:COUNT'.format(progress_key), '{}:ROWS'.format(progress_key),
+            '{}:START'.format(progress_key)]
+
+
+def _incr_counter(key, delta):
+    """Atomically add delta to the integer counter of the key, creating it if needed"""
+    try:
+        return django_cache.incr(key, delta)
+    except ValueError:
+        if django_cache.add(key, delta, PROGRESS_TIMEOUT):
+            return delta
+        # another worker created the counter in the meantime
+        return django_cache.incr(key, delta)
+
+
 def set_cache(progress_key, status, data):
     """
     Sets the cache key to a pickled dictionary containing at least status and progress.
-    If data is not a dict, it is assumed to be a progress percentage.
+    If data is not a dict, it is assumed to be a progress percentage. The progress added by
+    increment_cache since the last call is replaced by the progress of data.
     """
     if not isinstance(status, str):
         raise ValueError('Invalid value for status; must be a string')
@@ -34,23 +73,43 @@ def set_cache(progress_key, status, data):
     else:
         result = data
     result['status'] = status
-    set_cache_raw(progress_key, result, DEFAULT_TIMEOUT)
+    set_cache_raw(progress_key, result, PROGRESS_TIMEOUT)
+    django_cache.delete_many(_progress_counter_keys(progress_key))
 
     return result
 
 
 def get_cache(progress_key, default=None):
-    """Unpickles the cache key to a dictionary and resets the timeout"""
+    """
+    Unpickles the cache key to a dictionary, adding the progress counted by increment_cache. When
+    the rows are counted too, the rows_per_second and the eta_seconds (estimated time until the
+    progress reaches 100) are added. Reading the progress does not change the cache.
+    """
     if default is not None:
         if not isinstance(default, dict):
             default = {'status': 'Unknown', 'progress': default}
-    data = get_cache_raw(progress_key, default)
+    count_key, rows_key, start_key = _progress_counter_keys(progress_key)
+    values = get_many_cache_raw([progress_key, count_key, rows_key, start_key])
+
+    data = values.get(progress_key, default)
     if data is None:
         # Cache accessed before it was created
         data = {'status': 'parsing', 'progress': 0.0}
-    else:
-        # Set cache to same value to reset timeout
-        set_cache(progress_key, data['status'], data)
+    if count_key not in values:
+        return data
+
+    data = dict(data)
+    added = values[count_key] / float(PROGRESS_SCALE)
+    data['status'] = 'parsing'
+    data['progress'] = min(float(data.get('progress') or 0) + added, 100.0)
+
+    elapsed = time.time() - values.get(start_key, time.time())
+    if elapsed > 0:
+        if rows_key in values:
+            data['rows'] = values[rows_key]
+            data['rows_per_second'] = round(values[rows_key] / elapsed, 1)
+        if added > 0:
+            data['eta_seconds'] = round((100.0 - data['progress']) * elapsed / added, 1)
     return data
 
 
@@ -76,7 +135,12 @@ def get_cache_state(progress_key, default=None):
 
 def delete_cache(progress_key):
     """Delete the cache associated with the progress_key"""
-    django_cache.delete(progress_key)
+    django_cache.delete_many([progress_key] + _progress_counter_keys(progress_key))
+
+
+def delete_many_cache(keys):
+    """Delete the cache of all the keys"""
+    django_cache.delete_many(keys)
 
 
 def lock_cache(progress_key, timeout=60):
@@ -94,18 +158,24 @@ def get_lock(lock_key, default=0):
     return get_cache_raw(lock_key, default)
 
 
-def increment_cache(key, increment):
-    """Increment cache by value increment, never exceed 100."""
-    increment = round(increment, 2)
-    value = get_cache(key)
-    value = float(value['progress'])
-    if value + increment >= 100.0:
-        value = 100.0
-    else:
-        value += increment
+def increment_cache(key, increment, rows=None):
+    """
+    Increment the progress of the key by increment percent, never exceed 100. The increments are
+    atomic, so concurrent workers do not lose each other's progress.
 
-    set_cache(key, 'parsing', value)
-    return {'status': 'parsing', 'progress': value}
+    :param key: str, progress key
+    :param increment: float, percent of progress to add
+    :param rows: int, optional number of rows processed, to report the throughput
+    :return: dict, the progress after the increment
+    """
+    count_key, rows_key, start_key = _progress_counter_keys(key)
+    steps = int(round(increment * PROGRESS_SCALE))
+    if _incr_counter(count_key, steps) == steps:
+        # first increment, start timing the progress
+        django_cache.add(start_key, time.time(), PROGRESS_TIMEOUT)
+    if rows is not None:
+        _incr_counter(rows_key, rows)
+    return get_cache(key)
 
 
 def clear_cache():
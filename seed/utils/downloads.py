@@ -0,0 +1,92 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+# size of the blocks that are read from the file while streaming it
+DOWNLOAD_BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(range_header, size):
+    """
+    Parse a single byte range of an HTTP Range header.
+
+    :param range_header: str, value of the Range header, e.g. 'bytes=0-499', 'bytes=500-', 'bytes=-500'
+    :param size: int, size of the file
+    :return: tuple, (first byte, last byte) (inclusive), None if there is no usable range (the
+        whole file is returned), or False if the range can not be satisfied
+    """
+    match = RANGE_RE.match((range_header or '').strip())
+    if not match or match.groups() == ('', ''):
+        # no range, or a form that is not supported (e.g. multiple ranges)
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # suffix range, the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    first = int(first)
+    last = int(last) if last else size - 1
+    if first >= size or last < first:
+        return False
+    return first, min(last, size - 1)
+
+
+def _read_blocks(f, length):
+    try:
+        while length > 0:
+            data = f.read(min(DOWNLOAD_BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def ranged_file_response(request, f, size, content_type, filename):
+    """
+    Stream the open file as an attachment, supporting a single byte range in the Range header so
+    that interrupted downloads can be resumed.
+
+    :param request: the request
+    :param f: file object opened in binary mode, closed once it is streamed
+    :param size: int, size of the file
+    :param content_type: str
+    :param filename: str, name of the downloaded file
+    :return: StreamingHttpResponse with status 200 or 206, or a 416 HttpResponse
+    """
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    if byte_range is False:
+        f.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */{}'.format(size)
+        return response
+
+    if byte_range is None:
+        first, last = 0, size - 1
+        status = 200
+    else:
+        first, last = byte_range
+        status = 206
+        f.seek(first)
+
+    length = last - first + 1 if size else 0
+    response = StreamingHttpResponse(_read_blocks(f, length), content_type=content_type, status=status)
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    if status == 206:
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, size)
+    return response
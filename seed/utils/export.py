@@ -0,0 +1,211 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import datetime
+import os
+from itertools import chain
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from quantityfield import ureg
+
+from seed.lib.mcm.utils import batch
+from seed.models import (
+    Column,
+    PropertyView,
+    TaxLotProperty,
+    TaxLotView,
+)
+from seed.utils.cache import make_key
+
+INVENTORY_MODELS = {'properties': PropertyView, 'taxlots': TaxLotView}
+
+# number of views whose related data are assembled at once when exporting
+EXPORT_BATCH_SIZE = 1000
+
+# how long (in seconds) the file of a background export can be downloaded
+EXPORT_FILE_TIMEOUT = 24 * 60 * 60
+
+# directory of the files of the background exports in the default storage
+EXPORT_FILE_DIR = 'exports'
+
+
+def get_export_file_key(export_id):
+    """Return the cache key of the file information of a background export"""
+    return make_key('SEED:export_inventory:FILE:{}'.format(export_id))
+
+
+def get_export_file_path(export_id, filename):
+    """Return the path of the file of a background export in the default storage"""
+    return '{}/{}-{}'.format(EXPORT_FILE_DIR, export_id, filename)
+
+
+def purge_export_files():
+    """
+    Delete the files of the background exports that can no longer be downloaded, i.e. that are
+    older than EXPORT_FILE_TIMEOUT.
+
+    :return: int, number of deleted files
+    """
+    try:
+        _, filenames = default_storage.listdir(EXPORT_FILE_DIR)
+    except OSError:
+        # nothing has been exported yet
+        return 0
+
+    expired = timezone.now() - datetime.timedelta(seconds=EXPORT_FILE_TIMEOUT)
+    deleted = 0
+    for filename in filenames:
+        path = os.path.join(EXPORT_FILE_DIR, filename)
+        if default_storage.get_modified_time(path) < expired:
+            default_storage.delete(path)
+            deleted += 1
+    return deleted
+
+
+class InventoryExport(object):
+    """
+    The header and rows of an export of the inventory list. The views are read and assembled in
+    batches, so the memory does not depend on the number of exported views.
+
+    :param organization_id: int, id of the organization
+    :param cycle_pk: int, id of the cycle
+    :param inventory_type: str, properties or taxlots
+    :param columns: list, names of the columns to export, defaults to all the database fields
+    :param ids: list, ids of the properties or tax lots (not the views) to export, in the order of
+        the export. Defaults to all of them.
+    """
+
+    def __init__(self, organization_id, cycle_pk, inventory_type, columns=None, ids=None):
+        if columns is None:
+            # default the columns for now if no columns are passed
+            columns = Column.retrieve_db_fields(organization_id)
+        columns = list(columns)
+        self.ids = ids or []
+
+        # get the class to operate on and the relationships
+        view_klass = INVENTORY_MODELS[inventory_type]
+
+        # Grab all the columns and create a column name lookup
+        col_inventory_type = 'property' if inventory_type == 'properties' else 'taxlot'
+        self.columns_db = Column.retrieve_all(organization_id, col_inventory_type, False)
+        column_lookup = {}
+        db_column_name_lookup = {}
+        self.column_related_lookup = {}
+        for c in self.columns_db:
+            column_lookup[c['name']] = c['display_name']
+            db_column_name_lookup[c['name']] = c['column_name']
+            self.column_related_lookup[c['name']] = c['related']
+        self.show_columns = db_column_name_lookup.values()
+
+        # add a couple of other Display Names
+        column_lookup['notes_count'] = 'Notes Count'
+        column_lookup['id'] = 'ID'
+
+        # make the csv header
+        self.header = []
+        for c in columns:
+            if c in column_lookup:
+                self.header.append(column_lookup[c])
+            else:
+                self.header.append(c)
+
+        select_related = ['state', 'cycle']
+        filter_str = {'cycle': cycle_pk}
+        if hasattr(view_klass, 'property'):
+            select_related.append('property')
+            filter_str = {'property__organization_id': organization_id}
+            if self.ids:
+                filter_str['property__id__in'] = self.ids
+            self.obj_id_field = 'property_id'
+            # always export the labels
+            columns += ['property_labels']
+            self.header.append('Property Labels')
+
+        elif hasattr(view_klass, 'taxlot'):
+            select_related.append('taxlot')
+            filter_str = {'taxlot__organization_id': organization_id}
+            if self.ids:
+                filter_str['taxlot__id__in'] = self.ids
+            self.obj_id_field = 'taxlot_id'
+            # always export the labels
+            columns += ['taxlot_labels']
+            self.header.append('Tax Lot Labels')
+
+        self.columns = columns
+        self.model_views = view_klass.objects.select_related(*select_related).filter(**filter_str).order_by('id')
+
+    def count(self):
+        """Return the number of exported views (i.e. rows)"""
+        return self.model_views.count()
+
+    def batches(self, batch_size=None):
+        """
+        Return the views to export in batches of batch_size. Without ids, the views are read in id
+        order with a server-side cursor. With ids, the views are returned in the order of the ids.
+
+        :param batch_size: int, number of views in each batch, defaults to EXPORT_BATCH_SIZE
+        :return: generator of lists of views
+        """
+        batch_size = batch_size or EXPORT_BATCH_SIZE
+
+        if not self.ids:
+            for views in batch(self.model_views.iterator(), batch_size):
+                yield views
+            return
+
+        # force the data into the same order as the IDs (the last position of an id wins)
+        order_dict = {obj_id: index for index, obj_id in enumerate(self.ids)}
+        ordered_ids = sorted(order_dict, key=order_dict.get)
+
+        for start in range(0, len(ordered_ids), batch_size):
+            views = list(self.model_views.filter(
+                **{self.obj_id_field + '__in': ordered_ids[start:start + batch_size]}
+            ))
+            # stable sort, the views of the same property / tax lot stay in id order
+            views.sort(key=lambda view: order_dict[getattr(view, self.obj_id_field)])
+            yield views
+
+    def batch_rows(self, views):
+        """
+        Assemble the related data of the views and return the exported values of each of them.
+
+        :param views: list, PropertyViews or TaxLotViews
+        :return: list of lists, the values of the columns of each view
+        """
+        # get the data in a dict which includes the related data. Note that the labels are in the
+        # property_labels column and are returned by the TaxLotProperty.get_related method.
+        data = TaxLotProperty.get_related(views, self.show_columns, self.columns_db)
+
+        # iterate over the results to preserve column order and write row.
+        rows = []
+        for datum in data:
+            row = []
+            for column in self.columns:
+                row_result = None
+
+                if column in self.column_related_lookup and self.column_related_lookup[column]:
+                    # this is a related column, grab out of the related section
+                    if datum.get('related'):
+                        row_result = datum['related'][0].get(column, None)
+                else:
+                    row_result = datum.get(column, None)
+
+                # Convert quantities (this is typically handled in the JSON Encoder, but that isn't here).
+                if isinstance(row_result, ureg.Quantity):
+                    row_result = row_result.magnitude
+                elif isinstance(row_result, datetime.datetime):
+                    row_result = row_result.strftime("%Y-%m-%d %H:%M:%S")
+                elif isinstance(row_result, datetime.date):
+                    row_result = row_result.strftime("%Y-%m-%d")
+                row.append(row_result)
+
+            rows.append(row)
+        return rows
+
+    def rows(self, batch_size=None):
+        """Return a generator of the rows of the export, the header is not included"""
+        return chain.from_iterable(self.batch_rows(views) for views in self.batches(batch_size))
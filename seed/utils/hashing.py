@@ -0,0 +1,126 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import datetime
+import hashlib
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+from django.utils import timezone
+
+# The names of the fields that are hashed never change while the process is running, so they are
+# only looked up once. See Column.retrieve_db_field_name_for_hash_comparison.
+_HASH_FIELDS = []
+
+
+def get_hash_fields():
+    """
+    Return the (cached) names of the database fields that are used to hash a state.
+
+    :return: list, field names
+    """
+    if not _HASH_FIELDS:
+        Column = apps.get_model('seed', 'Column')
+        _HASH_FIELDS.extend(Column.retrieve_db_field_name_for_hash_comparison())
+    return _HASH_FIELDS
+
+
+def _db_value(model_class, field_name, value):
+    """
+    Return the value as it would be after saving it and reading it back from the database (e.g. a
+    float for a FloatField that was set to '125', or a date for a DateField that was set to a
+    datetime), so that an object hashes the same before and after it is saved.
+    """
+    try:
+        field = model_class._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return value
+
+    try:
+        value = field.get_prep_value(value)
+        if isinstance(field, models.FloatField):
+            # QuantityField only converts Quantity values
+            value = float(value)
+    except (TypeError, ValueError):
+        return value
+
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        # postgres returns the timestamps in UTC
+        value = value.astimezone(timezone.utc)
+    if hasattr(field, 'from_db_value'):
+        value = field.from_db_value(value, None, None, None)
+    return value
+
+
+def _to_bytes(value):
+    # encode unicode explicitly, str() fails on non-ASCII values
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def hash_state_object(obj, include_extra_data=True):
+    def _get_field_from_obj(field_obj, field):
+        if not hasattr(field_obj, field):
+            return "FOO"  # Return a random value so we can distinguish between this and None.
+        else:
+            value = getattr(field_obj, field)
+            if value is None:
+                return value
+            return _db_value(type(field_obj), field, value)
+
+    m = hashlib.md5()
+    for f in get_hash_fields():
+        obj_val = _get_field_from_obj(obj, f)
+        m.update(str(f))
+        m.update(_to_bytes(obj_val))
+
+    if include_extra_data:
+        add_dictionary_repr_to_hash(m, obj.extra_data)
+
+    return m.hexdigest()
+
+
+def add_dictionary_repr_to_hash(hash_obj, dict_obj):
+    assert isinstance(dict_obj, dict)
+
+    for (key, value) in sorted(dict_obj.items(), key=lambda x_y: x_y[0]):
+        if isinstance(value, dict):
+            add_dictionary_repr_to_hash(hash_obj, value)
+        else:
+            hash_obj.update(_to_bytes(key))
+            hash_obj.update(_to_bytes(value))
+    return hash_obj
+
+
+def backfill_hash_objects(states, batch_size=1000):
+    """
+    Calculate the stored hash_object of the states in batches, e.g. of the states that were saved
+    before the column existed.
+
+    :param states: QuerySet of PropertyStates or TaxLotStates
+    :param batch_size: int, number of states read and updated per transaction
+    :return: int, number of states whose hash changed
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        # page by id so that the states that were just updated are not skipped
+        batch = list(states.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            break
+
+        with transaction.atomic():
+            for state in batch:
+                hash_object = hash_state_object(state)
+                if hash_object != state.hash_object:
+                    states.model.objects.filter(pk=state.pk).update(hash_object=hash_object)
+                    updated += 1
+
+        last_id = batch[-1].id
+
+    return updated
@@ -10,9 +10,14 @@ All rights reserved.  # NOQA
 :author
 """
 from collections import OrderedDict
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from seed.utils.cache import delete_cache, get_cache_raw, make_key, set_cache_raw
+
 
 class ResultsListPagination(PageNumberPagination):
     page_size_query_param = 'per_page'
@@ -30,3 +35,98 @@ class ResultsListPagination(PageNumberPagination):
             ('total', self.page.paginator.count),
             ('results', data)
         ]))
+
+
+def get_inventory_count_key(inventory_type, cycle_id):
+    """
+    Return the cache key of the number of views of a cycle. A cycle belongs to a single
+    organization, so the cycle identifies the (organization, cycle) pair.
+
+    :param inventory_type: str, property or taxlot
+    :param cycle_id: int, id of the cycle
+    """
+    return make_key('SEED:inventory_count:{}:{}'.format(inventory_type, cycle_id))
+
+
+def get_inventory_count(inventory_type, cycle_id, queryset):
+    """
+    Return the number of views of the cycle, counting the queryset only when it is not cached.
+
+    :param inventory_type: str, property or taxlot
+    :param cycle_id: int, id of the cycle
+    :param queryset: QuerySet, all the views of the cycle
+    :return: int
+    """
+    key = get_inventory_count_key(inventory_type, cycle_id)
+    count = get_cache_raw(key)
+    if count is None:
+        count = queryset.count()
+        set_cache_raw(key, count)
+    return count
+
+
+def invalidate_inventory_count(inventory_type, cycle_id):
+    """Forget the cached number of views of the cycle, e.g. once a view is added or removed"""
+    delete_cache(get_inventory_count_key(inventory_type, cycle_id))
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator which uses a known count of the objects instead of counting them again"""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super(CachedCountPaginator, self).__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is not None:
+            return self._count
+        return super(CachedCountPaginator, self).count
+
+
+def keyset_page(queryset, cursor, per_page):
+    """
+    Return the page of the queryset following the cursor. The queryset must be ordered by id,
+    and the page is read with an index range scan instead of an OFFSET, so every page takes the
+    same time however deep it is.
+
+    :param queryset: QuerySet, ordered by id
+    :param cursor: int, id of the last object of the previous page, 0 for the first page
+    :param per_page: int, number of objects in the page
+    :return: tuple, (list of the objects of the page, cursor of the next page or None if this is
+        the last page)
+    """
+    objects = list(queryset.filter(id__gt=cursor)[:per_page + 1])
+    if len(objects) > per_page:
+        objects = objects[:per_page]
+        return objects, objects[-1].id
+    return objects, None
+
+
+def paginate_list(items, page, per_page):
+    """
+    Return a page of a list and the pagination information, in the format of the inventory lists
+
+    :param items: list
+    :param page: int or str, number of the page, the first (last) page is returned if it is not an
+        integer (out of range)
+    :param per_page: int or str, number of items per page
+    :return: tuple, (list of the items of the page, dict of the pagination information)
+    """
+    paginator = Paginator(items, per_page)
+    try:
+        items_page = paginator.page(page)
+    except PageNotAnInteger:
+        items_page = paginator.page(1)
+    except EmptyPage:
+        items_page = paginator.page(paginator.num_pages)
+
+    return items_page.object_list, {
+        'page': items_page.number,
+        'start': items_page.start_index(),
+        'end': items_page.end_index(),
+        'num_pages': paginator.num_pages,
+        'has_next': items_page.has_next(),
+        'has_previous': items_page.has_previous(),
+        'total': paginator.count
+    }
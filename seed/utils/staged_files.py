@@ -0,0 +1,173 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from __future__ import absolute_import
+
+import errno
+import hashlib
+import os
+import stat
+import tempfile
+import time
+
+from django.conf import settings
+
+# directory of the local copies of the files of the storage backend (e.g. S3). The copies are
+# shared by all the processes of the node, so each Celery task does not download the file again.
+# The directory must belong to the user of the processes and not be accessible by other users.
+STAGED_FILES_DIR = getattr(settings, 'STAGED_FILES_DIR',
+                           os.path.join(tempfile.gettempdir(), 'seed_staged_files'))
+
+# disk budget (in bytes) of the staged files, the least recently used files are removed beyond it
+STAGED_FILES_MAX_SIZE = getattr(settings, 'STAGED_FILES_MAX_SIZE', 10 * 1024 ** 3)
+
+# size of the blocks that are copied from the storage
+STAGED_FILES_BLOCK_SIZE = 1024 * 1024
+
+# copies that are not complete after this many seconds were left by a process that died
+STAGED_FILES_STALE_COPY_AGE = 60 * 60
+
+# number of times a copy is staged again when it is evicted by another process before it is opened
+STAGED_FILES_OPEN_ATTEMPTS = 3
+
+# prefix of the copies in progress, which are renamed once they are complete
+_COPY_PREFIX = '.copy-'
+
+
+def get_staged_file_path(key, field_file):
+    """
+    Return the path of the local copy of the file. The name includes a checksum of the name and
+    size of the file in the storage, so a file that is replaced is staged again.
+
+    :param key: str, unique name of the file, e.g. 'import_file_1'
+    :param field_file: FieldFile, the file in the storage
+    :return: str
+    """
+    checksum = hashlib.sha1('{}:{}'.format(field_file.name, field_file.size)).hexdigest()
+    return os.path.join(STAGED_FILES_DIR, '{}-{}'.format(key, checksum))
+
+
+def stage_file(key, field_file):
+    """
+    Return the path of a local copy of the file, copying it from the storage if it is not on this
+    node yet. The file is copied in large blocks to a temporary file that is renamed once it is
+    complete, so the other processes never see a partial copy.
+
+    :param key: str, unique name of the file, e.g. 'import_file_1'
+    :param field_file: FieldFile, the file in the storage
+    :return: str, path of the local copy
+    """
+    # the copies are only trusted in a directory that no other user could have written to
+    _make_staged_files_dir()
+
+    path = get_staged_file_path(key, field_file)
+    try:
+        # mark the copy as recently used
+        os.utime(path, None)
+        return path
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+    evict_staged_files(field_file.size)
+
+    temp_file = tempfile.NamedTemporaryFile(dir=STAGED_FILES_DIR, prefix=_COPY_PREFIX, delete=False)
+    try:
+        # the file is closed once it is staged, so it is reopened when it is staged again
+        field_file.open('rb')
+        with temp_file:
+            for chunk in field_file.chunks(STAGED_FILES_BLOCK_SIZE):
+                temp_file.write(chunk)
+        os.rename(temp_file.name, path)
+    except BaseException:
+        os.remove(temp_file.name)
+        raise
+    finally:
+        field_file.close()
+
+    return path
+
+
+def open_staged_file(key, field_file, mode='rb'):
+    """
+    Open the local copy of the file, see stage_file. Another process may evict the copy before it
+    is opened, in which case it is staged again. Once open, the file can be read even if it is
+    evicted.
+
+    :param key: str, unique name of the file, e.g. 'import_file_1'
+    :param field_file: FieldFile, the file in the storage
+    :param mode: str, mode of open
+    :return: file
+    """
+    for attempt in range(STAGED_FILES_OPEN_ATTEMPTS):
+        path = stage_file(key, field_file)
+        try:
+            return open(path, mode)
+        except IOError as e:
+            if e.errno != errno.ENOENT or attempt == STAGED_FILES_OPEN_ATTEMPTS - 1:
+                raise
+
+
+def evict_staged_files(size=0):
+    """
+    Remove the least recently used staged files until there is room for a file of the size in the
+    disk budget. Files that are open in other processes can still be read after they are removed.
+
+    :param size: int, size (in bytes) of the file that is about to be staged
+    :return: int, number of files that were removed
+    """
+    now = time.time()
+    staged = []
+    for name in os.listdir(STAGED_FILES_DIR):
+        path = os.path.join(STAGED_FILES_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # removed by another process
+            continue
+
+        if name.startswith(_COPY_PREFIX):
+            if now - stat.st_mtime > STAGED_FILES_STALE_COPY_AGE:
+                _remove(path)
+            continue
+        staged.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(file_size for _, file_size, _ in staged)
+    removed = 0
+    for _, file_size, path in sorted(staged):
+        if total_size + size <= STAGED_FILES_MAX_SIZE:
+            break
+        _remove(path)
+        total_size -= file_size
+        removed += 1
+    return removed
+
+
+def _make_staged_files_dir():
+    """
+    Create the directory of the staged files, accessible by the current user only. An existing
+    one must be a directory (not a link) of the current user, whose access is restricted as well.
+    """
+    try:
+        os.makedirs(STAGED_FILES_DIR, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    dir_stat = os.lstat(STAGED_FILES_DIR)
+    if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid():
+        raise IOError(errno.EPERM, 'The staged files directory must be a directory of the current '
+                                   'user', STAGED_FILES_DIR)
+    if dir_stat.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        os.chmod(STAGED_FILES_DIR, 0o700)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
@@ -24,7 +24,6 @@ from seed.models.data_quality import (
     DataQualityCheck,
 )
 from seed.utils.api import api_endpoint_class
-from seed.utils.cache import get_cache_raw
 
 logger = get_task_logger(__name__)
 
@@ -154,7 +153,7 @@ class DataQualityViews(viewsets.ViewSet):
               required: true
               paramType: path
         """
-        data_quality_results = get_cache_raw(DataQualityCheck.cache_key(pk))
+        data_quality_results = DataQualityCheck.cached_results(pk)
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="Data Quality Check Results.csv"'
 
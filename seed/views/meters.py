@@ -4,10 +4,27 @@
 :copyright (c) 2014 - 2018, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
-# import json
+from datetime import datetime, time
+from itertools import groupby
 
-from django.http import JsonResponse
-from rest_framework import viewsets
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import (
+    Avg,
+    Count,
+    DateTimeField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Func,
+    Max,
+    Min,
+    Sum,
+    Value,
+)
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status, viewsets
 from rest_framework.decorators import detail_route
 from rest_framework.parsers import JSONParser, FormParser
 
@@ -20,6 +37,9 @@ from seed.models import (
 )
 from seed.utils.api import api_endpoint_class
 
+# intervals to which the time series can be resampled, as date_trunc precisions
+TIMESERIES_INTERVALS = ('hour', 'day', 'month')
+
 
 class MeterViewSet(viewsets.ViewSet):
     raise_exception = True
@@ -108,7 +128,7 @@ class MeterViewSet(viewsets.ViewSet):
             res = {}
             res['status'] = 'success'
             res['meter'] = obj_to_dict(meter)
-            res['meter']['timeseries_count'] = meter.timeseries_set.count()
+            res['meter']['timeseries_count'] = meter.readings_count()
             return JsonResponse(res)
         else:
             return JsonResponse({
@@ -207,23 +227,54 @@ class MeterViewSet(viewsets.ViewSet):
               description: Meter primary key
               required: true
               paramType: path
+            - name: start
+              description: Only the readings that begin at or after this date or datetime
+              required: false
+              paramType: query
+            - name: end
+              description: Only the readings that begin before this date or datetime
+              required: false
+              paramType: query
+            - name: interval
+              description: Resample the readings by hour, day or month. Each point then holds the
+                           sum, mean, min and max of the readings and costs of the interval.
+              required: false
+              paramType: query
         """
+        try:
+            start = _parse_time_bound(request.query_params.get('start'))
+            end = _parse_time_bound(request.query_params.get('end'))
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        interval = request.query_params.get('interval')
+        if interval is not None and interval not in TIMESERIES_INTERVALS:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'interval must be one of {}'.format(', '.join(TIMESERIES_INTERVALS)),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         meter = Meter.objects.get(pk=pk)
-        res = {
-            'status': 'success',
-            'meter': obj_to_dict(meter),
-        }
-        res['meter']['data'] = []
-
-        ts = meter.timeseries_set.order_by('begin_time')
-        for t in ts:
-            res['meter']['data'].append({
-                'begin': str(t.begin_time),
-                'end': str(t.begin_time),
-                'value': t.reading,
-            })
+        if interval is None:
+            points = _timeseries_points(meter.readings(start, end))
+        elif meter.storage == Meter.ROW_STORAGE:
+            ts = meter.timeseries_set.all()
+            if start is not None:
+                ts = ts.filter(begin_time__gte=start)
+            if end is not None:
+                ts = ts.filter(begin_time__lt=end)
+            points = _aggregated_timeseries_points(ts, interval)
+        else:
+            # the packed readings cannot be aggregated by the database
+            points = _resampled_timeseries_points(meter.readings(start, end), interval,
+                                                  timezone.get_current_timezone())
 
-        return JsonResponse(res)
+        # stream the points, so a long series is neither held in memory nor sent in one piece
+        return StreamingHttpResponse(_stream_timeseries(meter, points),
+                                     content_type='application/json')
 
     @api_endpoint_class
     @has_perm_class('can_modify_data')
@@ -256,3 +307,171 @@ class MeterViewSet(viewsets.ViewSet):
             'status': 'success',
             'message': 'Not yet implemented'
         })
+
+
+def _parse_time_bound(value):
+    """
+    Parse a start or end query parameter, either a date or a datetime. Naive values are in the
+    current time zone.
+
+    :param value: str or None
+    :return: aware datetime or None
+    """
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError('Invalid date or datetime: {}'.format(value))
+        parsed = datetime.combine(parsed, time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _timeseries_points(readings):
+    """Return the points of the readings, which are TimeSeries"""
+    for reading in readings:
+        yield {
+            'begin': str(reading.begin_time),
+            'end': str(reading.end_time),
+            'value': reading.reading,
+            'cost': _float(reading.cost),
+        }
+
+
+def _aggregated_timeseries_points(ts, interval):
+    """
+    Return the readings of the time series resampled to the interval. The readings are grouped
+    by date_trunc of their begin time in the current time zone, and aggregated by the database.
+    The hours are grouped by UTC offset as well, so the hour that is repeated when the daylight
+    saving time ends gives two points. The time zone is bound here, since the rows are only read
+    while the response is streamed.
+    """
+    tz = timezone.get_current_timezone()
+    local_time = Func(Value(timezone.get_current_timezone_name()), F('begin_time'),
+                      function='timezone', output_field=DateTimeField())
+    annotations = {
+        'period': Func(Value(interval), local_time, function='date_trunc',
+                       output_field=DateTimeField()),
+    }
+    ordering = ['period']
+    if interval == 'hour':
+        # the first of the repeated hours has the larger offset
+        ordering.append('-utc_offset')
+        annotations['utc_offset'] = ExpressionWrapper(
+            local_time - Func(Value('UTC'), F('begin_time'), function='timezone',
+                              output_field=DateTimeField()),
+            output_field=DurationField())
+
+    rows = ts.annotate(**annotations).values(*annotations).annotate(
+        count=Count('id'),
+        end_time=Max('end_time'),
+        reading_sum=Sum('reading'),
+        reading_mean=Avg('reading'),
+        reading_min=Min('reading'),
+        reading_max=Max('reading'),
+        cost_sum=Sum('cost'),
+        cost_mean=Avg('cost'),
+        cost_min=Min('cost'),
+        cost_max=Max('cost'),
+    ).order_by(*ordering)
+
+    def point(row):
+        row['period'] = _period_start(row['period'], row.get('utc_offset'), tz)
+        return _aggregated_point(row)
+
+    return (point(row) for row in rows.iterator())
+
+
+def _period_start(local_period, utc_offset, tz):
+    """
+    Return the beginning of a period as an aware datetime.
+
+    :param local_period: naive datetime, the beginning of the period in the time zone
+    :param utc_offset: timedelta, the UTC offset of the period for hours, None otherwise
+    :param tz: time zone of the period
+    """
+    if utc_offset is not None:
+        return timezone.localtime((local_period - utc_offset).replace(tzinfo=timezone.utc), tz)
+    # a day or month that begins at an ambiguous or skipped time begins in standard time
+    return timezone.make_aware(local_period, tz, is_dst=False)
+
+
+def _resampled_timeseries_points(readings, interval, tz):
+    """
+    Return the readings resampled to the interval like _aggregated_timeseries_points, for the
+    readings of block storage. The readings are grouped by their begin time truncated in the
+    time zone, as date_trunc does, and the hours by UTC offset as well.
+    """
+    def period(reading):
+        local_time = timezone.localtime(reading.begin_time, tz)
+        value = local_time.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        if interval == 'hour':
+            return value, local_time.utcoffset()
+        value = value.replace(hour=0)
+        if interval == 'month':
+            value = value.replace(day=1)
+        return value, None
+
+    for (local_period, utc_offset), group in groupby(readings, key=period):
+        begin = _period_start(local_period, utc_offset, tz)
+        group = list(group)
+        values = [r.reading for r in group if r.reading is not None]
+        costs = [r.cost for r in group if r.cost is not None]
+        yield _aggregated_point({
+            'period': begin,
+            'end_time': max(r.end_time for r in group),
+            'count': len(group),
+            'reading_sum': sum(values) if values else None,
+            'reading_mean': sum(values) / len(values) if values else None,
+            'reading_min': min(values) if values else None,
+            'reading_max': max(values) if values else None,
+            'cost_sum': sum(costs) if costs else None,
+            'cost_mean': sum(costs) / len(costs) if costs else None,
+            'cost_min': min(costs) if costs else None,
+            'cost_max': max(costs) if costs else None,
+        })
+
+
+def _aggregated_point(row):
+    return {
+        'begin': str(row['period']),
+        'end': str(row['end_time']),
+        'count': row['count'],
+        'reading': {
+            'sum': row['reading_sum'],
+            'mean': row['reading_mean'],
+            'min': row['reading_min'],
+            'max': row['reading_max'],
+        },
+        'cost': {
+            'sum': _float(row['cost_sum']),
+            'mean': _float(row['cost_mean']),
+            'min': _float(row['cost_min']),
+            'max': _float(row['cost_max']),
+        },
+    }
+
+
+def _float(value):
+    """The costs are decimals, which are sent as numbers like the readings"""
+    return None if value is None else float(value)
+
+
+def _stream_timeseries(meter, points):
+    """
+    Return the chunks of the JSON response of the timeseries action, which has the same shape as
+    a JsonResponse of {'status': 'success', 'meter': {..., 'data': [points]}}.
+    """
+    encoder = DjangoJSONEncoder()
+    meter_json = encoder.encode(obj_to_dict(meter))
+    yield '{{"status": "success", "meter": {}, "data": ['.format(meter_json[:-1])
+
+    separator = ''
+    for point in points:
+        yield separator + encoder.encode(point)
+        separator = ', '
+    yield ']}}'
@@ -9,7 +9,7 @@ All rights reserved.  # NOQA
 """
 
 from django.apps import apps
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.paginator import EmptyPage, PageNotAnInteger
 from django.http import JsonResponse
 from rest_framework import status
 from rest_framework.decorators import detail_route, list_route
@@ -59,6 +59,11 @@ from seed.utils.properties import (
     pair_unpair_property_taxlot,
     update_result_with_master
 )
+from seed.utils.pagination import (
+    CachedCountPaginator,
+    get_inventory_count,
+    keyset_page,
+)
 
 # Global toggle that controls whether or not to display the raw extra
 # data fields in the columns returned for the view.
@@ -101,17 +106,44 @@ class TaxLotViewSet(GenericViewSet):
             .filter(taxlot__organization_id=org_id, cycle=cycle) \
             .order_by('id')
 
-        paginator = Paginator(taxlot_views_list, per_page)
-
-        try:
-            taxlot_views = paginator.page(page)
-            page = int(page)
-        except PageNotAnInteger:
-            taxlot_views = paginator.page(1)
-            page = 1
-        except EmptyPage:
-            taxlot_views = paginator.page(paginator.num_pages)
-            page = paginator.num_pages
+        total = get_inventory_count('taxlot', cycle.id, taxlot_views_list)
+        cursor = request.query_params.get('cursor')
+        if cursor is not None:
+            # keyset pagination, the cursor is the id of the last view of the previous page
+            try:
+                cursor = int(cursor or 0)
+                per_page = int(per_page)
+            except ValueError:
+                return JsonResponse(
+                    {'status': 'error', 'message': 'cursor and per_page must be integers'},
+                    status=status.HTTP_400_BAD_REQUEST)
+            taxlot_views, next_cursor = keyset_page(taxlot_views_list, cursor, per_page)
+            pagination = {
+                'cursor': cursor,
+                'next_cursor': next_cursor,
+                'per_page': per_page,
+                'has_next': next_cursor is not None,
+                'total': total
+            }
+        else:
+            paginator = CachedCountPaginator(taxlot_views_list, per_page, count=total)
+
+            try:
+                taxlot_views = paginator.page(page)
+            except PageNotAnInteger:
+                taxlot_views = paginator.page(1)
+            except EmptyPage:
+                taxlot_views = paginator.page(paginator.num_pages)
+
+            pagination = {
+                'page': taxlot_views.number,
+                'start': taxlot_views.start_index(),
+                'end': taxlot_views.end_index(),
+                'num_pages': paginator.num_pages,
+                'has_next': taxlot_views.has_next(),
+                'has_previous': taxlot_views.has_previous(),
+                'total': paginator.count
+            }
 
         columns_from_database = Column.retrieve_all(org_id, 'taxlot', False)
         related_results = TaxLotProperty.get_related(taxlot_views, columns, columns_from_database)
@@ -123,15 +155,7 @@ class TaxLotViewSet(GenericViewSet):
             [apply_display_unit_preferences(org, x) for x in related_results]
 
         response = {
-            'pagination': {
-                'page': page,
-                'start': paginator.page(page).start_index(),
-                'end': paginator.page(page).end_index(),
-                'num_pages': paginator.num_pages,
-                'has_next': paginator.page(page).has_next(),
-                'has_previous': paginator.page(page).has_previous(),
-                'total': paginator.count
-            },
+            'pagination': pagination,
             'cycle_id': cycle.id,
             'results': unit_collapsed_results
         }
@@ -164,6 +188,11 @@ class TaxLotViewSet(GenericViewSet):
               description: The number of items per page to return
               required: false
               paramType: query
+            - name: cursor
+              description: The id of the last view of the previous page (0 for the first page). When given,
+                           the views are paged by id instead of by page number and next_cursor is returned
+              required: false
+              paramType: query
         """
         return self._get_filtered_results(request, columns=None)
 
@@ -194,6 +223,11 @@ class TaxLotViewSet(GenericViewSet):
               description: The number of items per page to return
               required: false
               paramType: query
+            - name: cursor
+              description: The id of the last view of the previous page (0 for the first page). When given,
+                           the views are paged by id instead of by page number and next_cursor is returned
+              required: false
+              paramType: query
             - name: column filter data
               description: Object containing columns to filter on, should be a JSON object with a single key "columns"
                            whose value is a list of strings, each representing a column name